@@ -0,0 +1,176 @@
+"""
+Per-client admission control for log ingestion.
+
+Every client (the user of a valid bearer token, else the IP address) gets a
+token bucket refilled at LOG_ADMISSION_RATE entries per second up to
+LOG_ADMISSION_BURST. Each admitted log entry costs one token. Lower levels
+must leave a reserve in the bucket (LOG_ADMISSION_RESERVE, as a fraction of
+the burst), so a client that is flooding loses its DEBUG entries first and
+its ERROR entries last.
+
+LogAdmissionMiddleware answers 429 before the body is parsed when the bucket
+cannot take even one entry at the level announced in the X-Log-Level header;
+the views then admit validated entries one by one.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .metrics import count_log_entries
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class LogAdmission:
+    """
+    Thread-safe token buckets keyed by client, with per-level reserves and
+    counters of admitted and shed entries.
+    """
+
+    def __init__(self, rate, burst, reserve, max_clients):
+        self.rate = rate
+        self.burst = burst
+        # Tokens that must remain in the bucket after admitting an entry of each level
+        self.floors = {level: burst * reserve.get(level, 0.0) for level in LEVELS}
+        self.max_clients = max_clients
+        self.admitted = dict.fromkeys(LEVELS, 0)
+        self.shed = dict.fromkeys(LEVELS, 0)
+        self.rejected_requests = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            # Forget the least recently seen clients; they start over with a full bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def check(self, key, level):
+        """
+        Return 0 if an entry of ``level`` would be admitted now, otherwise the
+        seconds until it would be. Nothing is spent; a refusal is counted as
+        a rejected request.
+        """
+        with self._lock:
+            bucket = self._bucket(key, time.monotonic())
+            missing = self.floors[level] + 1 - bucket.tokens
+            if missing <= 0:
+                return 0
+            self.rejected_requests += 1
+            return missing / self.rate
+
+    def admit(self, key, entries):
+        """
+        Spend one token per entry, in order, and return the entries that were
+        admitted; the others are shed.
+        """
+        admitted = []
+        with self._lock:
+            bucket = self._bucket(key, time.monotonic())
+            for entry in entries:
+                level = entry.get("level", "INFO")
+                if bucket.tokens - 1 >= self.floors[level]:
+                    bucket.tokens -= 1
+                    self.admitted[level] += 1
+                    admitted.append(entry)
+                else:
+                    self.shed[level] += 1
+        return admitted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "rejected_requests": self.rejected_requests,
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+            }
+
+
+_admission = None
+_ident = BaseThrottle()
+_jwt = JWTAuthentication()
+
+
+def get_admission():
+    """
+    Return the process-wide LogAdmission built from settings, or None when
+    admission control is disabled.
+    """
+    global _admission
+    if _admission is None and settings.LOG_ADMISSION_ENABLED:
+        _admission = LogAdmission(
+            rate=settings.LOG_ADMISSION_RATE,
+            burst=settings.LOG_ADMISSION_BURST,
+            reserve=settings.LOG_ADMISSION_RESERVE,
+            max_clients=settings.LOG_ADMISSION_MAX_CLIENTS,
+        )
+    return _admission
+
+
+def client_key(request):
+    """
+    Identify the client without touching the database: the user id claim of
+    a valid bearer token, else the client IP. X-Forwarded-For is only read
+    when REST_FRAMEWORK's NUM_PROXIES says how many proxies to trust;
+    otherwise any client could pick its own bucket with the header. Invalid
+    tokens fall back to the IP so that forged tokens cannot mint fresh
+    buckets.
+    """
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        try:
+            token = _jwt.get_validated_token(raw_token)
+            return f"user:{token[jwt_settings.USER_ID_CLAIM]}"
+        except (InvalidToken, KeyError):
+            pass
+    if api_settings.NUM_PROXIES is None:
+        return f"ip:{request.META.get('REMOTE_ADDR')}"
+    return f"ip:{_ident.get_ident(request)}"
+
+
+def admit_entries(request, entries):
+    """
+    Admit validated entries for the request's client; returns the admitted
+    entries (all of them when admission control is disabled).
+    """
+    admission = get_admission()
+    if admission is None:
+        return entries
+    key = getattr(request, "log_client_key", None) or client_key(request)
+    admitted = admission.admit(key, entries)
+    if len(admitted) != len(entries):
+        kept = {id(entry) for entry in admitted}
+        count_log_entries([entry for entry in entries if id(entry) not in kept], "shed")
+    return admitted
+
+
+def admission_stats():
+    admission = get_admission()
+    return admission.stats() if admission is not None else None
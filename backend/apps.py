@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+
+
+class BackendConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "backend"
+
+    def ready(self):
+        # Connect signal receivers and register system checks
+        from . import checks, signals  # noqa: F401
+
+        from django.conf import settings
+
+        if settings.LAZY_INIT:
+            from django.core.signals import request_started
+
+            from .sentry import init_on_first_request
+
+            request_started.connect(init_on_first_request)
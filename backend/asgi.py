@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Server-sent events are served next to Django (needs the settings loaded above)
+from backend.push import PushRouter  # noqa: E402
+
+application = PushRouter(django_application)
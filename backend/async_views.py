@@ -0,0 +1,167 @@
+"""
+Async-native versions of LogEntryAPIView and UserProfileAPIView for the ASGI
+deployment (enabled with ASYNC_VIEWS).
+
+They run on the event loop without sync/async thread hops and answer with
+the same status codes and JSON bodies as their DRF counterparts. JWT
+validation, entry validation and logging are done inline; the database is
+only reached, through sync_to_async, when the auth cache misses. Requests
+the fast path does not handle (form or multipart bodies) are passed to the
+DRF view.
+"""
+
+import io
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.utils import json as drf_json
+
+from . import json_codec
+from .authentication import CachedJWTAuthentication
+from .parsers import NDJSONParser
+from .profiles import get_cached_profile, profile_response
+from .admission import admit_entries
+from .metrics import count_invalid_log_entries
+from .query_budget import query_budget
+from .renderers import ORJSONRenderer
+from .validators import validate_log_entry
+from .views import LogEntryAPIView, emit_log_entries, ingest_log_batch
+
+_renderer = ORJSONRenderer()
+
+
+def render_json(data, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Render data exactly like the DRF views' default renderer would.
+    """
+    response = HttpResponse(
+        _renderer.render(data), status=status_code, content_type="application/json"
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def render_exception(exc, authenticator=None):
+    """
+    Turn an APIException into the response DRF's exception handler produces.
+    """
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {"detail": exc.detail}
+    headers = {}
+    if getattr(exc, "wait", None):
+        headers["Retry-After"] = "%d" % exc.wait
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)) and authenticator:
+        headers["WWW-Authenticate"] = authenticator.authenticate_header(None)
+    return render_json(data, exc.status_code, headers)
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async base view: CSRF-exempt like DRF's APIView, JWT-authenticated,
+    with DRF-shaped error responses.
+    """
+
+    authenticator = CachedJWTAuthentication()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def authenticate(self, request):
+        """
+        Return the authenticated user or None for anonymous requests;
+        raise AuthenticationFailed for invalid tokens.
+        """
+        header = self.authenticator.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.authenticator.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.authenticator.get_validated_token(raw_token)
+        # An in-process cache lookup does not block, so it can run on the loop
+        if isinstance(caches["auth"], LocMemCache):
+            user = self.authenticator.get_cached_user(validated_token)
+            if user is not None:
+                return user
+        return await sync_to_async(self.authenticator.get_user)(validated_token)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user_from_token = await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return render_exception(exc, self.authenticator)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed(request.method)
+
+
+@query_budget(1)
+class AsyncLogEntryView(AsyncAPIView):
+    """
+    Async LogEntryAPIView: single entries, JSON arrays and NDJSON batches.
+    """
+
+    json_parse_constant = drf_json.strict_constant if api_settings.STRICT_JSON else None
+
+    async def post(self, request, *args, **kwargs):
+        content_type = request.content_type
+        encoding = request.encoding or "utf-8"
+
+        if content_type == "application/json":
+            body = request.body
+            if not body:
+                data = {}
+            else:
+                try:
+                    data = json_codec.loads(body, self.json_parse_constant, encoding)
+                except ValueError as exc:
+                    raise exceptions.ParseError(f"JSON parse error - {exc}")
+        elif content_type == NDJSONParser.media_type:
+            data = NDJSONParser().parse(io.BytesIO(request.body), parser_context={"encoding": encoding})
+        else:
+            # Form and multipart bodies keep going through DRF's parsers
+            return await sync_to_async(LogEntryAPIView.as_view())(request, *args, **kwargs)
+
+        if isinstance(data, list):
+            summary, status_code = ingest_log_batch(request, data)
+            return render_json(summary, status_code)
+
+        validated, errors = validate_log_entry(data)
+        if errors is not None:
+            count_invalid_log_entries(1)
+            return render_json(errors, status.HTTP_400_BAD_REQUEST)
+        if not admit_entries(request, [validated]):
+            raise exceptions.Throttled()
+        emit_log_entries([validated])
+        return render_json({"status": "logged"})
+
+
+@query_budget(2)
+class AsyncUserProfileView(AsyncAPIView):
+    """
+    Async UserProfileAPIView: returns the authenticated user's profile.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user_from_token
+        if user is None:
+            raise exceptions.NotAuthenticated()
+        if isinstance(caches["default"], LocMemCache):
+            # Served from the cache inline; a miss reads the database in a thread
+            rendered = get_cached_profile(user.pk)
+            if rendered is not None:
+                return profile_response(request, user.pk, rendered)
+        return await sync_to_async(profile_response)(request, user.pk)
@@ -0,0 +1,116 @@
+"""
+JWT authentication backed by a small user cache.
+
+The signed token identifies the user; the user's non-secret fields come from
+the "auth" cache, so most authenticated requests make no database query. A
+cached user is rebuilt as a model instance with only those fields loaded:
+anything else (such as the password) is a deferred field fetched on first
+access, and save() only writes loaded fields. Entries expire after
+AUTH_USER_CACHE_TTL seconds and are invalidated whenever the user is saved
+(see backend/signals.py).
+"""
+
+import functools
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+# User fields kept in the cache; never include the password hash
+USER_CACHE_FIELDS = (
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "last_login",
+    "date_joined",
+)
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+@functools.cache
+def cached_field_names():
+    # Model.from_db() expects loaded fields in concrete field order
+    return tuple(
+        field.attname
+        for field in get_user_model()._meta.concrete_fields
+        if field.attname in USER_CACHE_FIELDS
+    )
+
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    caches["auth"].delete(user_cache_key(user_id))
+
+
+def auth_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from the auth cache and
+    only queries the database on a cache miss.
+    """
+
+    def get_user(self, validated_token):
+        # Revocation checks compare against the password hash, which is never cached
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            _count("misses")
+            user = super().get_user(validated_token)
+            cache_user(user)
+        return user
+
+    def get_cached_user(self, validated_token):
+        """
+        Return the token's user from the auth cache without touching the
+        database, or None on a cache miss.
+        """
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return None
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = caches["auth"].get(user_cache_key(user_id))
+        if values is None:
+            return None
+
+        _count("hits")
+        user = get_user_model().from_db(DEFAULT_DB_ALIAS, cached_field_names(), values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+def cache_user(user):
+    caches["auth"].set(
+        user_cache_key(getattr(user, api_settings.USER_ID_FIELD)),
+        tuple(getattr(user, field) for field in cached_field_names()),
+    )
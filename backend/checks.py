@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_default_cache_shared(app_configs, **kwargs):
+    """
+    Profile and layout renderings are invalidated through the "default"
+    cache; with several server processes each keeping its own, the others
+    serve the previous rendering until it expires.
+    """
+    if settings.WEB_CONCURRENCY > 1 and settings.DEFAULT_CACHE_PER_PROCESS:
+        return [
+            Warning(
+                "The default cache is local to each of the WEB_CONCURRENCY server processes.",
+                hint="Point CACHE_BACKEND at a shared cache such as Redis, so writes invalidate "
+                "cached profiles and layouts in every process.",
+                id="backend.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,65 @@
+"""
+Dashboard layouts: rendering, ETags and the per-user cache.
+
+A rendered layout (ETag plus JSON body) is cached in the "default" cache per
+user, so loads and conditional GETs do not touch the database. Every write
+to a DashboardLayout invalidates the entry once the transaction commits
+(see signals.py). The ETag is a hash of the body, so it only matches the
+content it was served with, even if a deleted layout starts over from
+version 0.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+
+from .models import DashboardLayout
+from .renderers import ORJSONRenderer
+
+_renderer = ORJSONRenderer()
+
+
+def layout_cache_key(user_id):
+    return f"dashboard-layout:{user_id}"
+
+
+def render_layout(version, widgets):
+    """
+    Return ``(etag, body)`` of a layout.
+    """
+    body = _renderer.render({"version": version, "widgets": widgets})
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest(), body
+
+
+def get_rendered_layout(user):
+    """
+    Return ``(etag, body)`` of the user's layout, from the cache when possible.
+    Users without a saved layout get an empty one at version 0.
+    """
+    cache = caches["default"]
+    key = layout_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    layout = DashboardLayout.objects.filter(user=user).values_list("version", "widgets").first()
+    version, widgets = layout if layout is not None else (0, [])
+    rendered = render_layout(version, widgets)
+    cache.set(key, rendered, settings.DASHBOARD_CACHE_TTL)
+    return rendered
+
+
+def invalidate_layout(user_id):
+    caches["default"].delete(layout_cache_key(user_id))
+
+
+def etag_matches(header, etag):
+    """
+    Whether an If-Match / If-None-Match header value matches ``etag``.
+    """
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return "*" in etags or etag in etags
@@ -0,0 +1,285 @@
+"""
+Password hashers that compute in a bounded process pool.
+
+PooledPBKDF2PasswordHasher and PooledArgon2PasswordHasher produce exactly
+the hashes of Django's PBKDF2PasswordHasher and Argon2PasswordHasher, but
+the expensive key derivation runs in a worker process, so request threads
+only wait on a future and a burst of logins cannot occupy every worker
+thread with CPU work.
+
+At most HASHING_MAX_PENDING hashes may be queued or running per process;
+past that, requests wait up to HASHING_QUEUE_TIMEOUT seconds for a slot and
+then fail with HashingOverloaded (503). Work factors come from settings, so
+changing them makes Django rehash passwords on the next successful login.
+Bulk jobs hash many passwords at once with ``encode_many``, which keeps one
+hash per worker in flight and waits for slots instead of failing.
+"""
+
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+from django.utils.crypto import pbkdf2
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .latency import LatencyHistogram
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password operations in progress, try again shortly."
+    default_code = "hashing_overloaded"
+
+
+# Worker functions; they run in the pool and return (result, compute seconds)
+
+def _pbkdf2_worker(password, salt, iterations, digest_name):
+    started = time.perf_counter()
+    derived = pbkdf2(password, salt, iterations, digest=getattr(hashlib, digest_name))
+    return derived, time.perf_counter() - started
+
+
+def _argon2_hash_worker(password, salt, params):
+    import argon2
+
+    started = time.perf_counter()
+    data = argon2.low_level.hash_secret(
+        password.encode(),
+        salt.encode(),
+        time_cost=params.time_cost,
+        memory_cost=params.memory_cost,
+        parallelism=params.parallelism,
+        hash_len=params.hash_len,
+        type=params.type,
+    )
+    return data, time.perf_counter() - started
+
+
+def _argon2_verify_worker(encoded, password):
+    import argon2
+
+    started = time.perf_counter()
+    try:
+        valid = argon2.PasswordHasher().verify(encoded, password)
+    except argon2.exceptions.VerificationError:
+        valid = False
+    return valid, time.perf_counter() - started
+
+
+class HashingPool:
+    """
+    Lazily started process pool with a bound on pending work and wait/compute
+    histograms. A forked worker process gets a fresh pool; with 0 workers
+    the work runs on the calling thread.
+    """
+
+    def __init__(self, workers, max_pending, queue_timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.wait = LatencyHistogram()
+        self.compute = LatencyHistogram()
+        self.completed = 0
+        self.rejected = 0
+        self.max_in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # forkserver children do not inherit the request threads and open sockets
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, function, *args):
+        """
+        Run ``function(*args)`` in the pool and return its result, or raise
+        HashingOverloaded when no slot frees up in time.
+        """
+        if self.queue_timeout > 0:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloaded()
+        try:
+            with self._lock:
+                self._in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            submitted = time.perf_counter()
+            if self.workers:
+                result, compute_seconds = self._get_executor().submit(function, *args).result()
+            else:
+                # No pool: compute inline, still bounded and measured
+                result, compute_seconds = function(*args)
+            total = time.perf_counter() - submitted
+            with self._lock:
+                self.completed += 1
+                self.compute.record(compute_seconds)
+                # Queueing plus the round trip to the worker
+                self.wait.record(max(total - compute_seconds, 0.0))
+            return result
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def map(self, function, calls, concurrency=None):
+        """
+        Run ``function(*args)`` for every tuple in ``calls`` and return the
+        results in order. At most ``concurrency`` calls (by default one per
+        worker) are in flight; they wait for slots rather than failing, and
+        leave the other slots to requests.
+        """
+        window = threading.BoundedSemaphore(concurrency or self.workers or 1)
+        futures = []
+        for args in calls:
+            window.acquire()
+            self._slots.acquire()
+            with self._lock:
+                self._in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            submitted = time.perf_counter()
+            if self.workers:
+                future = self._get_executor().submit(function, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(function(*args))
+                except Exception as exc:
+                    future.set_exception(exc)
+            future.add_done_callback(partial(self._map_done, window, submitted))
+            futures.append(future)
+        return [future.result()[0] for future in futures]
+
+    def _map_done(self, window, submitted, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.exception() is None:
+                compute_seconds = future.result()[1]
+                self.completed += 1
+                self.compute.record(compute_seconds)
+                self.wait.record(max(time.perf_counter() - submitted - compute_seconds, 0.0))
+        self._slots.release()
+        window.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait": self.wait.summary(),
+                "compute": self.compute.summary(),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    workers=settings.HASHING_WORKERS,
+                    max_pending=settings.HASHING_MAX_PENDING,
+                    queue_timeout=settings.HASHING_QUEUE_TIMEOUT,
+                )
+    return _pool
+
+
+def hashing_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher computing in the hashing pool, with the iteration
+    count taken from PASSWORD_PBKDF2_ITERATIONS.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        derived = get_hashing_pool().run(_pbkdf2_worker, password, salt, iterations, self.digest().name)
+        hash = base64.b64encode(derived).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+    def encode_many(self, passwords):
+        """
+        Hash every password with a fresh salt, in parallel across the pool.
+        """
+        iterations = self.iterations
+        digest = self.digest().name
+        salts = [self.salt() for _ in passwords]
+        derived = get_hashing_pool().map(
+            _pbkdf2_worker, [(password, salt, iterations, digest) for password, salt in zip(passwords, salts)]
+        )
+        return [
+            "%s$%d$%s$%s" % (self.algorithm, iterations, salt, base64.b64encode(key).decode("ascii").strip())
+            for salt, key in zip(salts, derived)
+        ]
+
+
+class PooledArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2PasswordHasher computing in the hashing pool, with its cost
+    parameters taken from the PASSWORD_ARGON2_* settings.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        data = get_hashing_pool().run(_argon2_hash_worker, password, salt, self.params())
+        return self.algorithm + data.decode("ascii")
+
+    def encode_many(self, passwords):
+        """
+        Hash every password with a fresh salt, in parallel across the pool.
+        """
+        params = self.params()
+        calls = [(password, self.salt(), params) for password in passwords]
+        hashes = get_hashing_pool().map(_argon2_hash_worker, calls)
+        return [self.algorithm + data.decode("ascii") for data in hashes]
+
+    def verify(self, password, encoded):
+        algorithm, rest = encoded.split("$", 1)
+        assert algorithm == self.algorithm
+        return get_hashing_pool().run(_argon2_verify_worker, "$" + rest, password)
@@ -0,0 +1,88 @@
+"""
+JSON encoding and decoding on orjson, for the default DRF renderer and
+parser (ORJSONRenderer and ORJSONParser) and for the code that handles JSON
+bodies outside DRF (async views, logging middlewares, cached renderings).
+With JSON_CODEC = "json" everything goes through the stdlib json module.
+
+orjson works on bytes directly and produces what DRF's JSONRenderer and
+JSONParser do with the project's REST_FRAMEWORK settings (compact, UTF-8,
+strict). Where it would differ, the stdlib json module takes over:
+
+- values orjson cannot encode (integers past 64 bits, non-string keys) and
+  documents it rejects (lone surrogates, NaN, numbers out of range) go to
+  json, which also produces the error messages;
+- digit runs long enough to be an integer past 64 bits, which orjson would
+  read as a float, are decoded with json;
+- dates, times and datetimes are formatted by DRF's encoder.
+
+Two differences remain: floats in exponent form are written without the
+exponent's sign and padding (1e16 and 1e-7 rather than 1e+16 and 1e-07,
+the same values), and NaN and infinities are written as null where DRF
+would fail the response.
+"""
+
+import codecs
+import json
+
+import orjson
+from django.conf import settings
+from rest_framework.utils import encoders
+
+# Enough digits to be an integer outside orjson's 64-bit range, looked for
+# in the body with every digit mapped to "0" (far cheaper than a regex)
+_LONG_DIGITS = b"0" * 19
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+
+_encoder = encoders.JSONEncoder()
+
+# DRF's encoder formats these (datetimes to milliseconds, "Z" for UTC)
+DUMPS_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def enabled():
+    return settings.JSON_CODEC == "orjson"
+
+
+def is_utf8(encoding):
+    return codecs.lookup(encoding).name == "utf-8"
+
+
+def dumps(data):
+    """
+    Encode ``data`` as compact UTF-8 JSON, like DRF's JSONRenderer.
+    """
+    try:
+        body = orjson.dumps(data, default=_encoder.default, option=DUMPS_OPTIONS)
+    except TypeError:
+        body = json.dumps(
+            data, cls=encoders.JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+    # As in JSONRenderer: keep the output safe to embed in a <script> tag
+    if b"\xe2\x80" in body:
+        body = body.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return body
+
+
+def loads(data, parse_constant=None, encoding="utf-8"):
+    """
+    Decode a JSON document from bytes like ``json.loads(data.decode(encoding))``.
+    """
+    if enabled() and is_utf8(encoding) and _LONG_DIGITS not in data.translate(_DIGITS_TO_ZERO):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data.decode(encoding), parse_constant=parse_constant)
+
+
+def dumps_indented(data):
+    """
+    Pretty-print ``data`` for log messages, two spaces per level like
+    ``json.dumps(data, indent=2)`` but with non-ASCII characters left as is.
+    """
+    if enabled():
+        try:
+            return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(data, indent=2, default=str)
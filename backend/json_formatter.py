@@ -0,0 +1,12 @@
+"""
+JSON log formatter, kept out of log_handlers.py so that pythonjsonlogger is
+only imported once a JSON formatter is built.
+"""
+
+from pythonjsonlogger import jsonlogger
+
+from .log_handlers import CachingFormatterMixin
+
+
+class CachingJsonFormatter(CachingFormatterMixin, jsonlogger.JsonFormatter):
+    pass
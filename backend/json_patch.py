@@ -0,0 +1,148 @@
+"""
+Minimal JSON Patch (RFC 6902) implementation: add, remove, replace, move,
+copy and test, with JSON Pointer (RFC 6901) paths.
+"""
+
+import copy
+
+
+class JSONPatchError(ValueError):
+    """
+    The patch is malformed or does not apply to the document.
+    """
+
+
+class JSONPatchConflict(JSONPatchError):
+    """
+    A "test" operation failed.
+    """
+
+
+def parse_pointer(pointer):
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise JSONPatchError(f"Invalid JSON pointer {pointer!r}.")
+    if not pointer:
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _list_index(container, token, allow_end=False):
+    if allow_end and token == "-":
+        return len(container)
+    # isdigit() alone accepts digits int() cannot read, such as "²"
+    if not (token.isascii() and token.isdigit()) or (token != "0" and token.startswith("0")):
+        raise JSONPatchError(f"Invalid array index {token!r}.")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JSONPatchError(f"Array index {index} out of range.")
+    return index
+
+
+def _json_equal(a, b):
+    """
+    Equality as RFC 6902 defines it for "test": same JSON type (booleans
+    are not numbers), numbers by value, arrays and objects member by member.
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(_json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(map(_json_equal, a, b))
+    return type(a) is type(b) and a == b
+
+
+def _resolve(document, tokens):
+    """
+    Return the value at ``tokens``.
+    """
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JSONPatchError(f"Path member {token!r} does not exist.")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_list_index(value, token)]
+        else:
+            raise JSONPatchError(f"Cannot traverse into {type(value).__name__} at {token!r}.")
+    return value
+
+
+def _add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    else:
+        raise JSONPatchError(f"Cannot add to {type(parent).__name__}.")
+    return document
+
+
+def _remove(document, tokens):
+    if not tokens:
+        raise JSONPatchError("Cannot remove the whole document.")
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JSONPatchError(f"Path member {token!r} does not exist.")
+        return document, parent.pop(token)
+    if isinstance(parent, list):
+        return document, parent.pop(_list_index(parent, token))
+    raise JSONPatchError(f"Cannot remove from {type(parent).__name__}.")
+
+
+def apply_patch(document, operations):
+    """
+    Apply a list of patch operations to a copy of ``document`` and return
+    the result. Raises JSONPatchError (or JSONPatchConflict for a failed
+    "test") without modifying ``document``.
+    """
+    if not isinstance(operations, list):
+        raise JSONPatchError("A JSON patch must be a list of operations.")
+    document = copy.deepcopy(document)
+
+    for number, operation in enumerate(operations):
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JSONPatchError(f"Operation {number} must be an object with \"op\" and \"path\".")
+        op = operation["op"]
+        tokens = parse_pointer(operation["path"])
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JSONPatchError(f"Operation {number} ({op}) requires a \"value\".")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JSONPatchError(f"Operation {number} ({op}) requires \"from\".")
+
+        if op == "add":
+            document = _add(document, tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            document, _ = _remove(document, tokens)
+        elif op == "replace":
+            if not tokens:
+                document = copy.deepcopy(operation["value"])
+            else:
+                _resolve(document, tokens)
+                document, _ = _remove(document, tokens)
+                document = _add(document, tokens, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = parse_pointer(operation["from"])
+            if tokens[:len(source)] == source and tokens != source:
+                raise JSONPatchError(f"Operation {number} moves a value into itself.")
+            document, value = _remove(document, source)
+            document = _add(document, tokens, value)
+        elif op == "copy":
+            value = copy.deepcopy(_resolve(document, parse_pointer(operation["from"])))
+            document = _add(document, tokens, value)
+        elif op == "test":
+            if not _json_equal(_resolve(document, tokens), operation["value"]):
+                raise JSONPatchConflict(f"Test failed at {operation['path']!r}.")
+        else:
+            raise JSONPatchError(f"Unknown operation {op!r}.")
+    return document
@@ -0,0 +1,114 @@
+"""
+In-process latency histograms, aggregated per route.
+
+Histograms use fixed, geometrically spaced buckets, so recording is a bisect
+plus a counter increment, and memory per route does not grow with traffic.
+Percentiles are interpolated within the matching bucket.
+"""
+
+import bisect
+import threading
+
+# Bucket upper bounds in seconds: 50us growing by 25% up to about 2 minutes
+BUCKET_BOUNDS = []
+_bound = 0.00005
+while _bound < 120:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.25
+del _bound
+
+# Other methods share one label value, so clients cannot create series
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram of durations in seconds.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        # The last bucket collects everything above the largest bound
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        Estimate the q-th quantile (0 < q <= 1) in seconds.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if not bucket_count:
+                continue
+            if seen + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class LatencyRegistry:
+    """
+    Thread-safe collection of histograms keyed by "METHOD route".
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: histogram.summary() for key, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = LatencyRegistry()
+
+
+def method_label(method):
+    return method if method in METHODS else "other"
+
+
+def route_key(request):
+    """
+    Name the route a request resolved to ("GET api/profile/"), so that paths
+    with parameters share one histogram and unknown paths share another.
+    """
+    match = getattr(request, "resolver_match", None)
+    route = match.route if match is not None else "<unresolved>"
+    return f"{method_label(request.method)} {route}"
@@ -0,0 +1,179 @@
+"""
+Windowed deduplication of repeated frontend log messages.
+
+Records with the same level, message and meta shape (the nested keys and
+value types, not the values) are collapsed for LOG_AGGREGATION_WINDOW
+seconds. The first record is logged straight away; the repeats are counted,
+and when the window closes a single summary record is logged with the
+count, first/last seen times and the meta of the first record as a sample.
+
+At most LOG_AGGREGATION_MAX_KEYS windows are kept open; opening another one
+closes the least recently used window early. Log volume therefore grows
+with the number of distinct messages rather than with the raw entry count.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+def meta_shape(value):
+    """
+    Return a hashable description of a meta value's structure.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), meta_shape(child)) for key, child in value.items()))
+    if isinstance(value, list):
+        return ("list", tuple(sorted({meta_shape(child) for child in value}, key=repr)))
+    return type(value).__name__
+
+
+class _Window:
+    __slots__ = ("level", "message", "meta", "count", "opened", "first_seen", "last_seen")
+
+    def __init__(self, level, message, meta, now, wall):
+        self.level = level
+        self.message = message
+        self.meta = meta
+        self.count = 1
+        self.opened = now
+        self.first_seen = wall
+        self.last_seen = wall
+
+
+class LogAggregator:
+    """
+    Collapses identical records logged on ``logger`` within ``window`` seconds.
+    """
+
+    def __init__(self, logger, window, max_keys):
+        self.logger = logger
+        self.window = window
+        self.max_keys = max_keys
+        self.received = 0
+        self.suppressed = 0
+        self.summaries = 0
+        self.evicted = 0
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, level, message, meta):
+        self._ensure_flusher()
+        key = (level, message, meta_shape(meta))
+        now = time.monotonic()
+        expired = None
+        evicted = []
+
+        with self._lock:
+            self.received += 1
+            current = self._windows.get(key)
+            if current is not None and now - current.opened >= self.window:
+                expired = self._windows.pop(key)
+                current = None
+            if current is not None:
+                current.count += 1
+                current.last_seen = time.time()
+                self._windows.move_to_end(key)
+                self.suppressed += 1
+                return
+            self._windows[key] = _Window(level, message, meta, now, time.time())
+            while len(self._windows) > self.max_keys:
+                evicted.append(self._windows.popitem(last=False)[1])
+                self.evicted += 1
+
+        # Log outside the lock; handlers may be slow
+        for closed in (expired, *evicted):
+            if closed is not None:
+                self._log_summary(closed)
+        self.logger.log(level, message, extra={"meta": meta})
+
+    def flush(self, force=False):
+        """
+        Log summaries for windows that have closed (every window with force).
+        """
+        now = time.monotonic()
+        with self._lock:
+            closed_keys = [
+                key for key, window in self._windows.items() if force or now - window.opened >= self.window
+            ]
+            closed = [self._windows.pop(key) for key in closed_keys]
+        for window in closed:
+            self._log_summary(window)
+
+    def _log_summary(self, window):
+        if window.count < 2:
+            return
+        repeats = window.count - 1
+        with self._lock:
+            self.summaries += 1
+        self.logger.log(
+            window.level,
+            f"{window.message} [repeated {repeats} more time{'s' if repeats > 1 else ''}]",
+            extra={
+                "meta": window.meta,
+                "count": window.count,
+                "first_seen": datetime.fromtimestamp(window.first_seen, timezone.utc).isoformat(),
+                "last_seen": datetime.fromtimestamp(window.last_seen, timezone.utc).isoformat(),
+            },
+        )
+
+    def _ensure_flusher(self):
+        # Also restarts the flusher in a forked worker, where the thread is gone
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is thread:
+                self._thread = threading.Thread(target=self._run, name="log-aggregation", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = min(self.window / 2, 1.0)
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush(force=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window": self.window,
+                "open_windows": len(self._windows),
+                "max_keys": self.max_keys,
+                "received": self.received,
+                "suppressed": self.suppressed,
+                "summaries": self.summaries,
+                "evicted": self.evicted,
+            }
+
+
+_aggregator = None
+
+
+def get_aggregator():
+    """
+    Return the process-wide aggregator for the frontend logger, or None when
+    LOG_AGGREGATION_WINDOW is 0.
+    """
+    global _aggregator
+    if _aggregator is None and settings.LOG_AGGREGATION_WINDOW > 0:
+        _aggregator = LogAggregator(
+            logging.getLogger("frontend_logger"),
+            window=settings.LOG_AGGREGATION_WINDOW,
+            max_keys=settings.LOG_AGGREGATION_MAX_KEYS,
+        )
+        atexit.register(_aggregator.stop)
+    return _aggregator
+
+
+def aggregation_stats():
+    return _aggregator.stats() if _aggregator is not None else None
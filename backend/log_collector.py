@@ -0,0 +1,506 @@
+"""
+Single-writer log collector shared by all worker processes.
+
+When ``LOG_COLLECTOR_SOCKET`` is set, the file handlers of every configured
+logger are replaced in each worker by a CollectorHandler: records are
+formatted in the worker as before, then appended to an in-memory buffer
+that one sender thread per process ships to the collector over a Unix
+socket. The request thread never waits: while the collector is down or
+slow the buffer fills up, and once full the oldest records are dropped
+(and counted). The sender reconnects with backoff.
+
+The collector (``manage.py log_collector``) is the only process that opens
+the files in LOGGING: it builds the same file handlers by name, writes each
+batch with a single write per file and flushes once per batch, so records
+from different workers never interleave and every file is rotated by one
+process only.
+
+Wire format, per frame: a ``>II`` header (body length, record count), then
+per target file a ``>HI`` header (name length, text length), the handler
+name and the newline-terminated records, all UTF-8. After writing and
+flushing, the collector answers with a ``>I`` count of frames done; the
+worker keeps each frame until it is acknowledged, so frames the collector
+never read when it stopped are sent again to its successor.
+
+Delivery is at least once: a frame written but not yet acknowledged when
+the connection drops is written again after the worker reconnects, so the
+files may then hold its records twice. A frame that cannot be written
+(e.g. a failing handler) is logged, counted and acknowledged, so it does
+not stop the collector or come back forever.
+"""
+
+import atexit
+import collections
+import logging
+import os
+import select
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+FRAME_HEADER = struct.Struct(">II")
+TARGET_HEADER = struct.Struct(">HI")
+# Sent back by the collector: frames written (and flushed) since the last ack
+ACK = struct.Struct(">I")
+
+logger = logging.getLogger(__name__)
+
+# Collector handlers installed by install_collector_handlers(), keyed by logger name
+_installed = {}
+_client = None
+_client_lock = threading.Lock()
+
+
+class CollectorClient:
+    """
+    Per-process buffer and sender thread shipping records to the collector.
+
+    At most ``window`` frames are in flight; a frame is kept until the
+    collector acknowledges having written it, and every unacknowledged
+    frame is sent again after reconnecting.
+    """
+
+    def __init__(self, path, buffer_size, batch_size, window=16, ack_timeout=10.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._unacked = collections.deque()
+        self._acks = bytearray()
+        self._wake = threading.Event()
+        self._closing = False
+        self._deadline = None
+        self._socket = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def submit(self, target, text):
+        """
+        Queue one formatted record (newline-terminated) for ``target``;
+        never blocks.
+        """
+        if self._thread is None:
+            self._start()
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            # append() pushes the oldest record out
+            self.dropped += 1
+        buffer.append((target, text))
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-collector-sender", daemon=True)
+                self._thread.start()
+
+    def _next_frame(self):
+        buffer = self._buffer
+        texts = {}
+        count = 0
+        try:
+            for _ in range(self.batch_size):
+                target, text = buffer.popleft()
+                texts.setdefault(target, []).append(text)
+                count += 1
+        except IndexError:
+            pass
+        parts = [b""]
+        for target, lines in texts.items():
+            name = target.encode()
+            text = "".join(lines).encode("utf-8", "backslashreplace")
+            parts += (TARGET_HEADER.pack(len(name), len(text)), name, text)
+        parts[0] = FRAME_HEADER.pack(sum(map(len, parts)), count)
+        return b"".join(parts), count
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(self.ack_timeout)
+        self._socket = sock
+        self._acks.clear()
+        self.reconnects += 1
+        for frame, _ in self._unacked:
+            sock.sendall(frame)
+
+    def _disconnect(self):
+        if self._socket is not None:
+            # Acks the collector sent before closing need no resend
+            try:
+                while select.select([self._socket], [], [], 0)[0]:
+                    data = self._socket.recv(4096)
+                    if not data:
+                        break
+                    self._count_acks(data)
+            except OSError:
+                pass
+            self._socket.close()
+            self._socket = None
+
+    def _read_acks(self, block):
+        # recv() on a socket with a timeout waits even with MSG_DONTWAIT
+        if not block and not select.select([self._socket], [], [], 0)[0]:
+            return
+        data = self._socket.recv(4096)
+        if not data:
+            raise ConnectionResetError("The log collector closed the connection")
+        self._count_acks(data)
+
+    def _count_acks(self, data):
+        acks = self._acks
+        acks += data
+        while len(acks) >= ACK.size:
+            (frames,) = ACK.unpack_from(acks)
+            del acks[:ACK.size]
+            for _ in range(frames):
+                self.sent += self._unacked.popleft()[1]
+
+    def _pump(self):
+        if self._socket is None:
+            self._connect()
+        while True:
+            self._read_acks(block=False)
+            if self._buffer and len(self._unacked) < self.window:
+                frame = self._next_frame()
+                self._unacked.append(frame)
+                self._socket.sendall(frame[0])
+            elif self._unacked and (self._buffer or self._closing):
+                self._read_acks(block=True)
+            else:
+                return
+
+    def _run(self):
+        backoff = 0.05
+        while True:
+            self._wake.wait(0.1 if self._unacked else None)
+            self._wake.clear()
+            try:
+                self._pump()
+                backoff = 0.05
+            except OSError:
+                # Keep buffering; unacknowledged frames go first after reconnecting
+                self._disconnect()
+                if self._closing and time.monotonic() >= self._deadline:
+                    return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 2.0)
+                self._wake.set()
+                continue
+            if self._closing and not self._buffer and not self._unacked:
+                self._disconnect()
+                return
+
+    def close(self, timeout=2.0):
+        """
+        Send what is buffered (waiting at most ``timeout`` seconds) and stop.
+        """
+        self._deadline = time.monotonic() + timeout
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "socket": self.path,
+            "connected": self._socket is not None,
+            "buffered": len(self._buffer),
+            "capacity": self._buffer.maxlen,
+            "in_flight": sum(count for _, count in list(self._unacked)),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+class CollectorHandler(logging.Handler):
+    """
+    Format records here and ship them to the collector, which writes them to
+    the file handler named ``target``.
+    """
+
+    def __init__(self, target, client):
+        super().__init__()
+        self.target = target
+        self.client = client
+
+    def emit(self, record):
+        try:
+            self.client.submit(self.target, self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = CollectorClient(
+                settings.LOG_COLLECTOR_SOCKET, settings.LOG_COLLECTOR_BUFFER_SIZE, settings.LOG_COLLECTOR_BATCH_SIZE
+            )
+        return _client
+
+
+def install_collector_handlers(logger_names):
+    """
+    Replace the file handlers of each named logger with CollectorHandlers
+    keeping their name, level, formatter and filters, and close the files.
+    """
+    client = get_client()
+    for name in logger_names:
+        logger = logging.getLogger(name or None)
+        for handler in [h for h in logger.handlers if isinstance(h, logging.FileHandler)]:
+            collector_handler = CollectorHandler(handler.name, client)
+            collector_handler.setLevel(handler.level)
+            collector_handler.setFormatter(handler.formatter)
+            for log_filter in handler.filters:
+                collector_handler.addFilter(log_filter)
+            logger.removeHandler(handler)
+            handler.close()
+            logger.addHandler(collector_handler)
+            _installed.setdefault(name, []).append(collector_handler)
+
+
+def remove_collector_handlers():
+    """
+    Detach every installed CollectorHandler, e.g. in the collector itself.
+    """
+    while _installed:
+        name, handlers = _installed.popitem()
+        logger = logging.getLogger(name or None)
+        for handler in handlers:
+            logger.removeHandler(handler)
+
+
+def collector_stats():
+    """
+    Return the sender's counters, or None when the collector is not used.
+    """
+    return _client.stats() if _client is not None else None
+
+
+def file_handlers(logging_settings):
+    """
+    Build the file handlers of a LOGGING dict by name, without formatters:
+    the collector receives records already formatted.
+    """
+    handlers = {}
+    for name, handler_config in logging_settings.get("handlers", {}).items():
+        handler_class = import_string(handler_config["class"])
+        if not issubclass(handler_class, logging.FileHandler):
+            continue
+        kwargs = {
+            key: value for key, value in handler_config.items()
+            if key not in ("class", "level", "formatter", "filters")
+        }
+        handlers[name] = handler_class(**kwargs)
+    return handlers
+
+
+class LogCollector:
+    """
+    Receive frames from workers on a Unix socket and write them to
+    ``handlers`` (file handlers by name) from this single process.
+    """
+
+    def __init__(self, path, handlers):
+        self.path = path
+        self.handlers = handlers
+        self.frames = 0
+        self.records = 0
+        self.bytes = 0
+        self.unknown_targets = 0
+        self.failed_frames = 0
+        self.connections = 0
+        self._selector = selectors.DefaultSelector()
+        # Per connection: [received bytes, frames written but not yet acknowledged]
+        self._connections = {}
+        self._stopping = False
+        self._cpu_started = time.process_time()
+
+    def listen(self):
+        if os.path.exists(self.path):
+            # Left behind by a collector that did not shut down cleanly
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, 0o660)
+        self._server.listen(128)
+        self._cpu_started = time.process_time()
+        self._server.setblocking(False)
+        self._selector.register(self._server, selectors.EVENT_READ)
+
+    def serve_forever(self, poll_interval=0.5, report=None, report_interval=0):
+        """
+        Serve until stop(); call ``report(stats)`` every ``report_interval``
+        seconds if given.
+        """
+        next_report = time.monotonic() + report_interval
+        while not self._stopping:
+            touched = set()
+            for key, _ in self._selector.select(poll_interval):
+                if key.fileobj is self._server:
+                    self._accept()
+                else:
+                    self._receive(key.fileobj, touched)
+            for handler in touched:
+                try:
+                    handler.flush()
+                except Exception:
+                    logger.exception("Log collector could not flush %s", getattr(handler, "baseFilename", handler))
+            self._acknowledge()
+            if report is not None and report_interval and time.monotonic() >= next_report:
+                report(self.stats())
+                next_report = time.monotonic() + report_interval
+
+    def stop(self):
+        self._stopping = True
+
+    def close(self):
+        # Frames still unread are not acknowledged; workers send them again
+        for sock in list(self._connections):
+            self._drop(sock)
+        self._selector.unregister(self._server)
+        self._server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        for handler in self.handlers.values():
+            handler.close()
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_READ)
+        self._connections[sock] = [bytearray(), 0]
+        self.connections += 1
+
+    def _drop(self, sock):
+        # An incomplete frame is discarded; the worker resends it on reconnect
+        self._selector.unregister(sock)
+        sock.close()
+        del self._connections[sock]
+
+    def _acknowledge(self):
+        for sock, connection in list(self._connections.items()):
+            if connection[1]:
+                try:
+                    sock.send(ACK.pack(connection[1]))
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    self._drop(sock)
+                    continue
+                connection[1] = 0
+
+    def _receive(self, sock, touched):
+        try:
+            data = sock.recv(1 << 20)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(sock)
+            return
+        connection = self._connections[sock]
+        buffer = connection[0]
+        buffer += data
+        offset = 0
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            length, count = FRAME_HEADER.unpack_from(buffer, offset)
+            end = offset + FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            try:
+                self._write_frame(memoryview(buffer)[offset + FRAME_HEADER.size:end], touched)
+            except Exception:
+                self.failed_frames += 1
+                logger.exception("Log collector could not write a frame of %d records", count)
+            connection[1] += 1
+            self.frames += 1
+            self.records += count
+            self.bytes += length
+            offset = end
+        if offset:
+            del buffer[:offset]
+
+    def _write_frame(self, body, touched):
+        offset = 0
+        with body:
+            while offset < len(body):
+                name_length, text_length = TARGET_HEADER.unpack_from(body, offset)
+                offset += TARGET_HEADER.size
+                name = bytes(body[offset:offset + name_length]).decode()
+                offset += name_length
+                text = str(body[offset:offset + text_length], "utf-8")
+                offset += text_length
+                handler = self.handlers.get(name)
+                if handler is None:
+                    self.unknown_targets += 1
+                    continue
+                write_block(handler, text)
+                touched.add(handler)
+
+    def stats(self):
+        return {
+            "connections": len(self._connections),
+            "accepted": self.connections,
+            "frames": self.frames,
+            "records": self.records,
+            "bytes": self.bytes,
+            "unknown_targets": self.unknown_targets,
+            "failed_frames": self.failed_frames,
+            # CPU time spent since listen()
+            "cpu_seconds": round(time.process_time() - self._cpu_started, 3),
+        }
+
+
+def write_block(handler, text):
+    if hasattr(handler, "write_block"):
+        handler.write_block(text)
+        return
+    with handler.lock:
+        if handler.stream is None:
+            handler.stream = handler._open()
+        handler.stream.write(text)
+
+
+def close_client(timeout=2.0):
+    """
+    Flush this process's buffered records to the collector and stop sending.
+    """
+    if _client is not None:
+        _client.close(timeout)
+
+
+def _reset_client_after_fork():
+    # The sender thread and its socket belong to the parent; start afresh
+    global _client
+    if _client is not None:
+        client = _client
+        _client = CollectorClient(client.path, client._buffer.maxlen, client.batch_size, client.window)
+        for handlers in _installed.values():
+            for handler in handlers:
+                handler.client = _client
+
+
+atexit.register(close_client)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client_after_fork)
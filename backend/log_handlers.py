@@ -0,0 +1,178 @@
+"""
+Log formatters and file handlers.
+
+CachingFormatter and CachingJsonFormatter (in json_formatter.py, so that
+pythonjsonlogger is only imported when needed) render a record once per
+formatter: when the same record reaches several handlers sharing a
+formatter (e.g. a logger's own handlers and the root handlers it propagates
+to), the later handlers reuse the first result. The timestamp is also
+rendered only once per record, for text and JSON alike. LazyFormatter
+builds its formatter on the first record.
+
+CompressingRotatingFileHandler rotates on size and/or time and gzips
+rotated segments in a background thread; write_block() appends batches of
+preformatted records for the log collector (see log_collector.py).
+"""
+
+import gzip
+import importlib
+import logging
+import logging.handlers
+import os
+import shutil
+import threading
+import time
+
+# Last record rendered on this thread, shared by every caching formatter
+_last_time = threading.local()
+
+
+class CachingFormatterMixin:
+    """
+    Remember the last record this formatter rendered on each thread. Handlers
+    fanning out one record call format() back to back on the same thread, so
+    a single slot is enough and records are never modified.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last = threading.local()
+
+    def format(self, record):
+        last = self._last
+        if getattr(last, "record", None) is record:
+            return last.output
+        output = super().format(record)
+        last.record = record
+        last.output = output
+        return output
+
+    def formatTime(self, record, datefmt=None):
+        cached = getattr(_last_time, "key", None)
+        if cached is not None and cached[0] is record and cached[1] == datefmt:
+            return _last_time.value
+        value = super().formatTime(record, datefmt)
+        _last_time.key = (record, datefmt)
+        _last_time.value = value
+        return value
+
+
+class CachingFormatter(CachingFormatterMixin, logging.Formatter):
+    pass
+
+
+class LazyFormatter(logging.Formatter):
+    """
+    Build the formatter class ``target`` (a dotted path) with ``kwargs`` when
+    the first record is formatted.
+    """
+
+    def __init__(self, target, **kwargs):
+        super().__init__()
+        self.target = target
+        self.kwargs = kwargs
+        self._formatter = None
+        self._lock = threading.Lock()
+
+    def get_formatter(self):
+        if self._formatter is None:
+            with self._lock:
+                if self._formatter is None:
+                    module, _, name = self.target.rpartition(".")
+                    self._formatter = getattr(importlib.import_module(module), name)(**self.kwargs)
+        return self._formatter
+
+    def format(self, record):
+        return self.get_formatter().format(record)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that also rolls over every ``interval`` ``when``
+    units ("S", "M", "H", "D" or "MIDNIGHT"; None for size only) and, with
+    ``compress``, gzips rotated files to ``<name>.N.gz`` in a background
+    thread. A rollover waits for the previous compression to finish, so
+    backups are always shifted as complete .gz files.
+    """
+
+    UNITS = {"S": 1, "M": 60, "H": 60 * 60, "D": 24 * 60 * 60}
+
+    def __init__(self, filename, mode="a", maxBytes=0, backupCount=0, encoding=None, delay=False,
+                 errors=None, when=None, interval=1, compress=True):
+        self.when = when.upper() if when else None
+        if self.when is not None and self.when != "MIDNIGHT" and self.when not in self.UNITS:
+            raise ValueError(f"Invalid rollover interval specified: {when}")
+        self.interval = interval
+        self.compress = compress
+        self._compressor = None
+        super().__init__(filename, mode, maxBytes, backupCount, encoding, delay, errors)
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self._rotate_and_compress
+        start = os.stat(self.baseFilename).st_mtime if os.path.exists(self.baseFilename) else time.time()
+        self.rolloverAt = self.compute_rollover(start)
+
+    def compute_rollover(self, current):
+        if self.when is None:
+            return None
+        if self.when == "MIDNIGHT":
+            local = time.localtime(current)
+            midnight = time.mktime((local.tm_year, local.tm_mon, local.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+            return midnight + (self.interval - 1) * self.UNITS["D"]
+        return current + self.interval * self.UNITS[self.when]
+
+    def shouldRollover(self, record):
+        if self.rolloverAt is not None and time.time() >= self.rolloverAt:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        self.wait_for_compression()
+        super().doRollover()
+        if self.rolloverAt is not None:
+            self.rolloverAt = self.compute_rollover(time.time())
+
+    def write_block(self, text):
+        """
+        Write already formatted records (``text``, newline-terminated) in one
+        go, rolling over first when they would not fit. The stream is not
+        flushed; the caller flushes once per batch.
+        """
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            position = self.stream.tell()
+            if (self.rolloverAt is not None and time.time() >= self.rolloverAt) or (
+                self.maxBytes > 0 and position and position + len(text) >= self.maxBytes
+            ):
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(text)
+
+    def _rotate_and_compress(self, source, dest):
+        # Rename synchronously, compress off the logging thread
+        if not os.path.exists(source):
+            return
+        pending = dest[:-len(".gz")]
+        os.replace(source, pending)
+        self._compressor = threading.Thread(
+            target=self._compress, args=(pending, dest), name="log-compress", daemon=True
+        )
+        self._compressor.start()
+
+    @staticmethod
+    def _compress(source, dest):
+        with open(source, "rb") as f_in, gzip.open(dest + ".tmp", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(dest + ".tmp", dest)
+        os.remove(source)
+
+    def wait_for_compression(self):
+        if self._compressor is not None:
+            self._compressor.join()
+            self._compressor = None
+
+    def close(self):
+        self.wait_for_compression()
+        super().close()
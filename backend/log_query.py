@@ -0,0 +1,313 @@
+"""
+Query the JSON log files (logs/*_json.log and their rotated segments).
+
+Plain files are read through mmap with a sparse sidecar index of
+(timestamp, byte offset) points, kept in LOG_QUERY_INDEX_DIR and extended
+incrementally as the file grows, so a time-range query starts reading near
+its first match. Compressed segments cannot be seeked; their time bounds
+are indexed once so segments outside the range are skipped, and matching
+ones are decompressed as a stream.
+
+Results are the original JSON lines, merged across files in time order and
+yielded one at a time, so memory does not grow with the amount of history.
+"""
+
+import glob
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+
+# A sparse index point every this many lines
+INDEX_EVERY = 256
+# Records from several processes are not strictly ordered; tolerate this much skew
+SKEW_SECONDS = 5.0
+
+_ASCTIME = re.compile(rb'^\{"asctime": "(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d),(\d{3})"')
+_ROTATED = re.compile(r"\.(\d+)(\.gz)?$")
+
+
+def line_timestamp(line):
+    """
+    Return the POSIX timestamp of a JSON log line, or None if it has none.
+    """
+    match = _ASCTIME.match(line)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, millis = map(int, match.groups())
+    # asctime is local time, which Django sets to TIME_ZONE
+    return datetime(year, month, day, hour, minute, second, millis * 1000).timestamp()
+
+
+class LogQuery:
+    """
+    Filters for one query. ``since``/``until`` are POSIX timestamps, ``level``
+    is a minimum level name, ``logger`` matches the logger and its children
+    and ``contains`` is a case-sensitive substring of the message.
+    """
+
+    def __init__(self, since=None, until=None, level=None, logger=None, contains=None):
+        self.since = since
+        self.until = until
+        self.min_level = logging.getLevelName(level.upper()) if level else None
+        if self.min_level is not None and not isinstance(self.min_level, int):
+            raise ValueError(f"Unknown level {level!r}")
+        self.logger = logger
+        self.contains = contains
+        # Cheap raw-bytes prefilter, valid when JSON encoding leaves the text unchanged
+        if contains and contains.isascii() and contains.isprintable() and not set(contains) & {'"', "\\"}:
+            self.raw_contains = contains.encode()
+        else:
+            self.raw_contains = None
+
+    def overlaps(self, first, last):
+        """
+        Whether records between ``first`` and ``last`` may match.
+        """
+        if self.since is not None and last < self.since - SKEW_SECONDS:
+            return False
+        if self.until is not None and first > self.until + SKEW_SECONDS:
+            return False
+        return True
+
+    def matches(self, timestamp, line):
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp > self.until:
+            return False
+        if self.raw_contains is not None and self.raw_contains not in line:
+            return False
+        if self.min_level is None and self.logger is None and self.contains is None:
+            return True
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return False
+        if self.min_level is not None and logging.getLevelName(record.get("levelname")) < self.min_level:
+            return False
+        if self.logger is not None:
+            name = record.get("name", "")
+            if name != self.logger and not name.startswith(self.logger + "."):
+                return False
+        if self.contains is not None and self.contains not in str(record.get("message", "")):
+            return False
+        return True
+
+    def past_end(self, timestamp):
+        return self.until is not None and timestamp > self.until + SKEW_SECONDS
+
+
+class LogStore:
+    """
+    The JSON log files in ``log_dir``, with their indexes in ``index_dir``.
+    """
+
+    def __init__(self, log_dir, index_dir):
+        self.log_dir = log_dir
+        self.index_dir = index_dir
+
+    def sources(self):
+        """
+        Names of the queryable logs, e.g. ["backend", "frontend", "root"].
+        """
+        pattern = os.path.join(self.log_dir, "*_json.log")
+        return sorted(os.path.basename(path)[:-len("_json.log")] for path in glob.glob(pattern))
+
+    def segments(self, source):
+        """
+        Files of one log, oldest first: rotated segments by descending number,
+        then the active file.
+        """
+        active = os.path.join(self.log_dir, f"{source}_json.log")
+        rotated = []
+        for path in glob.glob(glob.escape(active) + ".*"):
+            match = _ROTATED.search(path[len(active):])
+            if match is not None and match.end() == len(path) - len(active):
+                rotated.append((int(match.group(1)), path))
+        ordered = [path for _, path in sorted(rotated, reverse=True)]
+        if os.path.exists(active):
+            ordered.append(active)
+        return ordered
+
+    def query(self, query, sources=None, limit=None):
+        """
+        Yield matching lines (bytes, without the newline) in time order.
+        """
+        streams = [self._source_lines(source, query) for source in (sources or self.sources())]
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        for count, (_, line) in enumerate(merged):
+            if limit is not None and count >= limit:
+                return
+            yield line
+
+    def _source_lines(self, source, query):
+        for path in self.segments(source):
+            if path.endswith(".gz"):
+                yield from self._gzip_lines(path, query)
+            else:
+                yield from self._mapped_lines(path, query)
+
+    def _mapped_lines(self, path, query):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # Rotated away since it was listed
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as data:
+                points = self._update_index(path, data, size)
+                if points and query.until is not None and points[0][0] > query.until + SKEW_SECONDS:
+                    return
+                data.seek(self._start_offset(points, query))
+                for line in iter(data.readline, b""):
+                    timestamp = line_timestamp(line)
+                    if timestamp is None:
+                        continue
+                    if query.past_end(timestamp):
+                        return
+                    if query.matches(timestamp, line):
+                        yield timestamp, line.rstrip(b"\n")
+
+    def _gzip_lines(self, path, query):
+        bounds = self._segment_bounds(path)
+        if bounds is None or not query.overlaps(*bounds):
+            return
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                timestamp = line_timestamp(line)
+                if timestamp is None:
+                    continue
+                if query.past_end(timestamp):
+                    return
+                if query.matches(timestamp, line):
+                    yield timestamp, line.rstrip(b"\n")
+
+    @staticmethod
+    def _start_offset(points, query):
+        if query.since is None or not points:
+            return 0
+        # Last index point safely before the start of the range
+        target = query.since - SKEW_SECONDS
+        low, high = 0, len(points)
+        while low < high:
+            middle = (low + high) // 2
+            if points[middle][0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return points[low - 1][1] if low else 0
+
+    def _index_path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _load_index(self, name):
+        try:
+            with open(self._index_path(name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_index(self, name, index):
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = self._index_path(name)
+        # A file of its own per writer: threads of one process share the pid
+        with tempfile.NamedTemporaryFile("w", dir=self.index_dir, prefix=f"{name}.", suffix=".tmp", delete=False) as f:
+            try:
+                json.dump(index, f)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def _update_index(self, path, data, size):
+        """
+        Return the index points of a plain file, indexing only the bytes
+        added since the last call. A file whose first line changed was
+        rotated and is indexed from scratch.
+        """
+        name = os.path.basename(path) + ".idx.json"
+        first_line = data[:data.find(b"\n") + 1 or size]
+        fingerprint = hashlib.blake2b(first_line, digest_size=8).hexdigest()
+
+        index = self._load_index(name)
+        if index is None or index["fingerprint"] != fingerprint or index["size"] > size:
+            index = {"fingerprint": fingerprint, "size": 0, "lines": 0, "points": []}
+        if index["size"] == size:
+            return index["points"]
+
+        data.seek(index["size"])
+        offset = index["size"]
+        lines = index["lines"]
+        while offset < size:
+            line = data.readline()
+            if not line.endswith(b"\n"):
+                # Partially written last line; index it next time
+                break
+            if lines % INDEX_EVERY == 0:
+                timestamp = line_timestamp(line)
+                if timestamp is not None:
+                    index["points"].append((timestamp, offset))
+                else:
+                    lines -= 1
+            lines += 1
+            offset += len(line)
+
+        if offset != index["size"]:
+            index["size"] = offset
+            index["lines"] = lines
+            self._save_index(name, index)
+        return index["points"]
+
+    def _segment_bounds(self, path):
+        """
+        Return (first, last) timestamps of a compressed segment. Segments are
+        renamed on every rotation, so they are indexed by size and mtime.
+        """
+        stat = os.stat(path)
+        family = os.path.basename(path).split(".", 1)[0]
+        name = f"{family}-{stat.st_size}-{stat.st_mtime_ns}.bounds.json"
+        bounds = self._load_index(name)
+        if bounds is not None:
+            return bounds or None
+
+        first = last = None
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                timestamp = line_timestamp(line)
+                if timestamp is None:
+                    continue
+                first = timestamp if first is None else min(first, timestamp)
+                last = timestamp if last is None else max(last, timestamp)
+        bounds = [first, last] if first is not None else []
+        self._save_index(name, bounds)
+        self._prune_bounds(family)
+        return bounds or None
+
+    def _prune_bounds(self, family):
+        # Forget segments that have been rotated out of existence
+        live = set()
+        for path in glob.glob(os.path.join(self.log_dir, f"{glob.escape(family)}.*.gz")):
+            stat = os.stat(path)
+            live.add(f"{family}-{stat.st_size}-{stat.st_mtime_ns}.bounds.json")
+        for path in glob.glob(os.path.join(self.index_dir, f"{glob.escape(family)}-*.bounds.json")):
+            if os.path.basename(path) not in live:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def get_log_store():
+    return LogStore(settings.LOG_QUERY_DIR, settings.LOG_QUERY_INDEX_DIR)
@@ -0,0 +1,196 @@
+"""
+Queue-backed logging pipeline.
+
+When ``LOG_ASYNC`` is enabled, the file handlers attached to every configured
+logger are moved behind a bounded in-memory queue and written by a background
+thread per logger, so slow disks and rotation renames stay off the request
+thread. Non-file handlers (e.g. the Sentry EventHandler) keep running inline
+because they rely on the request's context.
+"""
+
+import atexit
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import threading
+
+from django.conf import settings
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_DROP_BELOW_LEVEL = "drop-below-level"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_BELOW_LEVEL)
+
+# Listeners started by install_queue_handlers(), keyed by logger name
+_listeners = {}
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler with a bounded queue and a configurable overflow policy:
+
+    - ``block``: wait for room (up to ``block_timeout`` seconds, forever if None)
+    - ``drop-oldest``: discard the oldest queued record to make room
+    - ``drop-below-level``: discard new records below ``drop_level``, block for the rest
+    """
+
+    def __init__(self, queue, overflow=OVERFLOW_BLOCK, drop_level=logging.WARNING, block_timeout=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        super().__init__(queue)
+        self.overflow = overflow
+        self.drop_level = drop_level
+        self.block_timeout = block_timeout
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._counter_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            self._put_drop_oldest(record)
+        elif self.overflow == OVERFLOW_DROP_BELOW_LEVEL and record.levelno < self.drop_level:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self._count_dropped()
+                return
+        else:
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self._count_dropped()
+                return
+
+        depth = self.queue.qsize()
+        with self._counter_lock:
+            self.enqueued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def _put_drop_oldest(self, record):
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self._count_dropped()
+            except queue.Empty:
+                pass
+
+    def _count_dropped(self):
+        with self._counter_lock:
+            self.dropped += 1
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                "depth": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "overflow": self.overflow,
+            }
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose stop() always gets its sentinel onto a full queue, so
+    every record queued before shutdown is written out.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def restart(self):
+        # Threads do not survive fork(); start a fresh writer in the child
+        self._thread = None
+        self.start()
+
+
+def configure_logging(logging_settings):
+    """
+    LOGGING_CONFIG entry point: apply the dict config, then hand file records
+    to the log collector when LOG_COLLECTOR_SOCKET is set, or move file
+    handlers behind queues when LOG_ASYNC is enabled.
+    """
+    from .log_collector import install_collector_handlers, remove_collector_handlers
+
+    stop_queue_listeners()
+    remove_collector_handlers()
+    logging.config.dictConfig(logging_settings)
+    if getattr(settings, "LOG_COLLECTOR_SOCKET", ""):
+        install_collector_handlers(logging_settings.get("loggers", {}))
+    elif getattr(settings, "LOG_ASYNC", False):
+        install_queue_handlers(logging_settings.get("loggers", {}))
+
+
+def install_queue_handlers(logger_names):
+    """
+    Replace the file handlers of each named logger with a BoundedQueueHandler
+    drained by its own DrainingQueueListener thread.
+    """
+    overflow = settings.LOG_QUEUE_OVERFLOW
+    drop_level = logging.getLevelName(settings.LOG_QUEUE_DROP_LEVEL)
+    block_timeout = settings.LOG_QUEUE_BLOCK_TIMEOUT or None
+
+    for name in logger_names:
+        logger = logging.getLogger(name or None)
+        file_handlers = [h for h in logger.handlers if isinstance(h, logging.FileHandler)]
+        if not file_handlers:
+            continue
+
+        log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        queue_handler = BoundedQueueHandler(
+            log_queue,
+            overflow=overflow,
+            drop_level=drop_level,
+            block_timeout=block_timeout,
+        )
+        listener = DrainingQueueListener(log_queue, *file_handlers, respect_handler_level=True)
+
+        for handler in file_handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+        listener.start()
+        _listeners[name] = (listener, queue_handler)
+
+
+def stop_queue_listeners():
+    """
+    Flush and stop every queue listener. Records already queued are written
+    before the writer threads exit.
+    """
+    while _listeners:
+        name, (listener, queue_handler) = _listeners.popitem()
+        logger = logging.getLogger(name or None)
+        logger.removeHandler(queue_handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+        if listener._thread is not None:
+            listener.stop()
+
+
+def queue_stats():
+    """
+    Return queue depth and drop counters for every queued logger.
+    """
+    return {name or "root": queue_handler.stats() for name, (_, queue_handler) in _listeners.items()}
+
+
+def _restart_listeners_after_fork():
+    for listener, _ in _listeners.values():
+        listener.restart()
+
+
+atexit.register(stop_queue_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners_after_fork)
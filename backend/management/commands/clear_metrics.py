@@ -0,0 +1,23 @@
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the shared Prometheus metric files in PROMETHEUS_MULTIPROC_DIR. "
+        "Run it before the server starts its workers."
+    )
+
+    def handle(self, *args, **options):
+        directory = settings.PROMETHEUS_MULTIPROC_DIR
+        if not directory:
+            self.stdout.write("PROMETHEUS_MULTIPROC_DIR is empty; metrics are kept per process.")
+            return
+        removed = 0
+        for path in glob.glob(os.path.join(glob.escape(directory), "*.db")):
+            os.remove(path)
+            removed += 1
+        self.stdout.write(f"Removed {removed} metric file(s) from {directory}.")
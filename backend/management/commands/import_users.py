@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.parsers import iter_csv, iter_ndjson
+from backend.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV (with a header row) or NDJSON file, streamed in batches. "
+        "Each row has username, email, first_name, last_name and either password or an encoded password_hash. "
+        "Rejected rows are written as NDJSON to --errors (stderr by default)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, or - for stdin")
+        parser.add_argument("--format", choices=("csv", "ndjson"), help="defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=settings.PROVISIONING_BATCH_SIZE)
+        parser.add_argument("--errors", help="write rejected rows to this file instead of stderr")
+        parser.add_argument(
+            "--allow-no-password", action="store_true",
+            help="create rows without password or password_hash with an unusable password",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in ("csv", "ndjson", "jsonl"):
+            raise CommandError("Pass --format csv or --format ndjson.")
+
+        if path == "-":
+            source = sys.stdin.buffer
+        else:
+            try:
+                source = open(path, "rb")
+            except OSError as exc:
+                raise CommandError(f"Cannot open {path}: {exc}")
+        errors_out = open(options["errors"], "w") if options["errors"] else self.stderr
+
+        if file_format == "csv":
+            rows = iter_csv(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+        else:
+            rows = iter_ndjson(source)
+
+        started = time.perf_counter()
+        read = created = rejected = 0
+        try:
+            for batch_read, batch_created, batch_errors in provision_users(
+                rows, options["batch_size"], options["allow_no_password"]
+            ):
+                read += batch_read
+                created += batch_created
+                rejected += len(batch_errors)
+                for error in batch_errors:
+                    errors_out.write(json.dumps(error) + "\n")
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{read} rows: {created} created, {rejected} rejected ({read / elapsed:.0f} rows/s)"
+                )
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+            if errors_out is not self.stderr:
+                errors_out.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {created} of {read} users in {elapsed:.1f} s; {rejected} rejected.")
+        )
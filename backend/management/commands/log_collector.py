@@ -0,0 +1,46 @@
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.log_collector import LogCollector, close_client, file_handlers, remove_collector_handlers
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the log collector: receive records from every worker on LOG_COLLECTOR_SOCKET "
+        "and write (and rotate) the log files from this one process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", help="Unix socket path; defaults to LOG_COLLECTOR_SOCKET")
+        parser.add_argument(
+            "--stats-interval", type=float, default=0, help="print counters as JSON every this many seconds"
+        )
+
+    def handle(self, *args, **options):
+        path = options["socket"] or settings.LOG_COLLECTOR_SOCKET
+        if not path:
+            raise CommandError("Set LOG_COLLECTOR_SOCKET or pass --socket.")
+
+        # This process writes the files itself rather than sending to itself
+        remove_collector_handlers()
+        close_client(timeout=0)
+
+        collector = LogCollector(path, file_handlers(settings.LOGGING))
+        collector.listen()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: collector.stop())
+        self.stdout.write(f"Collecting logs on {path} for {', '.join(sorted(collector.handlers))}.")
+        self.stdout.flush()
+
+        try:
+            collector.serve_forever(report=self.report, report_interval=options["stats_interval"])
+        finally:
+            collector.close()
+        self.report(collector.stats())
+
+    def report(self, stats):
+        self.stdout.write(json.dumps(stats))
+        self.stdout.flush()
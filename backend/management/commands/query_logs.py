@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend.log_query import LogQuery, get_log_store
+
+
+def parse_time(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"Invalid datetime {value!r}, expected ISO 8601")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed.timestamp()
+
+
+class Command(BaseCommand):
+    help = "Print stored JSON log records matching a query as NDJSON, oldest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=parse_time, help="ISO 8601 start time")
+        parser.add_argument("--until", type=parse_time, help="ISO 8601 end time")
+        parser.add_argument("--level", help="minimum level, e.g. WARNING")
+        parser.add_argument("--logger", help="logger name; includes its children")
+        parser.add_argument("--contains", help="substring of the message")
+        parser.add_argument("--source", action="append", help="log name (repeatable), e.g. frontend")
+        parser.add_argument("--limit", type=int, help="stop after this many records")
+
+    def handle(self, *args, **options):
+        store = get_log_store()
+        unknown = set(options["source"] or ()) - set(store.sources())
+        if unknown:
+            raise CommandError(f"Unknown log: {', '.join(sorted(unknown))}; available: {', '.join(store.sources())}")
+        try:
+            query = LogQuery(
+                since=options["since"],
+                until=options["until"],
+                level=options["level"],
+                logger=options["logger"],
+                contains=options["contains"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        out = sys.stdout.buffer
+        for line in store.query(query, sources=options["source"], limit=options["limit"]):
+            out.write(line + b"\n")
+        out.flush()
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter; prints the time of each startup stage
+STAGES_SCRIPT = """
+import json, os, time
+marks = [("start", time.perf_counter())]
+import django
+marks.append(("import django", time.perf_counter()))
+from django.conf import settings
+settings.INSTALLED_APPS
+marks.append(("settings", time.perf_counter()))
+django.setup()
+marks.append(("django.setup (apps, logging)", time.perf_counter()))
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+marks.append(("WSGI application (middleware)", time.perf_counter()))
+from django.urls import get_resolver
+get_resolver().url_patterns
+marks.append(("URLconf (views)", time.perf_counter()))
+print(json.dumps([(name, end - start) for (_, start), (name, end) in zip(marks, marks[1:])]))
+"""
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the backend in fresh interpreters and report where startup time goes: "
+        "per stage, and per imported package (python -X importtime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="startups to measure; the fastest is reported")
+        parser.add_argument("--top", type=int, default=15, help="packages to list by import time")
+        parser.add_argument(
+            "--lazy-init", choices=("on", "off"), help="override LAZY_INIT for the measured startups"
+        )
+        parser.add_argument("--budget-ms", type=float, help="fail if the total startup exceeds this many ms")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def run_child(self, env, importtime=False):
+        command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", STAGES_SCRIPT]
+        started = time.perf_counter()
+        result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        total = time.perf_counter() - started
+        if result.returncode != 0:
+            raise CommandError(f"Startup failed:\n{result.stderr}")
+        stages = json.loads(result.stdout.strip().splitlines()[-1])
+        return total, stages, result.stderr
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings"))
+        if options["lazy_init"]:
+            env["LAZY_INIT"] = str(options["lazy_init"] == "on")
+
+        total, stages = min((self.run_child(env)[:2] for _ in range(max(options["runs"], 1))), key=lambda r: r[0])
+        stages = [("interpreter", total - sum(seconds for _, seconds in stages)), *stages]
+
+        # Self time per top-level package, from a separate run (importtime slows imports down)
+        _, _, stderr = self.run_child(env, importtime=True)
+        packages = defaultdict(int)
+        for line in stderr.splitlines():
+            match = IMPORT_TIME.match(line)
+            if match:
+                packages[match.group(4).split(".")[0]] += int(match.group(1))
+        top = sorted(packages.items(), key=lambda item: -item[1])[:options["top"]]
+
+        lazy_init = env.get("LAZY_INIT", str(settings.LAZY_INIT))
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "lazy_init": lazy_init,
+                "total_ms": round(total * 1000, 1),
+                "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in stages},
+                "imports_self_ms": {name: round(us / 1000, 1) for name, us in top},
+            }, indent=2))
+        else:
+            self.stdout.write(f"Startup (LAZY_INIT={lazy_init}), fastest of {options['runs']}:")
+            for name, seconds in stages:
+                self.stdout.write(f"  {name:<32}{seconds * 1000:>9.1f} ms")
+            self.stdout.write(f"  {'total':<32}{total * 1000:>9.1f} ms")
+            self.stdout.write("Import self time by package (-X importtime):")
+            for name, us in top:
+                self.stdout.write(f"  {name:<32}{us / 1000:>9.1f} ms")
+
+        if options["budget_ms"] is not None and total * 1000 > options["budget_ms"]:
+            raise CommandError(f"Startup took {total * 1000:.0f} ms, over the {options['budget_ms']:.0f} ms budget")
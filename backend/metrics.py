@@ -0,0 +1,123 @@
+"""
+Prometheus metrics, aggregated across worker processes.
+
+Every worker process writes its counters and histograms to memory-mapped
+files in PROMETHEUS_MULTIPROC_DIR, and /metrics sums the files of all
+processes. The directory must be emptied whenever the server (all of its
+workers) starts, e.g. with ``manage.py clear_metrics``; otherwise counters
+keep the totals of previous runs. With an empty PROMETHEUS_MULTIPROC_DIR
+the metrics are kept per process in memory.
+
+Series:
+
+* ``http_requests_total{route,method,status}`` and
+  ``http_request_duration_seconds{route,method}``, from MetricsMiddleware;
+* ``db_queries_total{route,method}``, counted by an execute wrapper
+  installed on every database connection;
+* ``log_entries_total{level,outcome}``, frontend log entries by outcome
+  ("logged", "shed" or "invalid").
+"""
+
+import contextvars
+import os
+from collections import Counter as Tally
+
+from django.conf import settings
+
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    # prometheus_client picks its storage when first imported
+    os.makedirs(settings.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ["route", "method", "status"]
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from the first middleware to the response, by route and method.",
+    ["route", "method"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Counter("db_queries_total", "Database queries by route and method.", ["route", "method"])
+LOG_ENTRIES = Counter(
+    "log_entries_total", "Frontend log entries by level and outcome.", ["level", "outcome"]
+)
+
+# Queries of the current request: a one-element list the execute wrapper increments
+request_queries = contextvars.ContextVar("request_queries", default=None)
+
+# Labelled children by label values; labels() takes a lock and builds a key
+# on every call, which is most of the cost of an increment
+_request_series = {}
+_log_series = {}
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Execute wrapper (see signals.py) adding to the current request's count.
+    """
+    counter = request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def observe_request(route, method, status_code, seconds, queries):
+    key = (route, method, status_code)
+    series = _request_series.get(key)
+    if series is None:
+        series = _request_series[key] = (
+            REQUESTS.labels(route, method, str(status_code)),
+            REQUEST_DURATION.labels(route, method),
+            DB_QUERIES.labels(route, method),
+        )
+    requests, duration, db_queries = series
+    requests.inc()
+    duration.observe(seconds)
+    if queries:
+        db_queries.inc(queries)
+
+
+def _log_counter(level, outcome):
+    counter = _log_series.get((level, outcome))
+    if counter is None:
+        counter = _log_series[(level, outcome)] = LOG_ENTRIES.labels(level, outcome)
+    return counter
+
+
+def count_log_entries(entries, outcome):
+    """
+    Count validated log entries (dicts with a "level") under ``outcome``.
+    """
+    if len(entries) == 1:
+        _log_counter(entries[0].get("level", "INFO"), outcome).inc()
+        return
+    for level, count in Tally(entry.get("level", "INFO") for entry in entries).items():
+        _log_counter(level, outcome).inc(count)
+
+
+def count_invalid_log_entries(count):
+    if count:
+        _log_counter("unknown", "invalid").inc(count)
+
+
+def render_metrics():
+    """
+    Return ``(body, content type)`` of the Prometheus text exposition.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
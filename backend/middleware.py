@@ -1,96 +1,78 @@
 import logging
-import json
+import random
 import time
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+from . import json_codec, latency
+from .admission import LEVELS, client_key, get_admission
+from .hashing import HashingOverloaded
+from .metrics import observe_request, request_queries
+from .query_budget import QueryBudgetExceeded, QueryRecorder, count_checked, view_budget
 
 # Get the logger for 'django.request'
 logger = logging.getLogger("django.request")
 
 
-class RequestLoggingMiddleware(MiddlewareMixin):
+class InlineAsyncMiddlewareMixin(MiddlewareMixin):
+    """
+    MiddlewareMixin whose async path calls process_request/process_response
+    directly on the event loop instead of hopping to a thread through
+    sync_to_async. Only for hooks that never block: no database access and
+    no network I/O (file logging should use LOG_ASYNC under ASGI).
+    """
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            response = self.process_response(request, response)
+        return response
+
+
+class RequestLoggingMiddleware(InlineAsyncMiddlewareMixin):
     """
     Middleware to log every incoming request with support for all HTTP methods,
     handling of different content types and encodings.
+
+    REQUEST_LOG_MODE selects the capture mode: "full" pretty-prints headers and
+    parsed bodies, "bounded" logs the raw body without parsing it, and only
+    its length when it is over REQUEST_LOG_MAX_BODY_BYTES. In both modes
+    requests are filtered by path prefix and sampled with
+    REQUEST_LOG_SAMPLE_RATE.
     """
 
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = settings.REQUEST_LOG_ENABLED
+        self.bounded = settings.REQUEST_LOG_MODE == "bounded"
+        self.max_body_bytes = settings.REQUEST_LOG_MAX_BODY_BYTES
+        self.sample_rate = settings.REQUEST_LOG_SAMPLE_RATE
+        self.include_paths = tuple(settings.REQUEST_LOG_INCLUDE_PATHS)
+        self.exclude_paths = tuple(settings.REQUEST_LOG_EXCLUDE_PATHS)
+
+    def should_capture(self, request):
+        path = request.path
+        if self.include_paths and not path.startswith(self.include_paths):
+            return False
+        if self.exclude_paths and path.startswith(self.exclude_paths):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
     def process_request(self, request):
-        if not settings.DEBUG:
+        if not self.enabled or not self.should_capture(request):
             return None
 
         try:
-            # Basic request info
-            method = request.method
-            full_path = request.get_full_path()
-
-            # Extract headers from META (HTTP_* headers)
-            headers = {}
-            for key, value in request.META.items():
-                if key.startswith("HTTP_"):
-                    header_name = key[5:].replace("_", "-").title()
-                    headers[header_name] = value
-            # Include CONTENT_TYPE and CONTENT_LENGTH if available
-            if "CONTENT_TYPE" in request.META:
-                headers["Content-Type"] = request.META["CONTENT_TYPE"]
-            if "CONTENT_LENGTH" in request.META:
-                headers["Content-Length"] = request.META["CONTENT_LENGTH"]
-
-            # GET parameters
-            get_data = dict(request.GET)
-
-            # Initialize variables for POST/PUT/PATCH/DELETE data
-            post_data = {}
-            files_data = {}
-            raw_body = ""
-
-            if method in ["POST", "PUT", "PATCH", "DELETE"]:
-                if request.content_type and request.content_type.startswith(
-                    "multipart"
-                ):
-                    # For multipart/form-data (typically file uploads)
-                    post_data = dict(request.POST)
-                    files_data = {
-                        key: [file.name for file in files]
-                        for key, files in request.FILES.lists()
-                    }
-                else:
-                    # For other content types (application/json, text, etc.)
-                    try:
-                        encoding = request.encoding or "utf-8"
-                        raw_body = request.body.decode(encoding)
-                    except Exception as decode_error:
-                        raw_body = f"<failed to decode body: {decode_error}>"
-
-                    # If JSON, attempt to parse the raw body
-                    if (
-                        request.content_type
-                        and "application/json" in request.content_type
-                    ):
-                        try:
-                            post_data = json.loads(raw_body)
-                        except Exception as json_error:
-                            post_data = f"<failed to parse JSON: {json_error}>"
-                    else:
-                        post_data = raw_body
-
-            # Build the log message
-            log_message = (
-                f"Incoming Request:\n"
-                f"Method: {method}\n"
-                f"Path: {full_path}\n"
-                f"Headers: {json.dumps(headers, indent=2)}\n"
-                f"GET Data: {json.dumps(get_data, indent=2)}\n"
-                f"POST Data: "
-            )
-
-            # If post_data is a dict, convert to JSON; otherwise, log as is
-            if isinstance(post_data, dict):
-                log_message += f"{json.dumps(post_data, indent=2)}\n"
+            if self.bounded:
+                log_message = self.bounded_message(request)
             else:
-                log_message += f"{post_data}\n"
-
-            # Add files data to the log message
-            log_message += f"Files: {json.dumps(files_data, indent=2)}\n"
+                log_message = self.full_message(request)
 
             # Log the complete request info at INFO level
             logger.info(log_message)
@@ -100,27 +82,153 @@ class RequestLoggingMiddleware(MiddlewareMixin):
 
         return None
 
+    def bounded_message(self, request):
+        """
+        Build a compact log message with the raw body, if it fits in
+        max_body_bytes. Larger bodies, bodies of unknown length and multipart
+        bodies are never read here, so they are neither held in memory early
+        nor parsed; only their length is logged.
+        """
+        meta = request.META
+        headers = " ".join(
+            f"{key[5:]}={value}" for key, value in meta.items() if key.startswith("HTTP_")
+        )
+        content_type = meta.get("CONTENT_TYPE", "")
+        content_length = meta.get("CONTENT_LENGTH", "")
+
+        body = ""
+        if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+            try:
+                length = int(content_length)
+            except ValueError:
+                length = None
+            if content_type.startswith("multipart"):
+                body = f"<multipart body, {content_length or 'unknown'} bytes>"
+            elif length is None or length > self.max_body_bytes:
+                body = f"<body not logged, {content_length or 'unknown'} bytes>"
+            elif length:
+                try:
+                    body = request.body.decode(request.encoding or "utf-8", "replace")
+                except Exception as read_error:
+                    body = f"<failed to read body: {read_error}>"
+
+        return (
+            f"Incoming Request: {request.method} {request.get_full_path()}\n"
+            f"Content-Type: {content_type} Content-Length: {content_length}\n"
+            f"Headers: {headers}\n"
+            f"Body: {body}\n"
+        )
 
-class ResponseLoggingMiddleware(MiddlewareMixin):
+    def full_message(self, request):
+        # Basic request info
+        method = request.method
+        full_path = request.get_full_path()
+
+        # Extract headers from META (HTTP_* headers)
+        headers = {}
+        for key, value in request.META.items():
+            if key.startswith("HTTP_"):
+                header_name = key[5:].replace("_", "-").title()
+                headers[header_name] = value
+        # Include CONTENT_TYPE and CONTENT_LENGTH if available
+        if "CONTENT_TYPE" in request.META:
+            headers["Content-Type"] = request.META["CONTENT_TYPE"]
+        if "CONTENT_LENGTH" in request.META:
+            headers["Content-Length"] = request.META["CONTENT_LENGTH"]
+
+        # GET parameters
+        get_data = dict(request.GET)
+
+        # Initialize variables for POST/PUT/PATCH/DELETE data
+        post_data = {}
+        files_data = {}
+        raw_body = ""
+
+        if method in ["POST", "PUT", "PATCH", "DELETE"]:
+            if request.content_type and request.content_type.startswith(
+                "multipart"
+            ):
+                # For multipart/form-data (typically file uploads)
+                post_data = dict(request.POST)
+                files_data = {
+                    key: [file.name for file in files]
+                    for key, files in request.FILES.lists()
+                }
+            else:
+                # For other content types (application/json, text, etc.)
+                try:
+                    encoding = request.encoding or "utf-8"
+                    raw_body = request.body.decode(encoding)
+                except Exception as decode_error:
+                    raw_body = f"<failed to decode body: {decode_error}>"
+
+                # If JSON, attempt to parse the raw body
+                if (
+                    request.content_type
+                    and "application/json" in request.content_type
+                ):
+                    try:
+                        post_data = json_codec.loads(request.body, encoding=encoding)
+                    except Exception as json_error:
+                        post_data = f"<failed to parse JSON: {json_error}>"
+                else:
+                    post_data = raw_body
+
+        # Build the log message
+        log_message = (
+            f"Incoming Request:\n"
+            f"Method: {method}\n"
+            f"Path: {full_path}\n"
+            f"Headers: {json_codec.dumps_indented(headers)}\n"
+            f"GET Data: {json_codec.dumps_indented(get_data)}\n"
+            f"POST Data: "
+        )
+
+        # If post_data is a dict, convert to JSON; otherwise, log as is
+        if isinstance(post_data, dict):
+            log_message += f"{json_codec.dumps_indented(post_data)}\n"
+        else:
+            log_message += f"{post_data}\n"
+
+        # Add files data to the log message
+        log_message += f"Files: {json_codec.dumps_indented(files_data)}\n"
+        return log_message
+
+
+class ResponseLoggingMiddleware(InlineAsyncMiddlewareMixin):
     """
     Middleware to log every outgoing response with timing information,
     status codes, and response content (where appropriate).
+
+    Requests are timed with a monotonic clock and, with LATENCY_HISTOGRAMS,
+    recorded into per-route histograms regardless of DEBUG. With
+    RESPONSE_LOG_BODIES off, bodies are never buffered, decoded or re-parsed;
+    streaming responses are never read in either case.
     """
 
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = settings.RESPONSE_LOG_ENABLED
+        self.log_bodies = settings.RESPONSE_LOG_BODIES
+        self.histograms = settings.LATENCY_HISTOGRAMS
+
     def process_request(self, request):
         # Always store the start time, even if not debugging,
         # as it's needed for the response timing
-        request.start_time = time.time()
+        request.start_time = time.perf_counter()
         return None
 
     def process_response(self, request, response):
-        if not settings.DEBUG:
+        start_time = getattr(request, "start_time", None)
+        duration = time.perf_counter() - start_time if start_time is not None else 0.0
+
+        if self.histograms and start_time is not None:
+            latency.registry.record(latency.route_key(request), duration)
+
+        if not self.enabled:
             return response
 
         try:
-            # Calculate request duration
-            duration = time.time() - getattr(request, "start_time", time.time())
-
             # Basic response info
             status_code = response.status_code
             content_type = response.get("Content-Type", "unknown")
@@ -128,12 +236,14 @@ class ResponseLoggingMiddleware(MiddlewareMixin):
 
             # Get response content based on content type
             response_content = ""
-            if hasattr(response, "content"):
+            if response.streaming:
+                # Streaming and file responses can only be consumed once
+                response_content = "<streaming content>"
+            elif self.log_bodies:
                 if "application/json" in content_type:
                     try:
                         # Try to parse and format JSON response
-                        response_content = json.loads(response.content.decode("utf-8"))
-                        response_content = json.dumps(response_content, indent=2)
+                        response_content = json_codec.dumps_indented(json_codec.loads(response.content))
                     except Exception as json_error:
                         response_content = f"<failed to parse JSON: {json_error}>"
                 elif "text" in content_type:
@@ -151,11 +261,11 @@ class ResponseLoggingMiddleware(MiddlewareMixin):
             # Build the log message
             log_message = (
                 f"Outgoing Response:\n"
-                f"Duration: {duration:.3f}s\n"
+                f"Duration: {duration:.6f}s\n"
                 f"Status Code: {status_code}\n"
                 f"Content-Type: {content_type}\n"
                 f"Content-Length: {content_length}\n"
-                f"Headers: {json.dumps(headers, indent=2)}\n"
+                f"Headers: {json_codec.dumps_indented(headers)}\n"
             )
 
             # Add response content to log if it exists
@@ -176,3 +286,118 @@ class ResponseLoggingMiddleware(MiddlewareMixin):
 
         # Always return the response
         return response
+
+
+class LogAdmissionMiddleware(InlineAsyncMiddlewareMixin):
+    """
+    Rejects log ingestion requests from clients over their budget with a 429
+    before the body is read or parsed (see backend/admission.py).
+
+    Clients announce the most severe level in the request with the
+    X-Log-Level header; requests without it are only rejected once the
+    client's bucket is empty.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.admission = get_admission()
+        self.paths = tuple(settings.LOG_ADMISSION_PATHS)
+
+    def process_request(self, request):
+        if self.admission is None or request.method != "POST" or request.path not in self.paths:
+            return None
+
+        request.log_client_key = client_key(request)
+        level = request.headers.get("X-Log-Level", "CRITICAL").upper()
+        if level not in LEVELS:
+            level = "CRITICAL"
+
+        wait = self.admission.check(request.log_client_key, level)
+        if not wait:
+            return None
+        exc = Throttled(wait)
+        response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+        response["Retry-After"] = "%d" % exc.wait
+        return response
+
+
+class HashingOverloadedMiddleware(InlineAsyncMiddlewareMixin):
+    """
+    Answers 503 when a view outside DRF, such as the admin login, runs into
+    a full password hashing pool (see backend/hashing.py); DRF views turn
+    HashingOverloaded into a 503 themselves.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingOverloaded):
+            return None
+        return JsonResponse({"detail": exception.detail}, status=exception.status_code)
+
+
+class MetricsMiddleware(InlineAsyncMiddlewareMixin):
+    """
+    Counts and times every request into the Prometheus series of
+    backend/metrics.py, labelled with the matched URL route, together with
+    the number of database queries it made.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request.metrics_queries = [0]
+        request.metrics_context = request_queries.set(request.metrics_queries)
+        request.metrics_started = time.perf_counter()
+        return None
+
+    def process_response(self, request, response):
+        started = getattr(request, "metrics_started", None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        request_queries.reset(request.metrics_context)
+
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else "<unresolved>"
+        method = latency.method_label(request.method)
+        observe_request(route, method, response.status_code, duration, request.metrics_queries[0])
+        return response
+
+
+class QueryBudgetMiddleware(InlineAsyncMiddlewareMixin):
+    """
+    Records the SQL of every request to a view that declares a
+    ``query_budget`` and logs or raises a report when the request goes over
+    it (QUERY_BUDGET_MODE, see backend/query_budget.py).
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_MODE == "off":
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.raise_errors = settings.QUERY_BUDGET_MODE == "raise"
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = view_budget(view_func)
+        if budget is not None:
+            name = getattr(view_func, "view_class", view_func).__name__
+            request.query_budget = (budget, QueryRecorder().start(), name)
+        return None
+
+    def process_response(self, request, response):
+        checked = getattr(request, "query_budget", None)
+        if checked is None:
+            return response
+        budget, recorder, name = checked
+        recorder.stop()
+        del request.query_budget
+
+        report = budget.check(recorder, f"{request.method} {request.path} ({name})")
+        count_checked(name, recorder, report is not None)
+        if report is not None:
+            if self.raise_errors:
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
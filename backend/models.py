@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db import models
+
+
+class DashboardLayout(models.Model):
+    """
+    A user's dashboard: the list of widgets with their type, position, size
+    and config. ``version`` increases on every write.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="dashboard_layout"
+    )
+    widgets = models.JSONField(default=list)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard layout of {self.user} (v{self.version})"
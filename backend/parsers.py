@@ -0,0 +1,103 @@
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import json as drf_json
+
+from . import json_codec
+from .renderers import ORJSONRenderer
+
+
+class InvalidLine:
+    """
+    Placeholder for an NDJSON line that could not be decoded, so a single
+    malformed line is reported back per entry instead of failing the batch.
+    """
+
+    __slots__ = ("lineno", "error")
+
+    def __init__(self, lineno, error):
+        self.lineno = lineno
+        self.error = error
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser decoding the request body with orjson (see json_codec.py).
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        parse_constant = drf_json.strict_constant if self.strict else None
+        try:
+            return json_codec.loads(stream.read(), parse_constant, encoding)
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one document per line) into a list.
+    Blank lines are skipped; undecodable lines become InvalidLine entries.
+    """
+
+    media_type = "application/x-ndjson"
+    strict = api_settings.STRICT_JSON
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return list(iter_ndjson(stream, encoding, self.strict))
+
+
+class CSVParser(BaseParser):
+    """
+    Parses CSV with a header row into a list of dicts; empty cells are left
+    out, so optional fields fall back to their defaults.
+    """
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        # The request stream is not a full binary file object TextIOWrapper can wrap
+        return list(iter_csv(io.TextIOWrapper(io.BytesIO(stream.read()), encoding=encoding, newline="")))
+
+
+def iter_ndjson(lines, encoding="utf-8", strict=True):
+    """
+    Decode NDJSON byte lines one at a time; blank lines are skipped and
+    undecodable ones become InvalidLine entries.
+    """
+    parse_constant = drf_json.strict_constant if strict else None
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json_codec.loads(line, parse_constant, encoding)
+        except ValueError as exc:
+            yield InvalidLine(lineno, str(exc))
+
+
+def iter_csv(text):
+    """
+    Read CSV rows (after the header) from a text stream one at a time.
+    """
+    for row in csv.DictReader(text):
+        yield {name: value for name, value in row.items() if name and value not in ("", None)}
+
+
+class JSONPatchParser(ORJSONParser):
+    """
+    Parses JSON Patch documents (RFC 6902).
+    """
+
+    media_type = "application/json-patch+json"
@@ -0,0 +1,86 @@
+"""
+PostgreSQL backend that records connection checkout statistics.
+
+It is Django's postgresql backend plus bookkeeping: how often connections are
+checked out, how long each checkout waited (a fresh connect without a pool, a
+pool checkout with one), and how old connections are when handed out. With
+DB_POOL enabled the psycopg pool's own counters are included as well.
+"""
+
+import threading
+import time
+import weakref
+
+from django.db.backends.postgresql import base
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Creation time of every live connection, dropped when it is garbage collected
+        self._created = weakref.WeakKeyDictionary()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.age_total = 0.0
+            self.age_max = 0.0
+
+    def connection_created(self, connection):
+        with self._lock:
+            self._created.setdefault(connection, time.monotonic())
+
+    def checked_out(self, connection, wait):
+        with self._lock:
+            created = self._created.get(connection)
+            age = time.monotonic() - created if created is not None else 0.0
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.age_total += age
+            self.age_max = max(self.age_max, age)
+
+    def snapshot(self):
+        with self._lock:
+            checkouts = self.checkouts or 1
+            return {
+                "checkouts": self.checkouts,
+                "wait_avg_ms": round(self.wait_total / checkouts * 1000, 3),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "age_avg_s": round(self.age_total / checkouts, 3),
+                "age_max_s": round(self.age_max, 3),
+                "open_connections": len(self._created),
+            }
+
+
+stats = ConnectionStats()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        if not self.pool:
+            # Without a pool, every checkout is a brand new connection
+            stats.connection_created(connection)
+        stats.checked_out(connection, time.perf_counter() - start)
+        return connection
+
+    def _configure_connection(self, connection):
+        # Called by the psycopg pool for each connection it opens
+        if self.pool:
+            stats.connection_created(connection)
+        return super()._configure_connection(connection)
+
+    def pool_stats(self):
+        """
+        Return checkout statistics, plus the psycopg pool counters when pooling.
+        """
+        result = stats.snapshot()
+        result["pooled"] = self.pool is not None
+        if self.pool is not None:
+            result["pool"] = self.pool.get_stats()
+        return result
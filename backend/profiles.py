@@ -0,0 +1,107 @@
+"""
+Cached, conditional profile responses.
+
+The rendered profile (body, ETag and Last-Modified) is cached per user in
+the "default" cache under a key that includes the user's profile version.
+Saving the user bumps the version (see signals.py), so stale renderings are
+not served by processes sharing the cache and simply expire. With the
+per-process LocMemCache default, other processes serve their rendering
+until PROFILE_CACHE_TTL, which is short in that case. Renderings are made
+from the user's row, never from the (possibly cached) authenticated user.
+Together with
+CachedJWTAuthentication, a repeat GET /api/profile/ costs no query and no
+serialization, and a conditional one is answered with an empty 304.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .renderers import ORJSONRenderer
+from .serializers import UserProfileSerializer
+
+_renderer = ORJSONRenderer()
+
+
+def profile_version_key(user_id):
+    return f"profile-version:{user_id}"
+
+
+def get_profile_version(user_id):
+    cache = caches["default"]
+    key = profile_version_key(user_id)
+    # Start from the clock, so a version lost from the cache never repeats.
+    # None when the key is evicted in between: callers treat it as a miss.
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def bump_profile_version(user_id):
+    cache = caches["default"]
+    try:
+        cache.incr(profile_version_key(user_id))
+    except ValueError:
+        # Not cached: the next read starts a new version anyway
+        pass
+
+
+def profile_cache_key(user_id):
+    """
+    The cache key of the user's current rendering, or None if the version
+    could not be read.
+    """
+    version = get_profile_version(user_id)
+    return None if version is None else f"profile:{user_id}:{version}"
+
+
+def get_cached_profile(user_id):
+    """
+    Return the cached ``(etag, last_modified, body)`` of the user's profile, or None.
+    """
+    key = profile_cache_key(user_id)
+    return None if key is None else caches["default"].get(key)
+
+
+def get_rendered_profile(user_id):
+    """
+    Return ``(etag, last_modified, body)`` of the user's profile.
+    """
+    cache = caches["default"]
+    # The version is read before the row, so a write committed in between
+    # moves on to a new key instead of leaving this rendering under it
+    key = profile_cache_key(user_id)
+    rendered = cache.get(key) if key is not None else None
+    if rendered is None:
+        # From the database: the authenticated user may come from the auth
+        # cache, and a stale copy would be served until it expires
+        fields = UserProfileSerializer.Meta.fields
+        user = get_object_or_404(get_user_model().objects.only(*fields), pk=user_id)
+        body = _renderer.render(UserProfileSerializer(user).data)
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        rendered = (etag, int(time.time()), body)
+        if key is not None:
+            cache.set(key, rendered, settings.PROFILE_CACHE_TTL)
+    return rendered
+
+
+def profile_response(request, user_id, rendered=None):
+    """
+    The profile response for the user, or a 304 when ``request`` already
+    holds the current version. ``rendered`` skips the cache lookup.
+    """
+    etag, last_modified, body = rendered or get_rendered_profile(user_id)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # Let the browser keep it, but always revalidate
+    response["Cache-Control"] = "private, no-cache"
+    return response
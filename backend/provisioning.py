@@ -0,0 +1,142 @@
+"""
+Bulk user provisioning, for POST /api/register/bulk/ and the import_users
+command.
+
+Rows (dicts with the registration fields and either ``password`` or an
+encoded ``password_hash``) are taken from any iterable in batches, so an
+import streamed from a file keeps memory flat. Per batch, every row is
+validated on its own, usernames are checked for uniqueness with a single
+query, plain passwords are hashed in parallel in the hashing pool, and the
+users are inserted with one bulk_create in one transaction. Invalid rows
+are reported with their index and never stop the import.
+
+bulk_create sends no post_save signals; new users have nothing cached yet.
+"""
+
+from itertools import islice
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User, UserManager
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from rest_framework.settings import api_settings
+
+from .parsers import InvalidLine
+from .serializers import BulkUserSerializer
+
+DUPLICATE_USERNAME = User._meta.get_field("username").error_messages["unique"]
+
+
+def hash_passwords(passwords):
+    """
+    Encode ``passwords`` with the default hasher, in parallel when it
+    computes in the hashing pool.
+    """
+    hasher = get_hasher()
+    if hasattr(hasher, "encode_many"):
+        return hasher.encode_many(passwords)
+    return [make_password(password) for password in passwords]
+
+
+def row_error(index, errors):
+    return {"index": index, "errors": errors}
+
+
+def validate_rows(rows, allow_no_password=False):
+    """
+    Validate ``(index, row)`` pairs; return the valid ``(index, data)``
+    pairs and the errors of the others.
+    """
+    valid = []
+    errors = []
+    # One serializer for every row: building a ModelSerializer's fields costs more than validating
+    serializer = BulkUserSerializer(context={"allow_no_password": allow_no_password})
+    for index, row in rows:
+        if isinstance(row, InvalidLine):
+            errors.append(row_error(index, {api_settings.NON_FIELD_ERRORS_KEY: [
+                f"JSON parse error on line {row.lineno} - {row.error}"
+            ]}))
+            continue
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            errors.append(row_error(index, as_serializer_error(exc)))
+    return valid, errors
+
+
+def unique_rows(valid):
+    """
+    Split validated rows into new usernames and rows whose username is
+    taken, by an earlier row of the batch or by an existing user.
+    """
+    usernames = [User.normalize_username(data["username"]) for _, data in valid]
+    existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+    unique = []
+    errors = []
+    for (index, data), username in zip(valid, usernames):
+        if username in existing:
+            errors.append(row_error(index, {"username": [str(DUPLICATE_USERNAME)]}))
+        else:
+            existing.add(username)
+            unique.append((index, {**data, "username": username}))
+    return unique, errors
+
+
+def build_users(rows):
+    passwords = [data["password"] for _, data in rows if "password" in data]
+    hashes = iter(hash_passwords(passwords))
+    users = []
+    for _, data in rows:
+        user = User(
+            username=data["username"],
+            email=UserManager.normalize_email(data.get("email", "")),
+            first_name=data.get("first_name", ""),
+            last_name=data.get("last_name", ""),
+        )
+        if "password" in data:
+            user.password = next(hashes)
+        elif "password_hash" in data:
+            user.password = data["password_hash"]
+        else:
+            user.set_unusable_password()
+        users.append(user)
+    return users
+
+
+def provision_batch(rows, allow_no_password=False):
+    """
+    Create the users of one batch of ``(index, row)`` pairs; return the
+    number created and the per-row errors.
+    """
+    valid, errors = validate_rows(rows, allow_no_password)
+    unique, duplicates = unique_rows(valid)
+    errors += duplicates
+    users = build_users(unique)
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+    except IntegrityError:
+        # A username was taken since the check: check again and retry once
+        unique, duplicates = unique_rows(unique)
+        errors += duplicates
+        free = {data["username"] for _, data in unique}
+        users = [user for user in users if user.username in free]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+    errors.sort(key=lambda error: error["index"])
+    return len(users), errors
+
+
+def provision_users(rows, batch_size, allow_no_password=False):
+    """
+    Create users from any iterable of rows, ``batch_size`` at a time.
+    Yields ``(rows read, users created, errors)`` after each batch.
+    """
+    numbered = enumerate(rows)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            return
+        created, errors = provision_batch(batch, allow_no_password)
+        yield len(batch), created, errors
@@ -0,0 +1,422 @@
+"""
+Server-sent events for live widget updates and notifications (ASGI only).
+
+GET /api/events/?topics=widget:<id>,notifications,alerts opens an event
+stream. EventSource cannot send headers, and an access token in the URL
+would end up in access and proxy logs, so browsers first POST to
+/api/events/ticket/ (with the usual Authorization header) and open the
+stream with ``?ticket=``: a random ticket valid once, for PUSH_TICKET_TTL
+seconds. Other clients may send the access token in the Authorization
+header instead. Topics:
+
+* ``widget:<id>``: new data for one of the user's widgets, published by the
+  widget data service whenever the widget's source is fetched; while a
+  widget has subscribers, its data is refreshed each time it is due;
+* ``notifications``: messages for this user (notify_user());
+* ``alerts``: messages for everyone (broadcast_alert()).
+
+The stream is a plain ASGI application mounted in front of Django by
+backend/asgi.py, so an idle connection only holds a Subscription and one
+waiting task. Each message is encoded once and shared by all subscribers.
+Every subscription buffers at most PUSH_BUFFER_SIZE messages; a client that
+falls that far behind is disconnected, and EventSource reconnects it.
+Delivery is per process: publish from the worker process serving the
+subscribers.
+"""
+
+import asyncio
+import functools
+import secrets
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+
+from . import json_codec
+from .authentication import CachedJWTAuthentication
+from .renderers import ORJSONRenderer
+
+_renderer = ORJSONRenderer()
+_authenticator = CachedJWTAuthentication()
+
+PING = b": ping\n\n"
+
+
+class Subscription:
+    """
+    One connected client: its channels, mapped to the topic names it asked
+    for, and a bounded buffer of pending messages.
+    """
+
+    __slots__ = ("channels", "buffer", "ready", "closed", "task")
+
+    def __init__(self, channels, size):
+        self.channels = channels
+        self.buffer = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.task = None
+
+    def offer(self, channel, data):
+        """
+        Queue a message; return False if the buffer is full.
+        """
+        if len(self.buffer) == self.buffer.maxlen:
+            return False
+        self.buffer.append((channel, data))
+        self.ready.set()
+        return True
+
+    def close(self):
+        """
+        End the stream, even when it is stuck writing to a stalled client.
+        """
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+
+
+class Broadcaster:
+    """
+    In-process topic fan-out. publish() may be called from any thread;
+    delivery always happens on the event loop serving the subscribers.
+    """
+
+    def __init__(self, buffer_size, heartbeat):
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.channels = {}
+        self.subscriptions = set()
+        # Tasks keeping the data of a channel fresh while it has subscribers
+        self.refreshers = {}
+        self.loop = None
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+        self._heartbeat_task = None
+
+    def subscribe(self, channels):
+        self.loop = asyncio.get_running_loop()
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = self.loop.create_task(self._ping_forever())
+        subscription = Subscription(channels, self.buffer_size)
+        self.subscriptions.add(subscription)
+        for channel in channels:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+        for channel in subscription.channels:
+            subscribers = self.channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+                    refresher = self.refreshers.pop(channel, None)
+                    if refresher is not None:
+                        refresher.cancel()
+
+    def keep_fresh(self, channel, refresher):
+        """
+        Run ``refresher()`` (a coroutine function) while ``channel`` has
+        subscribers; one task per channel however many subscribe.
+        """
+        task = self.refreshers.get(channel)
+        if channel in self.channels and (task is None or task.done()):
+            self.refreshers[channel] = self.loop.create_task(refresher())
+
+    def publish(self, channel, data):
+        """
+        Send ``data`` (JSON-serializable) to the subscribers of ``channel``.
+        """
+        loop = self.loop
+        if loop is None or channel not in self.channels or loop.is_closed():
+            return
+        encoded = _renderer.render(data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(channel, encoded)
+        else:
+            loop.call_soon_threadsafe(self._deliver, channel, encoded)
+
+    def _deliver(self, channel, encoded):
+        subscribers = self.channels.get(channel, ())
+        delivered = 0
+        for subscription in list(subscribers):
+            if subscription.offer(channel, encoded):
+                delivered += 1
+            else:
+                # Slow consumer: drop the connection rather than buffer without bound
+                self.evicted += 1
+                self.unsubscribe(subscription)
+                subscription.close()
+        self.published += 1
+        self.delivered += delivered
+
+    async def _ping_forever(self):
+        # One timer for every connection; keeps proxies from closing idle streams
+        while self.subscriptions:
+            await asyncio.sleep(self.heartbeat)
+            for subscription in list(self.subscriptions):
+                subscription.offer(None, PING)
+
+    def stats(self):
+        return {
+            "connections": len(self.subscriptions),
+            "channels": len(self.channels),
+            "refreshers": len(self.refreshers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
+
+
+broadcaster = Broadcaster(buffer_size=settings.PUSH_BUFFER_SIZE, heartbeat=settings.PUSH_HEARTBEAT)
+
+
+def user_channel(user_id, name):
+    return f"user:{user_id}:{name}"
+
+
+def notify_user(user_id, data):
+    broadcaster.publish(user_channel(user_id, "notifications"), data)
+
+
+def broadcast_alert(data):
+    broadcaster.publish("alerts", data)
+
+
+def push_stats():
+    return broadcaster.stats()
+
+
+def ticket_cache_key(ticket):
+    return f"push-ticket:{ticket}"
+
+
+def issue_ticket(user):
+    """
+    Return a single-use ticket opening one event stream for ``user``.
+    """
+    ticket = secrets.token_urlsafe(32)
+    caches["default"].set(ticket_cache_key(ticket), user.pk, settings.PUSH_TICKET_TTL)
+    return ticket
+
+
+def _redeem_ticket(ticket):
+    cache = caches["default"]
+    key = ticket_cache_key(ticket)
+    user_id = cache.get(key)
+    # Only the request that deletes the ticket may use it
+    if user_id is None or not cache.delete(key):
+        raise AuthenticationFailed("Invalid or expired stream ticket.")
+    try:
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    finally:
+        close_old_connections()
+    if user is None:
+        raise AuthenticationFailed("User not found or inactive.")
+    return user
+
+
+class BadTopic(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = "bad_topic"
+
+
+class TooManyConnections(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many open event streams, try again shortly."
+    default_code = "too_many_connections"
+
+
+def _load_user(validated_token):
+    try:
+        return _authenticator.get_user(validated_token)
+    finally:
+        close_old_connections()
+
+
+def _load_widgets(user):
+    from .dashboard import get_rendered_layout
+
+    try:
+        _, body = get_rendered_layout(user)
+    finally:
+        close_old_connections()
+    return {widget["id"]: widget["config"] for widget in json_codec.loads(body)["widgets"]}
+
+
+async def authenticate(raw_token):
+    """
+    Return the user of an access token. As in async_views, the database is
+    only reached (in a thread) when the in-process auth cache misses.
+    """
+    validated_token = _authenticator.get_validated_token(raw_token)
+    if isinstance(caches["auth"], LocMemCache):
+        user = _authenticator.get_cached_user(validated_token)
+        if user is not None:
+            return user
+    return await sync_to_async(_load_user)(validated_token)
+
+
+async def resolve_topics(user, topics):
+    """
+    Map the requested topic names to broadcaster channels. Returns the
+    channels and, for widget channels, the widget config.
+    """
+    # widget_data imports this module
+    from .widget_data import widget_channel
+
+    channels = {}
+    widget_configs = {}
+    widgets = None
+    for topic in topics:
+        if topic == "notifications":
+            channels[user_channel(user.pk, "notifications")] = topic
+        elif topic == "alerts":
+            channels["alerts"] = topic
+        elif topic.startswith("widget:"):
+            if widgets is None:
+                widgets = await sync_to_async(_load_widgets)(user)
+            config = widgets.get(topic[len("widget:"):])
+            channel = widget_channel(config) if config is not None else None
+            if channel is None:
+                raise BadTopic(f"Unknown widget topic {topic!r}.")
+            channels[channel] = topic
+            widget_configs[channel] = config
+        else:
+            raise BadTopic(f"Unknown topic {topic!r}.")
+    if not channels:
+        raise BadTopic("Subscribe to at least one topic.")
+    return channels, widget_configs
+
+
+def _parse_request(scope):
+    """
+    Return the stream ticket, access token, requested topics and Origin of
+    a stream request. Kept apart so the parsed query and headers are not
+    held while streaming.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    headers = dict(scope["headers"])
+    ticket = query.get("ticket", [None])[0]
+    raw_token = None
+    authorization = headers.get(b"authorization", b"").split()
+    if len(authorization) == 2 and authorization[0] == b"Bearer":
+        raw_token = authorization[1].decode("latin-1")
+    topics = [topic for value in query.get("topics", []) for topic in value.split(",") if topic]
+    return ticket, raw_token, topics, headers.get(b"origin", b"").decode("latin-1")
+
+
+async def event_stream(scope, receive, send):
+    """
+    The ASGI application behind PUSH_PATH.
+    """
+    if scope["method"] != "GET":
+        return await _send_error(send, status.HTTP_405_METHOD_NOT_ALLOWED, {"detail": "Method not allowed."})
+
+    ticket, raw_token, topics, origin = _parse_request(scope)
+    try:
+        if ticket is None and raw_token is None:
+            raise NotAuthenticated()
+        if len(broadcaster.subscriptions) >= settings.PUSH_MAX_CONNECTIONS:
+            raise TooManyConnections()
+        if ticket is not None:
+            user = await sync_to_async(_redeem_ticket)(ticket)
+        else:
+            user = await authenticate(raw_token)
+        channels, widget_configs = await resolve_topics(user, topics)
+    except APIException as exc:
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        return await _send_error(send, exc.status_code, detail)
+
+    response_headers = [
+        (b"content-type", b"text/event-stream"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+    ]
+    # Django's CorsMiddleware does not run here
+    if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+        response_headers += [(b"access-control-allow-origin", origin.encode()), (b"vary", b"Origin")]
+
+    subscription = broadcaster.subscribe(channels)
+    subscription.task = asyncio.current_task()
+    if widget_configs:
+        from .widget_data import get_widget_data_service
+
+        service = get_widget_data_service()
+        for channel, config in widget_configs.items():
+            broadcaster.keep_fresh(channel, functools.partial(service.keep_fresh, config))
+    watcher = asyncio.get_running_loop().create_task(_wait_for_disconnect(receive, subscription))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_200_OK,
+            "headers": response_headers,
+        })
+        # Tell EventSource how long to wait before reconnecting
+        await send({"type": "http.response.body", "body": b"retry: %d\n\n" % settings.PUSH_RETRY_MS, "more_body": True})
+        while True:
+            await subscription.ready.wait()
+            subscription.ready.clear()
+            chunks = []
+            while subscription.buffer:
+                channel, data = subscription.buffer.popleft()
+                if channel is None:
+                    chunks.append(data)
+                else:
+                    chunks.append(b"event: %s\ndata: %s\n\n" % (channels[channel].encode(), data))
+            await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+    except asyncio.CancelledError:
+        if not subscription.closed:
+            raise
+        # Evicted or disconnected: abandon the response and drop the connection
+    except OSError:
+        # The client went away mid-write
+        pass
+    finally:
+        watcher.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+async def _wait_for_disconnect(receive, subscription):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    broadcaster.unsubscribe(subscription)
+    subscription.close()
+
+
+async def _send_error(send, status_code, data):
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": _renderer.render(data)})
+
+
+class PushRouter:
+    """
+    ASGI application serving PUSH_PATH itself and everything else with the
+    wrapped (Django) application.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == settings.PUSH_PATH:
+            return await event_stream(scope, receive, send)
+        return await self.application(scope, receive, send)
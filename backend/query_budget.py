@@ -0,0 +1,215 @@
+"""
+Per-request SQL recording and query budgets.
+
+An execute wrapper installed on every database connection (see signals.py)
+records each query, with its duration, into the active QueryRecorder, if
+any. Views declare how many queries a request may run with the
+``query_budget`` decorator; QueryBudgetMiddleware records every request to
+a view with a budget and checks it afterwards. A request goes over budget
+when it runs more queries than allowed, or runs the same statement
+(compared by fingerprint: literals, placeholders and IN lists folded) more
+than once, the usual sign of an N+1 loop.
+
+QUERY_BUDGET_MODE selects what happens then: "log" writes the report to
+the "django.request" logger, "raise" raises QueryBudgetExceeded (for tests
+and benchmarks), "off" leaves the middleware out. ``assert_queries`` checks
+any block of code the same way.
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger("django.request")
+
+# The recorder of the current request or block
+current_recorder = contextvars.ContextVar("query_recorder", default=None)
+
+# Transaction control is issued around queries, not instead of them
+TRANSACTION_STATEMENT = re.compile(r"^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT|ROLLBACK)\b",
+                                   re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)", re.IGNORECASE)
+_VALUES = re.compile(r"\bVALUES\s*\(.*\)", re.IGNORECASE | re.DOTALL)
+_SPACE = re.compile(r"\s+")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """
+    Normalize ``sql`` so that statements differing only in literal values,
+    the length of IN lists or the number of inserted rows compare equal.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES.sub("VALUES (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper (see signals.py) timing the query into the current recorder.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query = (sql, time.perf_counter() - started)
+        # Recorders nest: the enclosing ones see the query too
+        while recorder is not None:
+            recorder.queries.append(query)
+            recorder = recorder._previous
+
+
+class QueryRecorder:
+    """
+    Record the queries run between start() and stop(), or inside a ``with``
+    block, on this thread and in the threads it hands work to with
+    sync_to_async.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._previous = None
+
+    def start(self):
+        self._previous = current_recorder.get()
+        current_recorder.set(self)
+        return self
+
+    def stop(self):
+        # set() rather than a token reset: the request may finish in another context
+        current_recorder.set(self._previous)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicates(self):
+        """
+        Return ``{fingerprint: (times, first sql)}`` for every statement run
+        more than once, transaction control aside.
+        """
+        counts = Counter()
+        first = {}
+        for sql, _ in self.queries:
+            if TRANSACTION_STATEMENT.match(sql):
+                continue
+            key = fingerprint(sql)
+            counts[key] += 1
+            first.setdefault(key, sql)
+        return {key: (times, first[key]) for key, times in counts.items() if times > 1}
+
+
+class QueryBudget:
+    """
+    At most ``max_queries`` queries, none of them repeated unless
+    ``allow_duplicates``.
+    """
+
+    def __init__(self, max_queries, allow_duplicates=False):
+        self.max_queries = max_queries
+        self.allow_duplicates = allow_duplicates
+
+    def __repr__(self):
+        return f"QueryBudget({self.max_queries}, allow_duplicates={self.allow_duplicates})"
+
+    def check(self, recorder, label):
+        """
+        Return a readable report if ``recorder`` went over this budget, else None.
+        """
+        problems = []
+        if recorder.count > self.max_queries:
+            problems.append(f"ran {recorder.count} queries, over its budget of {self.max_queries}")
+        duplicates = {} if self.allow_duplicates else recorder.duplicates()
+        if duplicates:
+            problems.append(f"repeated {len(duplicates)} statement(s)")
+        if not problems:
+            return None
+
+        lines = [f"{label} {' and '.join(problems)} ({recorder.seconds * 1000:.1f} ms in SQL)."]
+        if duplicates:
+            lines.append("Repeated statements:")
+            for times, sql in duplicates.values():
+                lines.append(f"  {times}x {sql}")
+        lines.append("Queries:")
+        for number, (sql, seconds) in enumerate(recorder.queries, 1):
+            lines.append(f"  {number:>3}. {seconds * 1000:7.2f} ms  {sql}")
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, report):
+        super().__init__(report)
+        self.report = report
+
+
+def query_budget(max_queries, allow_duplicates=False):
+    """
+    Declare the query budget of a view class or function.
+    """
+    def decorate(view):
+        view.query_budget = QueryBudget(max_queries, allow_duplicates)
+        return view
+    return decorate
+
+
+def view_budget(view_func):
+    """
+    The budget of a resolved view: the function's own, or that of the class
+    behind ``as_view()``.
+    """
+    budget = getattr(view_func, "query_budget", None)
+    if budget is None:
+        budget = getattr(getattr(view_func, "view_class", None), "query_budget", None)
+    return budget
+
+
+@contextmanager
+def assert_queries(max_queries, allow_duplicates=False, label="Block"):
+    """
+    Raise QueryBudgetExceeded if the block goes over the budget.
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    report = QueryBudget(max_queries, allow_duplicates).check(recorder, label)
+    if report:
+        raise QueryBudgetExceeded(report)
+
+
+def count_checked(view_name, recorder, exceeded):
+    with _stats_lock:
+        stats = _stats.setdefault(view_name, {"requests": 0, "exceeded": 0, "max_queries": 0})
+        stats["requests"] += 1
+        stats["exceeded"] += exceeded
+        stats["max_queries"] = max(stats["max_queries"], recorder.count)
+
+
+def query_budget_stats():
+    """
+    Checked requests, budget overruns and the most queries seen, per view.
+    """
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
@@ -0,0 +1,20 @@
+from rest_framework.renderers import JSONRenderer
+
+from . import json_codec
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson (see json_codec.py) unless JSON_CODEC
+    is "json". Indented output, for ``Accept: application/json; indent=4``
+    and the browsable API, and non-default UNICODE_JSON, COMPACT_JSON or
+    STRICT_JSON settings go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        fast = json_codec.enabled() and not self.ensure_ascii and self.compact and self.strict
+        if not fast or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return json_codec.dumps(data)
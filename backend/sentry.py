@@ -0,0 +1,208 @@
+"""
+Sentry sampling and forwarding policies.
+
+RouteSampler decides which requests are traced. Each route (matched by path
+prefix) has its own rate, and a rate of 0 means the route is never traced.
+By default the decision is taken up front, so unsampled requests cost
+nothing; failing requests are still reported, as error events for their
+exceptions, whether or not they were traced.
+
+Rates per status class ("5xx", "4xx", ...) can override the route rate, but
+the status is only known once the response is sent: with status rates
+configured, every request on a traced route is recorded in full and the
+decision is taken when the transaction is sent. That costs the tracing
+overhead on every such request, so status rates are off by default.
+
+RateLimitedEventHandler forwards log records to Sentry at or above its
+handler level, and at most ``events_per_minute`` of them.
+
+setup_sentry() initializes the SDK from settings.py, or with ``lazy`` only
+records the options: the SDK is then imported and initialized on the first
+request or the first event sent by a RateLimitedEventHandler, whichever
+comes first, so short-lived commands never pay for it.
+
+This module is imported from settings.py, so it must not use django.conf
+or import sentry_sdk at module level.
+"""
+
+import logging
+import random
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+_handlers = weakref.WeakSet()
+
+_pending_options = None
+_init_lock = threading.Lock()
+
+
+def setup_sentry(options, lazy=False):
+    """
+    Initialize Sentry with ``options`` now, or on first use with ``lazy``.
+    """
+    global _pending_options
+    _pending_options = options
+    if not lazy:
+        ensure_sentry()
+
+
+def ensure_sentry():
+    """
+    Run the pending sentry_sdk.init(), if any.
+    """
+    global _pending_options
+    if _pending_options is None:
+        return
+    with _init_lock:
+        if _pending_options is None:
+            return
+        import sentry_sdk
+        from sentry_sdk.integrations.logging import LoggingIntegration
+
+        sentry_sdk.init(
+            **_pending_options,
+            integrations=[
+                # Log records become events only through RateLimitedEventHandler;
+                # the integration just keeps breadcrumbs
+                LoggingIntegration(event_level=None),
+            ],
+        )
+        _pending_options = None
+
+
+def init_on_first_request(sender, **kwargs):
+    """
+    request_started receiver for lazy initialization. The first request
+    itself is not traced.
+    """
+    from django.core.signals import request_started
+
+    ensure_sentry()
+    request_started.disconnect(init_on_first_request)
+
+
+def parse_rates(value):
+    """
+    Parse "key=rate" pairs separated by commas, e.g. "/api/logs/=0,5xx=1".
+    """
+    rates = {}
+    for item in value.split(","):
+        if item.strip():
+            key, _, rate = item.rpartition("=")
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+class RouteSampler:
+    """
+    traces_sampler / before_send_transaction pair for sentry_sdk.init().
+    """
+
+    def __init__(self, default_rate, route_rates=None, status_rates=None):
+        self.default_rate = default_rate
+        # Longest prefix first, so the most specific route wins
+        self.route_rates = sorted((route_rates or {}).items(), key=lambda item: -len(item[0]))
+        self.status_rates = status_rates or {}
+
+    def route_rate(self, path):
+        for prefix, rate in self.route_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def __call__(self, sampling_context):
+        """
+        traces_sampler: return the head sampling rate for a new transaction.
+        """
+        environ = sampling_context.get("wsgi_environ")
+        scope = sampling_context.get("asgi_scope")
+        if environ is not None:
+            path = environ.get("PATH_INFO", "")
+        elif scope is not None:
+            path = scope.get("path", "")
+        else:
+            # Not a request (e.g. a management command): keep the caller's decision
+            parent_sampled = sampling_context.get("parent_sampled")
+            return self.default_rate if parent_sampled is None else float(parent_sampled)
+
+        rate = self.route_rate(path)
+        if rate <= 0:
+            return 0.0
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None and not self.status_rates:
+            # Follow the frontend's decision for distributed traces
+            return float(parent_sampled)
+        if self.status_rates:
+            # Record every request; before_send_transaction samples by status
+            return 1.0
+        return rate
+
+    def before_send_transaction(self, event, hint):
+        if not self.status_rates:
+            return event
+        rate = self.status_rate(event)
+        if rate is None:
+            path = urlsplit(event.get("request", {}).get("url", "")).path
+            rate = self.route_rate(path)
+        return event if random.random() < rate else None
+
+    def status_rate(self, event):
+        status_code = (event.get("tags") or {}).get("http.status_code")
+        if status_code is None:
+            trace_data = event.get("contexts", {}).get("trace", {}).get("data", {})
+            status_code = trace_data.get("http.response.status_code")
+        if status_code is None:
+            return None
+        status_code = str(status_code)
+        return self.status_rates.get(status_code, self.status_rates.get(f"{status_code[:1]}xx"))
+
+
+class RateLimitedEventHandler(logging.Handler):
+    """
+    Handler passing records to Sentry's EventHandler, at most
+    ``events_per_minute`` of them, with bursts of up to the same number.
+    Records over the limit are dropped and counted.
+    """
+
+    def __init__(self, level=0, events_per_minute=60):
+        super().__init__(level=level)
+        self._event_handler = None
+        self.capacity = float(events_per_minute)
+        self.rate = events_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+        self._limit_lock = threading.Lock()
+        _handlers.add(self)
+
+    def emit(self, record):
+        with self._limit_lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return
+            self.tokens -= 1
+            self.sent += 1
+        if self._event_handler is None:
+            ensure_sentry()
+            from sentry_sdk.integrations.logging import EventHandler
+
+            self._event_handler = EventHandler()
+        self._event_handler.handle(record)
+
+
+def forwarding_stats():
+    """
+    Return sent/dropped event counts of every RateLimitedEventHandler.
+    """
+    handlers = list(_handlers)
+    return {
+        "handlers": len(handlers),
+        "sent": sum(handler.sent for handler in handlers),
+        "dropped": sum(handler.dropped for handler in handlers),
+    }
@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,6 +24,37 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class BulkUserSerializer(UserRegistrationSerializer):
+    """
+    One row of a bulk import: the registration fields, with either a
+    plain ``password`` or an already encoded ``password_hash``. Username
+    uniqueness is checked for the whole batch (see provisioning.py), not
+    with a query per row.
+    """
+
+    password = serializers.CharField(write_only=True, required=False)
+    password_hash = serializers.CharField(write_only=True, required=False)
+
+    class Meta(UserRegistrationSerializer.Meta):
+        fields = (*UserRegistrationSerializer.Meta.fields, "password_hash")
+        extra_kwargs = {"username": {"validators": [UnicodeUsernameValidator()]}}
+
+    def validate_password_hash(self, value):
+        try:
+            identify_hasher(value)
+        except ValueError:
+            raise serializers.ValidationError("Unknown password hash format.")
+        return value
+
+    def validate(self, attrs):
+        if "password" in attrs and "password_hash" in attrs:
+            raise serializers.ValidationError("Provide either password or password_hash, not both.")
+        # Without either, the import may create the user with an unusable password
+        if "password" not in attrs and "password_hash" not in attrs and not self.context.get("allow_no_password"):
+            raise serializers.ValidationError("Provide either password or password_hash.")
+        return attrs
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -33,6 +67,28 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
         fields = ('first_name', 'last_name', 'email')
 
 
+def meta_limit_error(meta, max_depth, max_keys):
+    """
+    Walk a meta dict once and return an error message if it is nested deeper
+    than max_depth levels or holds more than max_keys keys in total.
+    """
+    keys = 0
+    stack = [(meta, 1)]
+    while stack:
+        value, depth = stack.pop()
+        if depth > max_depth:
+            return f"Ensure meta is nested no more than {max_depth} levels deep."
+        if isinstance(value, dict):
+            keys += len(value)
+            if keys > max_keys:
+                return f"Ensure meta has no more than {max_keys} keys."
+            children = value.values()
+        else:
+            children = value
+        stack.extend((child, depth + 1) for child in children if isinstance(child, (dict, list)))
+    return None
+
+
 class LogEntrySerializer(serializers.Serializer):
     LEVEL_CHOICES = (
         ('DEBUG', 'DEBUG'),
@@ -43,11 +99,57 @@ class LogEntrySerializer(serializers.Serializer):
     )
 
     level = serializers.ChoiceField(choices=LEVEL_CHOICES, default='INFO')
-    message = serializers.CharField()
+    message = serializers.CharField(max_length=settings.LOG_ENTRY_MAX_MESSAGE_LENGTH)
     meta = serializers.DictField(child=serializers.JSONField(), required=False)
     timestamp = serializers.DateTimeField(required=False)
 
+    def validate_meta(self, value):
+        error = meta_limit_error(value, settings.LOG_ENTRY_MAX_META_DEPTH, settings.LOG_ENTRY_MAX_META_KEYS)
+        if error:
+            raise serializers.ValidationError(error)
+        return value
+
 
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True, write_only=True)
     new_password = serializers.CharField(required=True, write_only=True)
+
+
+class LogQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    # Minimum level
+    level = serializers.ChoiceField(choices=LogEntrySerializer.LEVEL_CHOICES, required=False)
+    logger = serializers.CharField(required=False)
+    contains = serializers.CharField(required=False, trim_whitespace=False)
+    # Comma-separated log names, e.g. "frontend,backend"; all logs by default
+    source = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.LOG_QUERY_MAX_RESULTS, default=1000)
+
+
+class WidgetPositionSerializer(serializers.Serializer):
+    x = serializers.IntegerField(min_value=0)
+    y = serializers.IntegerField(min_value=0)
+
+
+class WidgetSizeSerializer(serializers.Serializer):
+    w = serializers.IntegerField(min_value=1)
+    h = serializers.IntegerField(min_value=1)
+
+
+class WidgetSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=64)
+    type = serializers.CharField(max_length=64)
+    position = WidgetPositionSerializer()
+    size = WidgetSizeSerializer()
+    config = serializers.DictField(child=serializers.JSONField(), required=False, default=dict)
+
+
+class DashboardLayoutSerializer(serializers.Serializer):
+    widgets = WidgetSerializer(many=True, max_length=settings.DASHBOARD_MAX_WIDGETS)
+
+    def validate_widgets(self, value):
+        ids = [widget["id"] for widget in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Widget ids must be unique.")
+        return value
@@ -13,31 +13,74 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from decouple import config
 import os
-from pythonjsonlogger import jsonlogger
+import tempfile
 
 from corsheaders.defaults import default_headers
 
-import sentry_sdk
-
-# Initialize Sentry with DSN from environment variable
-sentry_sdk.init(
-    dsn=config("SENTRY_DSN", default=None),  # If DSN is not set, Sentry will be disabled
-    # Add data like request headers and IP for users,
-    # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
-    send_default_pii=config("SENTRY_SEND_PII", default=True, cast=bool),
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for tracing.
-    traces_sample_rate=config("SENTRY_SAMPLE_RATE", default=1.0, cast=float),
-    _experiments={
-        # Set continuous_profiling_auto_start to True
-        # to automatically start the profiler when possible.
-        "continuous_profiling_auto_start": config("SENTRY_PROFILING", default=True, cast=bool),
-    },
+from backend.sentry import RouteSampler, parse_rates, setup_sentry
+
+# Start Sentry, the JSON log formatter and the log files on first use rather
+# than at startup; speeds up worker boot and management commands
+LAZY_INIT = config("LAZY_INIT", default=False, cast=bool)
+
+# Decide per route (path prefix) which requests are traced, e.g.
+# SENTRY_TRACES_ROUTE_RATES="/api/logs/=0,/api/token/=0.05". Per status
+# class rates, e.g. SENTRY_TRACES_STATUS_RATES="5xx=1,4xx=0.2", make every
+# request on a traced route pay for full tracing (see backend/sentry.py)
+sentry_sampler = RouteSampler(
+    default_rate=config("SENTRY_SAMPLE_RATE", default=0.1, cast=float),
+    route_rates=config("SENTRY_TRACES_ROUTE_RATES", default="/api/logs/=0,/api/stats/=0", cast=parse_rates),
+    status_rates=config("SENTRY_TRACES_STATUS_RATES", default="", cast=parse_rates),
+)
+
+# Initialize Sentry with DSN from environment variable; log records become
+# events only through the rate-limited "sentry" handler below
+setup_sentry(
+    dict(
+        dsn=config("SENTRY_DSN", default=None),  # If DSN is not set, Sentry will be disabled
+        # Add data like request headers and IP for users,
+        # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
+        send_default_pii=config("SENTRY_SEND_PII", default=True, cast=bool),
+        # Sample transactions per route and status instead of a flat rate
+        traces_sampler=sentry_sampler,
+        before_send_transaction=sentry_sampler.before_send_transaction,
+        _experiments={
+            # Set continuous_profiling_auto_start to True
+            # to automatically start the profiler when possible.
+            "continuous_profiling_auto_start": config("SENTRY_PROFILING", default=False, cast=bool),
+        },
+    ),
+    lazy=LAZY_INIT,
 )
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Log files rotate when they reach LOG_FILE_MAX_BYTES and/or every
+# LOG_FILE_ROTATE_INTERVAL LOG_FILE_ROTATE_WHEN units ("H", "D", "MIDNIGHT";
+# empty for size only). Rotated files are gzipped in the background.
+# Directory of the log files written by the handlers below
+LOG_DIR = config("LOG_DIR", default=os.path.join(BASE_DIR, "logs"))
+
+LOG_FILE_ROTATION = {
+    "maxBytes": config("LOG_FILE_MAX_BYTES", default=1024 * 1024 * 5, cast=int),  # 5 MB
+    "backupCount": config("LOG_FILE_BACKUP_COUNT", default=5, cast=int),
+    "when": config("LOG_FILE_ROTATE_WHEN", default="") or None,
+    "interval": config("LOG_FILE_ROTATE_INTERVAL", default=1, cast=int),
+    "compress": config("LOG_FILE_COMPRESS", default=True, cast=bool),
+    # Open each file on its first record in lazy-init mode
+    "delay": LAZY_INIT,
+}
+
+JSON_LOG_FORMATTER = {
+    "()": "backend.json_formatter.CachingJsonFormatter",
+    "fmt": "%(asctime)s %(name)s %(levelname)s %(message)s %(meta)s",
+}
+if LAZY_INIT:
+    # Import pythonjsonlogger when the first JSON record is formatted
+    JSON_LOG_FORMATTER = {**JSON_LOG_FORMATTER, "()": "backend.log_handlers.LazyFormatter",
+                          "target": JSON_LOG_FORMATTER["()"]}
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -49,75 +92,69 @@ LOGGING = {
             "callback": lambda record: not record.name.startswith("frontend_logger"),
         },
     },
+    # Each formatter renders a record once, however many handlers share it
     "formatters": {
         "text": {
-            "format": "{asctime} - {levelname} - {message}",
+            "()": "backend.log_handlers.CachingFormatter",
+            "fmt": "{asctime} - {levelname} - {message}",
             "style": "{",
         },
-        "json": {
-            "()": jsonlogger.JsonFormatter,
-            "fmt": "%(asctime)s %(levelname)s %(message)s %(meta)s",
-        },
+        "json": JSON_LOG_FORMATTER,
     },
     "handlers": {
         'sentry': {
-            'level': 'DEBUG',
-            'class': 'sentry_sdk.integrations.logging.EventHandler',
+            # Only records at or above SENTRY_LOG_LEVEL, at most SENTRY_LOG_EVENTS_PER_MINUTE
+            'level': config("SENTRY_LOG_LEVEL", default="ERROR"),
+            'class': 'backend.sentry.RateLimitedEventHandler',
+            'events_per_minute': config("SENTRY_LOG_EVENTS_PER_MINUTE", default=60, cast=int),
         },
         "django_request_text": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/django_request.log"),
-            "maxBytes": 1024 * 1024 * 5,  # 5 MB
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "django_request.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "text",
         },
         "root_file_text": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/root.log"),
-            "maxBytes": 1024 * 1024 * 5,  # 5 MB
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "root.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "text",
         },
         "root_file_json": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/root_json.log"),
-            "maxBytes": 1024 * 1024 * 5,
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "root_json.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "json",
         },
         "backend_file_text": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/backend.log"),
-            "maxBytes": 1024 * 1024 * 5,  # 5 MB
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "backend.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "text",
         },
         "backend_file_json": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/backend_json.log"),
-            "maxBytes": 1024 * 1024 * 5,
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "backend_json.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "json",
         },
         "frontend_file_text": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/frontend.log"),
-            "maxBytes": 1024 * 1024 * 5,  # 5 MB
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "frontend.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "text",
         },
         "frontend_file_json": {
             "level": "DEBUG",
-            "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/frontend_json.log"),
-            "maxBytes": 1024 * 1024 * 5,
-            "backupCount": 5,
+            "class": "backend.log_handlers.CompressingRotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "frontend_json.log"),
+            **LOG_FILE_ROTATION,
             "formatter": "json",
         },
     },
@@ -147,6 +184,34 @@ LOGGING = {
     },
 }
 
+# JSON log files served by /api/logs/query/ and the query_logs command, and
+# where their sidecar indexes are kept
+LOG_QUERY_DIR = config("LOG_QUERY_DIR", default=LOG_DIR)
+LOG_QUERY_INDEX_DIR = config("LOG_QUERY_INDEX_DIR", default=os.path.join(LOG_DIR, ".index"))
+# Upper bound for the "limit" parameter of /api/logs/query/
+LOG_QUERY_MAX_RESULTS = config("LOG_QUERY_MAX_RESULTS", default=10000, cast=int)
+
+# Opt-in queue-backed logging: file handlers are written by background threads
+# fed from a bounded in-memory queue (see backend/logging_queue.py)
+LOGGING_CONFIG = "backend.logging_queue.configure_logging"
+LOG_ASYNC = config("LOG_ASYNC", default=False, cast=bool)
+LOG_QUEUE_SIZE = config("LOG_QUEUE_SIZE", default=10000, cast=int)
+# One of "block", "drop-oldest", "drop-below-level"
+LOG_QUEUE_OVERFLOW = config("LOG_QUEUE_OVERFLOW", default="block")
+# With "drop-below-level", records below this level are dropped when the queue is full
+LOG_QUEUE_DROP_LEVEL = config("LOG_QUEUE_DROP_LEVEL", default="WARNING")
+# Seconds to wait for room with a blocking policy; 0 waits forever
+LOG_QUEUE_BLOCK_TIMEOUT = config("LOG_QUEUE_BLOCK_TIMEOUT", default=0, cast=float)
+
+# Unix socket of the log collector (manage.py log_collector). When set, workers
+# ship formatted records to it instead of writing the files themselves, and it
+# takes precedence over LOG_ASYNC (see backend/log_collector.py)
+LOG_COLLECTOR_SOCKET = config("LOG_COLLECTOR_SOCKET", default="")
+# Records a worker buffers while the collector is slow or restarting; the oldest are dropped beyond this
+LOG_COLLECTOR_BUFFER_SIZE = config("LOG_COLLECTOR_BUFFER_SIZE", default=50000, cast=int)
+# Records per frame sent to the collector
+LOG_COLLECTOR_BATCH_SIZE = config("LOG_COLLECTOR_BATCH_SIZE", default=500, cast=int)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -156,7 +221,53 @@ SECRET_KEY = config("SECRET_KEY", default="django-insecure-default-key-for-dev")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config("DEBUG", default=False, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config(
+    "ALLOWED_HOSTS",
+    default="",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+
+# Request logging (backend/middleware.py RequestLoggingMiddleware)
+REQUEST_LOG_ENABLED = config("REQUEST_LOG_ENABLED", default=DEBUG, cast=bool)
+# "full" pretty-prints parsed bodies, "bounded" logs raw bodies of up to
+# REQUEST_LOG_MAX_BODY_BYTES and only the length of larger ones
+REQUEST_LOG_MODE = config("REQUEST_LOG_MODE", default="full")
+REQUEST_LOG_MAX_BODY_BYTES = config("REQUEST_LOG_MAX_BODY_BYTES", default=2048, cast=int)
+# Fraction of requests to log, between 0.0 and 1.0
+REQUEST_LOG_SAMPLE_RATE = config("REQUEST_LOG_SAMPLE_RATE", default=1.0, cast=float)
+# Comma-separated path prefixes; an empty include list matches every path
+REQUEST_LOG_INCLUDE_PATHS = config(
+    "REQUEST_LOG_INCLUDE_PATHS",
+    default="",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+REQUEST_LOG_EXCLUDE_PATHS = config(
+    "REQUEST_LOG_EXCLUDE_PATHS",
+    default="",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+
+# Response logging (backend/middleware.py ResponseLoggingMiddleware)
+RESPONSE_LOG_ENABLED = config("RESPONSE_LOG_ENABLED", default=DEBUG, cast=bool)
+# When False, response bodies are never buffered, decoded or re-parsed for logging
+RESPONSE_LOG_BODIES = config("RESPONSE_LOG_BODIES", default=True, cast=bool)
+# Per-route latency histograms (backend/latency.py), served at /api/stats/
+LATENCY_HISTOGRAMS = config("LATENCY_HISTOGRAMS", default=True, cast=bool)
+
+# Prometheus metrics served at /metrics (see backend/metrics.py)
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+# Bearer token scrapers must send; when empty, /metrics is only served with DEBUG
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# Memory-mapped files shared by the worker processes, kept out of the source
+# tree; empty keeps metrics per process. Empty it whenever the server starts
+# (manage.py clear_metrics).
+PROMETHEUS_MULTIPROC_DIR = config(
+    "PROMETHEUS_MULTIPROC_DIR", default=os.path.join(tempfile.gettempdir(), "dashy-metrics")
+)
+
+# What to do when a request goes over its view's query_budget (see
+# backend/query_budget.py): "log" a report, "raise" QueryBudgetExceeded, or "off"
+QUERY_BUDGET_MODE = config("QUERY_BUDGET_MODE", default="log" if DEBUG else "off")
 
 
 # Application definition
@@ -171,16 +282,113 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework.authtoken",
     "corsheaders",
+    "backend",
 ]
 
+# Resolve JWT users from the "auth" cache instead of querying the database per request
+AUTH_USER_CACHE = config("AUTH_USER_CACHE", default=True, cast=bool)
+AUTH_USER_CACHE_TTL = config("AUTH_USER_CACHE_TTL", default=60, cast=int)
+AUTH_USER_CACHE_MAX_ENTRIES = config("AUTH_USER_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+# Encode and decode JSON bodies with "orjson" or the stdlib "json" module;
+# both produce the same responses (see backend/json_codec.py)
+JSON_CODEC = config("JSON_CODEC", default="orjson")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "backend.authentication.CachedJWTAuthentication"
+        if AUTH_USER_CACHE
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "backend.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "backend.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
 }
 
+# Maximum number of entries accepted in one batched POST to /api/logs/
+LOG_INGEST_MAX_BATCH = config("LOG_INGEST_MAX_BATCH", default=500, cast=int)
+# Limits applied to every ingested log entry
+LOG_ENTRY_MAX_MESSAGE_LENGTH = config("LOG_ENTRY_MAX_MESSAGE_LENGTH", default=10000, cast=int)
+LOG_ENTRY_MAX_META_DEPTH = config("LOG_ENTRY_MAX_META_DEPTH", default=10, cast=int)
+LOG_ENTRY_MAX_META_KEYS = config("LOG_ENTRY_MAX_META_KEYS", default=200, cast=int)
+
+# Collapse identical frontend log records (level, message, meta shape) seen
+# within this many seconds into one summary record; 0 disables aggregation
+LOG_AGGREGATION_WINDOW = config("LOG_AGGREGATION_WINDOW", default=10, cast=float)
+# Open windows kept per process; the least recently used is closed first
+LOG_AGGREGATION_MAX_KEYS = config("LOG_AGGREGATION_MAX_KEYS", default=1000, cast=int)
+
+# Whether the "default" cache (CACHES below) is local to each server process.
+# Writes only invalidate renderings in the cache they go through, so other
+# processes keep serving theirs until they expire: keep them short then.
+DEFAULT_CACHE_PER_PROCESS = config(
+    "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+) == "django.core.cache.backends.locmem.LocMemCache"
+
+# Seconds a rendered profile stays in the "default" cache; writes make it
+# unreachable for processes sharing the cache (see backend/profiles.py)
+PROFILE_CACHE_TTL = config("PROFILE_CACHE_TTL", default=5 if DEFAULT_CACHE_PER_PROCESS else 24 * 60 * 60, cast=int)
+
+# Widgets allowed on one dashboard layout
+DASHBOARD_MAX_WIDGETS = config("DASHBOARD_MAX_WIDGETS", default=100, cast=int)
+# Seconds a rendered layout stays in the "default" cache; writes invalidate it
+DASHBOARD_CACHE_TTL = config("DASHBOARD_CACHE_TTL", default=5 if DEFAULT_CACHE_PER_PROCESS else 300, cast=int)
+
+# Widget data sources (see backend/widget_data.py); a widget picks one with config["source"]
+WIDGET_SOURCES = {
+    "http_json": "backend.widget_data.HTTPJSONSource",
+}
+# The "stub" source echoes its config back, for development and benchmarks
+WIDGET_STUB_SOURCE = config("WIDGET_STUB_SOURCE", default=DEBUG, cast=bool)
+if WIDGET_STUB_SOURCE:
+    WIDGET_SOURCES["stub"] = "backend.widget_data.StubSource"
+# Hosts the http_json source may fetch from
+WIDGET_HTTP_ALLOWED_HOSTS = config(
+    "WIDGET_HTTP_ALLOWED_HOSTS",
+    default="",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+# Largest upstream response read, in bytes
+WIDGET_HTTP_MAX_BYTES = config("WIDGET_HTTP_MAX_BYTES", default=1024 * 1024, cast=int)
+# Seconds to wait for a source before reporting the widget as timed out
+WIDGET_FETCH_TIMEOUT = config("WIDGET_FETCH_TIMEOUT", default=5.0, cast=float)
+# Threads per process fetching widget data
+WIDGET_FETCH_WORKERS = config("WIDGET_FETCH_WORKERS", default=8, cast=int)
+
+# Per-client token buckets for log ingestion (see backend/admission.py)
+LOG_ADMISSION_ENABLED = config("LOG_ADMISSION_ENABLED", default=True, cast=bool)
+LOG_ADMISSION_PATHS = config(
+    "LOG_ADMISSION_PATHS",
+    default="/api/logs/",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+# Sustained entries per second and burst size, per client
+LOG_ADMISSION_RATE = config("LOG_ADMISSION_RATE", default=20, cast=float)
+LOG_ADMISSION_BURST = config("LOG_ADMISSION_BURST", default=200, cast=float)
+# Fraction of the burst each level must leave in the bucket, e.g. "DEBUG:0.5,INFO:0.25"
+LOG_ADMISSION_RESERVE = config(
+    "LOG_ADMISSION_RESERVE",
+    default="DEBUG:0.5,INFO:0.25,WARNING:0.1",
+    cast=lambda v: {
+        level.strip().upper(): float(fraction)
+        for level, fraction in (item.split(":") for item in v.split(",") if item.strip())
+    }
+)
+# Clients tracked per process; the least recently seen are forgotten first
+LOG_ADMISSION_MAX_CLIENTS = config("LOG_ADMISSION_MAX_CLIENTS", default=10000, cast=int)
+
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # Add this at the top
+    # Prometheus request, latency and query series; times everything below
+    "backend.middleware.MetricsMiddleware",
+    # Early 429 for log posts over the client's budget, before any parsing
+    "backend.middleware.LogAdmissionMiddleware",
     "backend.middleware.RequestLoggingMiddleware",
     "backend.middleware.ResponseLoggingMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -190,6 +398,10 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # 503 instead of 500 when the password hashing pool is full outside DRF
+    "backend.middleware.HashingOverloadedMiddleware",
+    # Last, so that the response hooks of other middleware do not count against a view's budget
+    "backend.middleware.QueryBudgetMiddleware",
 ]
 
 CORS_ALLOWED_ORIGINS = config(
@@ -201,6 +413,7 @@ CORS_ALLOWED_ORIGINS = config(
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "baggage",
     "sentry-trace",
+    "x-log-level",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -223,22 +436,118 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "backend.wsgi.application"
 
+# Serve /api/logs/ and /api/profile/ with async-native views; only worth
+# enabling when running the ASGI application (e.g. under uvicorn)
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
+# Server-sent events served by the ASGI application (see backend/push.py)
+PUSH_PATH = config("PUSH_PATH", default="/api/events/")
+# Messages buffered per connection before a slow client is disconnected
+PUSH_BUFFER_SIZE = config("PUSH_BUFFER_SIZE", default=64, cast=int)
+# Seconds between keep-alive comments on idle streams
+PUSH_HEARTBEAT = config("PUSH_HEARTBEAT", default=25.0, cast=float)
+# Reconnection delay suggested to EventSource clients, in milliseconds
+PUSH_RETRY_MS = config("PUSH_RETRY_MS", default=3000, cast=int)
+# Open streams per worker process; further connections get a 503
+PUSH_MAX_CONNECTIONS = config("PUSH_MAX_CONNECTIONS", default=10000, cast=int)
+# Seconds a stream ticket from /api/events/ticket/ stays valid (it is used once)
+PUSH_TICKET_TTL = config("PUSH_TICKET_TTL", default=30, cast=int)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DB_POOL enables psycopg's connection pool (one pool per worker process);
+# otherwise DB_CONN_MAX_AGE controls persistent connections.
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # Django's postgresql backend plus connection checkout statistics
+        "ENGINE": "backend.postgresql",
         "NAME": config("POSTGRES_DB", default="dashboard"),
         "USER": config("POSTGRES_USER", default="devuser"),
         "PASSWORD": config("POSTGRES_PASSWORD", default="devpassword"),
         "HOST": config("DB_HOST", default="localhost"),
         "PORT": config("DB_PORT", default="5432"),
+        # Pooling does not support persistent connections
+        "CONN_MAX_AGE": 0 if DB_POOL else config("DB_CONN_MAX_AGE", default=0, cast=int),
+        # Check connections before reuse (on pool checkout when pooling)
+        "CONN_HEALTH_CHECKS": config("DB_HEALTH_CHECKS", default=True, cast=bool),
+        "OPTIONS": {
+            "pool": {
+                "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+                "max_size": config("DB_POOL_MAX_SIZE", default=4, cast=int),
+                # Seconds to wait for a free connection before failing
+                "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+                # Seconds after which connections are replaced
+                "max_lifetime": config("DB_POOL_MAX_LIFETIME", default=3600, cast=float),
+                "max_idle": config("DB_POOL_MAX_IDLE", default=600, cast=float),
+            },
+        } if DB_POOL else {},
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The local-memory defaults are per process; point the backends at a shared
+# cache (e.g. Redis) so invalidations reach every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="dashy"),
+    },
+    "auth": {
+        "BACKEND": config("AUTH_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("AUTH_CACHE_LOCATION", default="dashy-auth"),
+        "TIMEOUT": AUTH_USER_CACHE_TTL,
+        "OPTIONS": {"MAX_ENTRIES": AUTH_USER_CACHE_MAX_ENTRIES},
+    },
+    # Shared widget data; entry lifetimes are set per source
+    "widgets": {
+        "BACKEND": config("WIDGET_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("WIDGET_CACHE_LOCATION", default="dashy-widgets"),
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# Hashes are computed in a process pool (see backend/hashing.py). New hashes
+# use PASSWORD_HASHER ("pbkdf2" or "argon2"); existing ones are rehashed on
+# the next login when the hasher or its work factors change.
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+POOLED_PASSWORD_HASHERS = {
+    "pbkdf2": "backend.hashing.PooledPBKDF2PasswordHasher",
+    "argon2": "backend.hashing.PooledArgon2PasswordHasher",
+}
+PASSWORD_HASHERS = [
+    POOLED_PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(hasher for name, hasher in POOLED_PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", default=870000, cast=int)
+PASSWORD_ARGON2_TIME_COST = config("PASSWORD_ARGON2_TIME_COST", default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config("PASSWORD_ARGON2_MEMORY_COST", default=102400, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config("PASSWORD_ARGON2_PARALLELISM", default=8, cast=int)
+# Worker processes per server process (0 hashes on the request thread). Each
+# server process has its own pool, so the default shares the CPUs between the
+# WEB_CONCURRENCY server processes (as read by gunicorn and uvicorn)
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=1, cast=int)
+HASHING_WORKERS = config("HASHING_WORKERS", default=max(1, (os.cpu_count() or 1) // max(1, WEB_CONCURRENCY)), cast=int)
+# Hashes queued or running at once; more wait HASHING_QUEUE_TIMEOUT seconds, then get a 503
+HASHING_MAX_PENDING = config("HASHING_MAX_PENDING", default=4 * max(1, HASHING_WORKERS), cast=int)
+HASHING_QUEUE_TIMEOUT = config("HASHING_QUEUE_TIMEOUT", default=0, cast=float)
+
+# Bulk user provisioning (/api/register/bulk/ and manage.py import_users): rows
+# validated, hashed and inserted per transaction, and the most rows one request may carry
+PROVISIONING_BATCH_SIZE = config("PROVISIONING_BATCH_SIZE", default=500, cast=int)
+PROVISIONING_MAX_ROWS = config("PROVISIONING_MAX_ROWS", default=10000, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
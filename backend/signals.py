@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DashboardLayout
+
+# The cache helpers pull in DRF and simplejwt; they are imported by the
+# receivers so that startup (e.g. management commands) does not pay for them
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_caches(sender, instance, update_fields=None, **kwargs):
+    from rest_framework_simplejwt.settings import api_settings
+
+    from .authentication import invalidate_cached_user
+    from .profiles import bump_profile_version
+
+    # Profile updates, password changes and deletions must not be served from
+    # cache. Delete now and again after commit: a concurrent request may cache
+    # the old row until the transaction commits.
+    token_user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    invalidate_cached_user(token_user_id)
+    # Logins only touch last_login, which the profile does not show
+    bump_profile = update_fields is None or set(update_fields) != {"last_login"}
+    user_id = instance.pk
+
+    def after_commit():
+        invalidate_cached_user(token_user_id)
+        if bump_profile:
+            bump_profile_version(user_id)
+
+    transaction.on_commit(after_commit)
+
+
+@receiver(post_save, sender=DashboardLayout)
+@receiver(post_delete, sender=DashboardLayout)
+def invalidate_layout_cache(sender, instance, **kwargs):
+    from .dashboard import invalidate_layout
+
+    # After commit, so that a concurrent load cannot cache the old layout again
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_layout(user_id))
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    from .metrics import count_query
+    from .query_budget import record_query
+
+    # The wrapper list outlives reconnects of the same connection object
+    for wrapper in (count_query, record_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -15,29 +15,54 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .views import (
     UserRegistrationView,
+    BulkUserRegistrationView,
     UserProfileUpdateAPIView,
     UserProfileAPIView,
     LogEntryAPIView,
     ChangePasswordView,
+    DashboardDataAPIView,
+    DashboardLayoutAPIView,
+    LogQueryAPIView,
+    PushTicketAPIView,
+    StatsAPIView,
+    metrics_view,
 )
 
+if settings.ASYNC_VIEWS:
+    # Async-native views for the ASGI deployment
+    from .async_views import AsyncLogEntryView, AsyncUserProfileView
+
+    log_entry_view = AsyncLogEntryView.as_view()
+    user_profile_view = AsyncUserProfileView.as_view()
+else:
+    log_entry_view = LogEntryAPIView.as_view()
+    user_profile_view = UserProfileAPIView.as_view()
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/register/", UserRegistrationView.as_view(), name="register"),
-    path("api/profile/", UserProfileAPIView.as_view(), name="user_profile"),
+    path("api/register/bulk/", BulkUserRegistrationView.as_view(), name="register_bulk"),
+    path("api/profile/", user_profile_view, name="user_profile"),
     path(
         "api/profile/update/",
         UserProfileUpdateAPIView.as_view(),
         name="user_profile_update",
     ),
-    path("api/logs/", LogEntryAPIView.as_view(), name="log_entry"),
+    path("api/logs/", log_entry_view, name="log_entry"),
+    path("api/logs/query/", LogQueryAPIView.as_view(), name="log_query"),
     path("api/password/change/", ChangePasswordView.as_view(), name="change_password"),
+    path("api/dashboard/layout/", DashboardLayoutAPIView.as_view(), name="dashboard_layout"),
+    path("api/dashboard/data/", DashboardDataAPIView.as_view(), name="dashboard_data"),
+    path("api/events/ticket/", PushTicketAPIView.as_view(), name="push_ticket"),
+    path("api/stats/", StatsAPIView.as_view(), name="stats"),
+    path("metrics", metrics_view, name="metrics"),
 ]
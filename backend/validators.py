@@ -0,0 +1,206 @@
+"""
+Fast-path validation of ingested log entries.
+
+LogEntryValidator is compiled once from the fields of LogEntrySerializer and
+checks plain dict payloads (what the JSON and NDJSON parsers produce) without
+the per-field DRF machinery. It returns the same validated data and the same
+error messages and codes as the serializer; any other input type is handed to
+the serializer itself.
+"""
+
+import re
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.settings import ISO_8601, api_settings
+from rest_framework.utils import humanize_datetime
+
+from .serializers import LogEntrySerializer, meta_limit_error
+
+_SURROGATES = re.compile("[\ud800-\udfff]")
+
+
+class LogEntryValidator:
+    """
+    Validator for the LogEntrySerializer schema, with meta depth/key and
+    message length caps.
+    """
+
+    def __init__(self, max_message_length, max_meta_depth, max_meta_keys):
+        self.max_message_length = max_message_length
+        self.max_meta_depth = max_meta_depth
+        self.max_meta_keys = max_meta_keys
+
+        fields = LogEntrySerializer().fields
+        level, message, meta, timestamp = (
+            fields["level"], fields["message"], fields["meta"], fields["timestamp"]
+        )
+
+        self.level_choices = dict(level.choice_strings_to_values)
+        self.level_default = level.get_default()
+        self.level_errors = level.error_messages
+        self.message_errors = message.error_messages
+        self.meta_errors = meta.error_messages
+        self.meta_child_errors = meta.child.error_messages
+        self.timestamp_field = timestamp
+
+        input_formats = getattr(timestamp, "input_formats", api_settings.DATETIME_INPUT_FORMATS)
+        # Only ISO 8601 is compiled; other configured formats use the DRF field
+        self.iso_only = [fmt.lower() for fmt in input_formats] == [ISO_8601]
+        self.timestamp_invalid = ErrorDetail(
+            timestamp.error_messages["invalid"].format(
+                format=humanize_datetime.datetime_formats(input_formats)
+            ),
+            code="invalid",
+        )
+        self.message_max_length = ErrorDetail(
+            message.error_messages["max_length"].format(max_length=max_message_length),
+            code="max_length",
+        )
+        self.null_characters = ErrorDetail("Null characters are not allowed.", code="null_characters_not_allowed")
+
+    def validate(self, data):
+        """
+        Return ``(validated_data, errors)``; exactly one of them is None.
+        """
+        if type(data) is not dict:
+            return self._validate_with_serializer(data)
+
+        validated = {}
+        errors = {}
+
+        # level: ChoiceField with a default
+        value = data.get("level", self.level_default)
+        if value is None:
+            errors["level"] = [ErrorDetail(self.level_errors["null"], code="null")]
+        else:
+            choice = self.level_choices.get(value if type(value) is str else str(value))
+            if choice is None:
+                errors["level"] = [
+                    ErrorDetail(self.level_errors["invalid_choice"].format(input=value), code="invalid_choice")
+                ]
+            else:
+                validated["level"] = choice
+
+        # message: required CharField with max_length
+        if "message" not in data:
+            errors["message"] = [ErrorDetail(self.message_errors["required"], code="required")]
+        else:
+            message_error = self._check_message(data["message"], validated)
+            if message_error:
+                errors["message"] = message_error
+
+        # meta: optional DictField of JSON values
+        if "meta" in data:
+            meta_error = self._check_meta(data["meta"], validated)
+            if meta_error:
+                errors["meta"] = meta_error
+
+        # timestamp: optional DateTimeField
+        if "timestamp" in data:
+            timestamp_error = self._check_timestamp(data["timestamp"], validated)
+            if timestamp_error:
+                errors["timestamp"] = timestamp_error
+
+        if errors:
+            return None, errors
+        return validated, None
+
+    def _check_message(self, value, validated):
+        if value is None:
+            return [ErrorDetail(self.message_errors["null"], code="null")]
+        if type(value) is not str:
+            # Like CharField, only plain numbers are coerced to strings
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return [ErrorDetail(self.message_errors["invalid"], code="invalid")]
+            value = str(value)
+        value = value.strip()
+        if not value:
+            return [ErrorDetail(self.message_errors["blank"], code="blank")]
+
+        message_errors = []
+        if len(value) > self.max_message_length:
+            message_errors.append(self.message_max_length)
+        if "\x00" in value:
+            message_errors.append(self.null_characters)
+        surrogate = _SURROGATES.search(value)
+        if surrogate:
+            message_errors.append(ErrorDetail(
+                f"Surrogate characters are not allowed: U+{ord(surrogate.group()):X}.",
+                code="surrogate_characters_not_allowed",
+            ))
+        if message_errors:
+            return message_errors
+        validated["message"] = value
+        return None
+
+    def _check_meta(self, value, validated):
+        if value is None:
+            return [ErrorDetail(self.meta_errors["null"], code="null")]
+        if not isinstance(value, dict):
+            return [ErrorDetail(
+                self.meta_errors["not_a_dict"].format(input_type=type(value).__name__), code="not_a_dict"
+            )]
+
+        # JSON child values may be anything except a top-level null
+        child_errors = {
+            str(key): [ErrorDetail(self.meta_child_errors["null"], code="null")]
+            for key, child in value.items()
+            if child is None
+        }
+        if child_errors:
+            return child_errors
+
+        limit_error = meta_limit_error(value, self.max_meta_depth, self.max_meta_keys)
+        if limit_error:
+            return [ErrorDetail(limit_error, code="invalid")]
+
+        validated["meta"] = {str(key): child for key, child in value.items()}
+        return None
+
+    def _check_timestamp(self, value, validated):
+        if value is None:
+            return [ErrorDetail(self.timestamp_field.error_messages["null"], code="null")]
+        if not self.iso_only or type(value) is not str:
+            try:
+                validated["timestamp"] = self.timestamp_field.run_validation(value)
+            except ValidationError as exc:
+                return exc.detail
+            return None
+
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            return [self.timestamp_invalid]
+        try:
+            validated["timestamp"] = self.timestamp_field.enforce_timezone(parsed)
+        except ValidationError as exc:
+            return exc.detail
+        return None
+
+    def _validate_with_serializer(self, data):
+        serializer = LogEntrySerializer(data=data)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+
+
+_validator = None
+
+
+def validate_log_entry(data):
+    """
+    Validate one log entry with the validator compiled from settings.
+    Returns ``(validated_data, errors)``.
+    """
+    global _validator
+    if _validator is None:
+        _validator = LogEntryValidator(
+            max_message_length=settings.LOG_ENTRY_MAX_MESSAGE_LENGTH,
+            max_meta_depth=settings.LOG_ENTRY_MAX_META_DEPTH,
+            max_meta_keys=settings.LOG_ENTRY_MAX_META_KEYS,
+        )
+    return _validator.validate(data)
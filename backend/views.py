@@ -1,22 +1,101 @@
+import hmac
+import math
+
 from rest_framework import generics, permissions
 from .serializers import (
     UserRegistrationSerializer,
     UserProfileSerializer,
     UserProfileUpdateSerializer,
-    LogEntrySerializer,
     ChangePasswordSerializer,
+    DashboardLayoutSerializer,
+    LogQuerySerializer,
 )
+from . import json_codec, latency
+from .admission import admission_stats, admit_entries
+from .authentication import auth_cache_stats
+from .dashboard import etag_matches, get_rendered_layout, render_layout
+from .hashing import HashingOverloaded, hashing_stats
+from .log_aggregation import aggregation_stats, get_aggregator
+from .log_query import LogQuery, get_log_store
+from .metrics import count_invalid_log_entries, count_log_entries, render_metrics
+from .log_collector import collector_stats
+from .logging_queue import queue_stats
+from .json_patch import JSONPatchConflict, JSONPatchError, apply_patch
+from .models import DashboardLayout
+from .parsers import CSVParser, InvalidLine, JSONPatchParser, NDJSONParser, ORJSONParser
+from .profiles import profile_response
+from .provisioning import provision_users
+from .push import issue_ticket, push_stats
+from .query_budget import query_budget, query_budget_stats
+from .sentry import forwarding_stats
+from .validators import validate_log_entry
+from .widget_data import get_widget_data_service, widget_data_stats
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 import logging
 
+# Map the level names accepted by LogEntrySerializer to logging levels
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
 
+# Uniqueness check of the username, then the insert
+@query_budget(2)
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
 
 
+# Per batch: one uniqueness check and one insert
+@query_budget(1 + 2 * math.ceil(settings.PROVISIONING_MAX_ROWS / settings.PROVISIONING_BATCH_SIZE),
+              allow_duplicates=True)
+class BulkUserRegistrationView(APIView):
+    """
+    Create many users at once from a JSON array, NDJSON or CSV, for staff
+    users only. Each row is a registration with either ``password`` or an
+    encoded ``password_hash``; invalid rows are reported by index.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [ORJSONParser, NDJSONParser, CSVParser]
+
+    def post(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = settings.PROVISIONING_MAX_ROWS
+        if len(rows) > max_rows:
+            return Response(
+                {"detail": f"Too many users: {len(rows)}, at most {max_rows} allowed."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        created = 0
+        errors = []
+        for _, batch_created, batch_errors in provision_users(rows, settings.PROVISIONING_BATCH_SIZE):
+            created += batch_created
+            errors += batch_errors
+
+        summary = {"created": created, "rejected": len(errors), "errors": errors}
+        if created:
+            return Response(summary, status=status.HTTP_201_CREATED)
+        if errors:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+@query_budget(2)
 class UserProfileAPIView(generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -25,7 +104,12 @@ class UserProfileAPIView(generics.RetrieveAPIView):
         # Returns the currently authenticated user
         return self.request.user
 
+    def retrieve(self, request, *args, **kwargs):
+        # Cached rendering with ETag/Last-Modified (see profiles.py)
+        return profile_response(request, self.get_object().pk)
+
 
+@query_budget(2)
 class UserProfileUpdateAPIView(generics.UpdateAPIView):
     serializer_class = UserProfileUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -35,44 +119,111 @@ class UserProfileUpdateAPIView(generics.UpdateAPIView):
         return self.request.user
 
 
+@query_budget(1)
 class LogEntryAPIView(APIView):
     # Optionally, you might allow any user (even unauthenticated) to log
     permission_classes = []  # AllowAny
+    # Accept NDJSON bodies in addition to the default JSON/form parsers
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
 
     def post(self, request, *args, **kwargs):
         # logger = logging.getLogger("backend_logger")
         # logger.debug(f"Received log entry request: {request.data}")
 
-        # Get the logger (we'll configure it in settings)
-        feLogger = logging.getLogger("frontend_logger")
-
-        serializer = LogEntrySerializer(data=request.data)
-        if serializer.is_valid():
-            # logger.debug(f"Validated data: {serializer.validated_data}")
-            data = serializer.validated_data
-            level = data.get("level", "INFO")
-            message = data.get("message")
-            meta = data.get("meta", {})
-
-            # Log the message using the appropriate log level.
-            if level == "DEBUG":
-                feLogger.debug(message, extra={"meta": meta})
-            elif level == "INFO":
-                feLogger.info(message, extra={"meta": meta})
-            elif level == "WARNING":
-                feLogger.warning(message, extra={"meta": meta})
-            elif level == "ERROR":
-                feLogger.error(message, extra={"meta": meta})
-            elif level == "CRITICAL":
-                feLogger.critical(message, extra={"meta": meta})
+        # A JSON array or an NDJSON body carries a batch of entries
+        if isinstance(request.data, list):
+            return self.post_batch(request, request.data)
+
+        # Fast-path equivalent of LogEntrySerializer(data=request.data).is_valid()
+        data, errors = validate_log_entry(request.data)
+        if errors is None:
+            # logger.debug(f"Validated data: {data}")
+            if not admit_entries(request, [data]):
+                raise Throttled()
+            emit_log_entries([data])
 
             # logger.debug(f"Logged message: {message}")
             return Response({"status": "logged"}, status=status.HTTP_200_OK)
         else:
-            # logger.warning(f"Invalid data: {serializer.errors}")
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # logger.warning(f"Invalid data: {errors}")
+            count_invalid_log_entries(1)
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def post_batch(self, request, entries):
+        data, status_code = ingest_log_batch(request, entries)
+        return Response(data, status=status_code)
+
+
+def ingest_log_batch(request, entries):
+    """
+    Validate a batch of log entries, log the accepted ones the client's
+    budget admits and return the per-entry summary together with the
+    response status code.
+    """
+    max_batch = settings.LOG_INGEST_MAX_BATCH
+    if len(entries) > max_batch:
+        return (
+            {"detail": f"Batch too large: {len(entries)} entries, at most {max_batch} allowed."},
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    # Validate every entry first, then hand the accepted ones to the logger in one go
+    accepted = []
+    errors = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, InvalidLine):
+            errors.append({
+                "index": index,
+                "errors": {api_settings.NON_FIELD_ERRORS_KEY: [
+                    f"JSON parse error on line {entry.lineno} - {entry.error}"
+                ]},
+            })
+            continue
+        data, entry_errors = validate_log_entry(entry)
+        if entry_errors is None:
+            accepted.append(data)
+        else:
+            errors.append({"index": index, "errors": entry_errors})
+
+    count_invalid_log_entries(len(errors))
+    admitted = admit_entries(request, accepted)
+    emit_log_entries(admitted)
+
+    summary = {
+        "status": "logged",
+        "accepted": len(admitted),
+        "rejected": len(errors),
+        "shed": len(accepted) - len(admitted),
+        "errors": errors,
+    }
+    if accepted and not admitted:
+        return summary, status.HTTP_429_TOO_MANY_REQUESTS
+    if errors and not accepted:
+        return summary, status.HTTP_400_BAD_REQUEST
+    return summary, status.HTTP_200_OK
 
 
+def emit_log_entries(entries):
+    """
+    Log validated frontend entries on the frontend logger, using the
+    level each entry carries.
+    """
+    # Get the logger (we'll configure it in settings)
+    feLogger = logging.getLogger("frontend_logger")
+    # Repeated messages are collapsed into one record per window
+    aggregator = get_aggregator()
+    count_log_entries(entries, "logged")
+
+    for data in entries:
+        level = LOG_LEVELS[data.get("level", "INFO")]
+        if aggregator is not None:
+            aggregator.add(level, data.get("message"), data.get("meta", {}))
+        else:
+            feLogger.log(level, data.get("message"), extra={"meta": data.get("meta", {})})
+
+
+# The cached user has no password hash: it is loaded before the update
+@query_budget(2)
 class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -108,9 +259,204 @@ class ChangePasswordView(APIView):
                 status=status.HTTP_200_OK,
             )
 
+        except HashingOverloaded:
+            # Let DRF answer 503 so the client retries
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in password change: {str(e)}")
             return Response(
                 {"detail": "An unexpected error occurred."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+# The first write creates the layout inside a savepoint: 7 queries
+@query_budget(7)
+class DashboardLayoutAPIView(APIView):
+    """
+    The authenticated user's dashboard layout.
+
+    GET honours If-None-Match (304). PUT replaces the widget list, PATCH
+    applies a JSON Patch to {"widgets": [...]}; both honour If-Match (412)
+    and return the new layout with its ETag.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [ORJSONParser, JSONPatchParser]
+
+    def get(self, request, *args, **kwargs):
+        etag, body = get_rendered_layout(request.user)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def put(self, request, *args, **kwargs):
+        return self.write(request, lambda document: request.data)
+
+    def patch(self, request, *args, **kwargs):
+        return self.write(request, lambda document: apply_patch(document, request.data))
+
+    def write(self, request, change):
+        with transaction.atomic():
+            DashboardLayout.objects.get_or_create(user=request.user)
+            layout = DashboardLayout.objects.select_for_update().get(user=request.user)
+
+            if_match = request.headers.get("If-Match")
+            if if_match and not etag_matches(if_match, render_layout(layout.version, layout.widgets)[0]):
+                return Response(
+                    {"detail": "The layout has changed since it was loaded."},
+                    status=status.HTTP_412_PRECONDITION_FAILED,
+                )
+
+            try:
+                document = change({"widgets": layout.widgets})
+            except JSONPatchConflict as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+            except JSONPatchError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+            serializer = DashboardLayoutSerializer(data=document)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            layout.widgets = serializer.validated_data["widgets"]
+            layout.version += 1
+            layout.save(update_fields=["widgets", "version", "updated_at"])
+
+        etag, body = render_layout(layout.version, layout.widgets)
+        response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        return response
+
+
+@query_budget(2)
+class DashboardDataAPIView(APIView):
+    """
+    Data of every widget on the user's dashboard that has a source, keyed
+    by widget id. ``?ids=a,b`` limits the response to those widgets.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # The cached layout saves a query per dashboard load
+        _, body = get_rendered_layout(request.user)
+        widgets = json_codec.loads(body)["widgets"]
+        ids = request.query_params.get("ids")
+        if ids:
+            wanted = set(ids.split(","))
+            widgets = [widget for widget in widgets if widget["id"] in wanted]
+
+        configs = {widget["id"]: widget["config"] for widget in widgets if widget["config"].get("source")}
+        data = get_widget_data_service().get_many(configs, timeout=settings.WIDGET_FETCH_TIMEOUT)
+        return Response({"widgets": data}, status=status.HTTP_200_OK)
+
+
+@query_budget(1)
+class PushTicketAPIView(APIView):
+    """
+    Issue a single-use ticket for opening an event stream (see push.py),
+    so browsers never put the access token in the stream URL.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return Response(
+            {"ticket": issue_ticket(request.user), "expires_in": settings.PUSH_TICKET_TTL},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+@query_budget(0)
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint: every worker's metrics in text format.
+    Scrapers must send METRICS_TOKEN as a bearer token. Without a token the
+    endpoint is only served with DEBUG on, and answers 404 otherwise.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@query_budget(1)
+class LogQueryAPIView(APIView):
+    """
+    Stream stored JSON log records matching the query as NDJSON, oldest
+    first, for staff users only.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        serializer = LogQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        store = get_log_store()
+        sources = None
+        if "source" in params:
+            sources = [name.strip() for name in params["source"].split(",") if name.strip()]
+            unknown = set(sources) - set(store.sources())
+            if unknown:
+                return Response(
+                    {"source": [f"Unknown log: {', '.join(sorted(unknown))}."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        query = LogQuery(
+            since=params["since"].timestamp() if "since" in params else None,
+            until=params["until"].timestamp() if "until" in params else None,
+            level=params.get("level"),
+            logger=params.get("logger"),
+            contains=params.get("contains"),
+        )
+        lines = store.query(query, sources=sources, limit=params["limit"])
+        return StreamingHttpResponse(
+            (line + b"\n" for line in lines), content_type="application/x-ndjson"
+        )
+
+
+@query_budget(1)
+class StatsAPIView(APIView):
+    """
+    Runtime counters of this worker process, for staff users only.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "logging": queue_stats(),
+                "log_collector": collector_stats(),
+                "latency": latency.registry.snapshot(),
+                "auth_cache": auth_cache_stats(),
+                "admission": admission_stats(),
+                "aggregation": aggregation_stats(),
+                "sentry": forwarding_stats(),
+                "hashing": hashing_stats(),
+                "widgets": widget_data_stats(),
+                "push": push_stats(),
+                "query_budgets": query_budget_stats(),
+                "database": connection.pool_stats() if hasattr(connection, "pool_stats") else None,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def delete(self, request, *args, **kwargs):
+        # Start a fresh latency measurement window
+        latency.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,318 @@
+"""
+Widget data: pluggable source adapters behind a shared cache.
+
+A widget names its source in ``config["source"]``; the rest of its config
+is passed to the adapter registered under that name in WIDGET_SOURCES.
+Results are cached in the "widgets" cache under a key derived from the
+source and its parameters, so every user with the same widget shares one
+entry:
+
+* fresh (younger than the source's ttl): served from the cache;
+* stale (within the following stale_ttl): served from the cache while one
+  background refresh runs, guarded by a lock in the "widgets" cache. Only
+  a cache shared by the server processes (e.g. Redis) makes that one
+  refresh across processes; the per-process LocMemCache default allows one
+  per process;
+* missing: fetched, and concurrent requests for the same key in this
+  process wait for the one fetch in flight instead of starting their own.
+
+A failed fetch keeps serving the stale value when there is one.
+
+While a widget's channel has event stream subscribers (see push.py), the
+broadcaster runs keep_fresh() for it, which fetches the data again each
+time it is due, so subscribers get updates without anyone polling.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .push import broadcaster
+
+
+class SourceError(Exception):
+    """
+    A source could not produce data for the given parameters.
+    """
+
+
+class WidgetSource:
+    """
+    Base class of source adapters. Subclasses implement fetch(); ttl and
+    stale_ttl may be overridden per source. Widgets may lengthen the ttl
+    ("ttl" in config) but not go below the source's, since they choose how
+    often the server fetches from upstream.
+    """
+
+    ttl = 60
+    stale_ttl = 300
+
+    def fetch(self, params):
+        raise NotImplementedError
+
+    def ttl_for(self, params):
+        ttl = params.get("ttl")
+        return max(int(ttl), self.ttl) if isinstance(ttl, (int, float)) else self.ttl
+
+
+class StubSource(WidgetSource):
+    """
+    Local source for development and tests: echoes ``value`` after an
+    optional ``delay`` in seconds (at most max_delay), or raises when
+    ``fail`` is set. Only registered with WIDGET_STUB_SOURCE.
+    """
+
+    ttl = 30
+    # The delay comes from user config; keep it from tying up fetch workers
+    max_delay = 1
+
+    def fetch(self, params):
+        delay = params.get("delay")
+        if isinstance(delay, (int, float)) and delay > 0:
+            time.sleep(min(delay, self.max_delay))
+        if params.get("fail"):
+            raise SourceError("Stub source failure.")
+        return {"value": params.get("value"), "generated_at": time.time()}
+
+
+def check_allowed_url(url):
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or parts.hostname not in settings.WIDGET_HTTP_ALLOWED_HOSTS:
+        raise SourceError(f"Fetching from {parts.hostname!r} is not allowed.")
+
+
+class AllowedHostsRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Follow redirects only to hosts the source may fetch from.
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_allowed_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class HTTPJSONSource(WidgetSource):
+    """
+    GET a JSON document from ``url``. Only hosts listed in
+    WIDGET_HTTP_ALLOWED_HOSTS may be fetched, including through redirects.
+    """
+
+    def __init__(self):
+        self.opener = urllib.request.build_opener(AllowedHostsRedirectHandler)
+
+    def fetch(self, params):
+        url = params.get("url")
+        if not isinstance(url, str):
+            raise SourceError("The http_json source requires a url.")
+        check_allowed_url(url)
+        request = urllib.request.Request(url, headers={"Accept": "application/json"})
+        try:
+            with self.opener.open(request, timeout=settings.WIDGET_FETCH_TIMEOUT) as response:
+                return json.loads(response.read(settings.WIDGET_HTTP_MAX_BYTES))
+        except (OSError, ValueError) as exc:
+            raise SourceError(f"Fetching {url} failed: {exc}") from exc
+
+
+class WidgetDataService:
+    """
+    Cached, coalesced access to widget sources.
+    """
+
+    def __init__(self, sources, workers):
+        self.sources = sources
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="widget-fetch")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("hits", "stale_hits", "misses", "fetches", "coalesced", "refreshes", "errors"), 0
+        )
+
+    @property
+    def cache(self):
+        return caches["widgets"]
+
+    @staticmethod
+    def cache_key(source_name, params):
+        digest = hashlib.blake2b(
+            json.dumps(params, sort_keys=True, separators=(",", ":"), default=str).encode(), digest_size=16
+        ).hexdigest()
+        return f"widget-data:{source_name}:{digest}"
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, config):
+        """
+        Return ``{"data", "fetched_at", "stale"}`` for a widget config, or
+        ``{"error"}`` when there is no data to serve.
+        """
+        params = dict(config)
+        source_name = params.pop("source", None)
+        source = self.sources.get(source_name)
+        if source is None:
+            return {"error": f"Unknown source {source_name!r}."}
+        key = self.cache_key(source_name, params)
+        ttl = source.ttl_for(params)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < ttl:
+                self._count("hits")
+                return dict(entry, stale=False)
+            self._count("stale_hits")
+            self._refresh_in_background(key, source, params, ttl)
+            return dict(entry, stale=True)
+
+        self._count("misses")
+        try:
+            entry = self._fetch_once(key, source, params, ttl).result()
+        except SourceError as exc:
+            return {"error": str(exc)}
+        return dict(entry, stale=False)
+
+    def get_many(self, configs, timeout=None):
+        """
+        Resolve ``{widget_id: config}`` concurrently and return
+        ``{widget_id: result}``. Widgets still pending after ``timeout``
+        seconds get an error result.
+        """
+        futures = {widget_id: self._executor.submit(self.get, config) for widget_id, config in configs.items()}
+        wait(futures.values(), timeout=timeout)
+        return {
+            widget_id: future.result() if future.done() else {"error": "Timed out waiting for the source."}
+            for widget_id, future in futures.items()
+        }
+
+    def _fetch_once(self, key, source, params, ttl):
+        """
+        Return a future for the fetch of ``key``, starting one only if no
+        fetch of that key is already in flight in this process.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+            future = self._in_flight[key] = Future()
+
+        try:
+            started = time.time()
+            self._count("fetches")
+            data = source.fetch(params)
+            entry = {"data": data, "fetched_at": started}
+            self.cache.set(key, entry, ttl + source.stale_ttl)
+            future.set_result(entry)
+            # Live dashboards subscribed to this data (see push.py)
+            broadcaster.publish(key, dict(entry, stale=False))
+        except Exception as exc:
+            self._count("errors")
+            if not isinstance(exc, SourceError):
+                exc = SourceError(f"{type(exc).__name__}: {exc}")
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future
+
+    def _refresh_in_background(self, key, source, params, ttl):
+        # One refresh per key (across processes with a shared cache); the lock expires with the fetch timeout
+        if not self.cache.add(f"{key}:refreshing", True, settings.WIDGET_FETCH_TIMEOUT + 1):
+            return
+        self._count("refreshes")
+
+        def refresh():
+            try:
+                self._fetch_once(key, source, params, ttl)
+            finally:
+                self.cache.delete(f"{key}:refreshing")
+
+        self._executor.submit(refresh)
+
+    def refresh(self, config, last_seen=None):
+        """
+        Bring a widget's data up to date for its subscribers: fetch it once
+        it is due (once per key, see _refresh_in_background), or publish an entry
+        fetched since ``last_seen`` by another process. Returns
+        ``(fetched_at, seconds until the next check)``.
+        """
+        params = dict(config)
+        source_name = params.pop("source", None)
+        source = self.sources[source_name]
+        key = self.cache_key(source_name, params)
+        ttl = source.ttl_for(params)
+
+        entry = self.cache.get(key)
+        now = time.time()
+        if entry is not None and now - entry["fetched_at"] < ttl:
+            if last_seen is not None and entry["fetched_at"] != last_seen:
+                broadcaster.publish(key, dict(entry, stale=False))
+            return entry["fetched_at"], entry["fetched_at"] + ttl - now
+        if not self.cache.add(f"{key}:refreshing", True, settings.WIDGET_FETCH_TIMEOUT + 1):
+            # Another process is fetching; its entry is published on the next check
+            return last_seen, 1
+        self._count("refreshes")
+        try:
+            future = self._fetch_once(key, source, params, ttl)
+        finally:
+            self.cache.delete(f"{key}:refreshing")
+        if future.done() and future.exception() is None:
+            return future.result()["fetched_at"], ttl
+        return last_seen, ttl
+
+    async def keep_fresh(self, config):
+        """
+        Refresh a widget's data whenever it is due, until cancelled.
+        """
+        last_seen = None
+        while True:
+            try:
+                last_seen, delay = await asyncio.wrap_future(self._executor.submit(self.refresh, config, last_seen))
+            except Exception:
+                self._count("errors")
+                delay = WidgetSource.ttl
+            await asyncio.sleep(max(delay, 1))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._in_flight))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_widget_data_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                sources = {name: import_string(path)() for name, path in settings.WIDGET_SOURCES.items()}
+                _service = WidgetDataService(sources, workers=settings.WIDGET_FETCH_WORKERS)
+    return _service
+
+
+def widget_channel(config):
+    """
+    The broadcaster channel carrying updates of a widget's data, or None
+    for widgets without a known source.
+    """
+    params = dict(config)
+    source_name = params.pop("source", None)
+    if source_name not in get_widget_data_service().sources:
+        return None
+    return WidgetDataService.cache_key(source_name, params)
+
+
+def widget_data_stats():
+    return _service.stats() if _service is not None else None
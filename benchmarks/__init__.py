@@ -0,0 +1,63 @@
+"""
+Offline benchmarks for the backend.
+
+Run them from the repository root, e.g. ``python -m benchmarks.log_validator``.
+"""
+
+import asyncio
+import os
+
+
+def setup_django():
+    """
+    Configure Django with the project settings before any backend import.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    # A view over its query budget fails the benchmark with its report
+    os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+
+    import django
+
+    django.setup()
+
+
+async def asgi_request(application, method, path, body=b"", headers=()):
+    """
+    Call an ASGI application in-process, without a server.
+    Returns ``(status, headers, body)``.
+    """
+    path, _, query_string = path.partition("?")
+    headers = [("host", "localhost"), *headers]
+    if body:
+        headers.append(("content-length", str(len(body))))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"status": None, "headers": [], "body": b""}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Nothing more to send: wait like a client that keeps the connection open
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await application(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
@@ -0,0 +1,144 @@
+"""
+Benchmark: sync DRF views vs the async-native views under ASGI.
+
+Drives the ASGI application in-process with a fixed number of concurrent
+POST /api/logs/ and GET /api/profile/ requests, once with ASYNC_VIEWS=False
+and once with ASYNC_VIEWS=True, each in a fresh process. Both runs first
+replay the same probe requests and the responses are compared, so the
+async views are checked to answer exactly like the sync ones. Sentry tracing
+and log admission control are turned off and file logging goes through
+LOG_ASYNC queues, as recommended for ASGI, so the numbers measure the
+request path itself.
+
+    python -m benchmarks.async_views [--requests 2000] [--concurrency 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCH_USERNAME = "bench-async"
+
+
+def probes(token):
+    auth = [("authorization", f"Bearer {token}")]
+    bad_auth = [("authorization", "Bearer not-a-token")]
+    json_type = [("content-type", "application/json")]
+    return [
+        ("POST", "/api/logs/", b'{"level": "INFO", "message": "probe"}', json_type),
+        ("POST", "/api/logs/", b'{"level": "LOUD"}', json_type),
+        ("POST", "/api/logs/", b'[{"message": "a"}, {"level": "X"}]', json_type),
+        ("POST", "/api/logs/", b'{"message": "a"}\n{bad\n', [("content-type", "application/x-ndjson")]),
+        ("POST", "/api/logs/", b"{not json", json_type),
+        ("POST", "/api/logs/", b"level=DEBUG&message=form", [("content-type", "application/x-www-form-urlencoded")]),
+        ("POST", "/api/logs/", b'{"message": "authed"}', json_type + auth),
+        ("POST", "/api/logs/", b'{"message": "bad token"}', json_type + bad_auth),
+        ("GET", "/api/logs/", b"", []),
+        ("GET", "/api/profile/", b"", auth),
+        ("GET", "/api/profile/", b"", []),
+        ("GET", "/api/profile/", b"", bad_auth),
+    ]
+
+
+async def run_child(args):
+    from benchmarks import asgi_request, setup_django
+
+    setup_django()
+
+    from asgiref.sync import sync_to_async
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from backend.asgi import application
+
+    def prepare():
+        call_command("migrate", verbosity=0)
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={"email": "bench@example.com"})
+        return str(AccessToken.for_user(user))
+
+    token = await sync_to_async(prepare)()
+
+    probe_results = []
+    for method, path, body, headers in probes(token):
+        status, _, content = await asgi_request(application, method, path, body, headers)
+        probe_results.append([status, json.loads(content)])
+
+    workload = [
+        ("POST", "/api/logs/", b'{"level": "DEBUG", "message": "load"}', [("content-type", "application/json")]),
+        ("GET", "/api/profile/", b"", [("authorization", f"Bearer {token}")]),
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(i):
+        method, path, body, headers = workload[i % len(workload)]
+        async with semaphore:
+            start = time.perf_counter()
+            status, _, content = await asgi_request(application, method, path, body, headers)
+            latencies.append(time.perf_counter() - start)
+        assert status == 200, (status, content)
+
+    await asyncio.gather(*(one(i) for i in range(50)))
+    latencies.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+    print(json.dumps({
+        "probes": probe_results,
+        "rps": round(args.requests / wall, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args))
+        return
+
+    results = {}
+    for async_views in (False, True):
+        env = dict(
+            os.environ, ASYNC_VIEWS=str(async_views), DEBUG="False", ALLOWED_HOSTS="localhost",
+            LOG_ASYNC="True", LOG_ADMISSION_ENABLED="False", SENTRY_SAMPLE_RATE="0", SENTRY_PROFILING="False",
+        )
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_views", "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results["async" if async_views else "sync"] = json.loads(output.strip().splitlines()[-1])
+
+    sync_probes, async_probes = results["sync"]["probes"], results["async"]["probes"]
+    mismatches = [i for i, (a, b) in enumerate(zip(sync_probes, async_probes)) if a != b]
+    for i in mismatches:
+        print(f"probe {i} differs: sync={sync_probes[i]} async={async_probes[i]}")
+    print(f"parity: {len(sync_probes) - len(mismatches)}/{len(sync_probes)} probe responses identical")
+
+    print(f"{'views':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: GET /api/profile/ latency with and without the connection pool.
+
+Runs the same workload twice in fresh processes, once with DB_POOL=False and
+once with DB_POOL=True, against the database configured in the environment
+(POSTGRES_DB, DB_HOST, ...). Requests go through the WSGI handler so that
+connections are closed or returned to the pool exactly as in production.
+The auth user cache is disabled so that every request queries the database.
+
+    python -m benchmarks.db_pool [--requests 1000] [--concurrency 4]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_USERNAME = "bench-pool"
+BENCH_PASSWORD = "bench-pool-password"
+
+
+def run_child(args):
+    os.environ["AUTH_USER_CACHE"] = "False"
+
+    from benchmarks import setup_django
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import RequestFactory
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    call_command("migrate", verbosity=0)
+    user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+    user.set_password(BENCH_PASSWORD)
+    user.save()
+    token = str(AccessToken.for_user(user))
+    connection.close()
+
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def request_once(_):
+        environ = factory.get(
+            "/api/profile/", HTTP_AUTHORIZATION=f"Bearer {token}", HTTP_HOST="localhost"
+        ).environ
+        statuses = []
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        b"".join(response)
+        # Closing the response fires request_finished, which releases the connection
+        response.close()
+        elapsed = time.perf_counter() - start
+        assert statuses[0].startswith("200"), statuses
+        return elapsed
+
+    # Warm up imports, URL resolution and (when pooling) the pool itself
+    for _ in range(20):
+        request_once(None)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(request_once, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    print(json.dumps({
+        "rps": round(args.requests / wall, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(pct(0.50), 3),
+        "p95_ms": round(pct(0.95), 3),
+        "p99_ms": round(pct(0.99), 3),
+        "connections": connection.pool_stats(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = {}
+    for pooled in (False, True):
+        env = dict(os.environ, DB_POOL=str(pooled), DEBUG="False", ALLOWED_HOSTS="localhost")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_pool", "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results["pool" if pooled else "no pool"] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<10}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<10}{result['rps']:>10}{result['mean_ms']:>10}"
+            f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+        )
+    for mode, result in results.items():
+        print(f"{mode} connection stats: {json.dumps(result['connections'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: bulk user import throughput and memory.
+
+Writes --users NDJSON rows carrying an encoded password_hash, and --plain
+rows carrying a plain password, to temporary files and imports each
+through provision_users() as ``manage.py import_users`` does, reporting
+rows per second and the peak memory traced during the import (which should
+not grow with the number of rows). Plain passwords are hashed with the
+configured hasher and work factor in the hashing pool, so their rate is
+bound by the number of workers; the report extrapolates to 100k users.
+
+    python -m benchmarks.import_users [--users 100000] [--plain 200] [--batch-size 500]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+BENCH_PREFIX = "bench-import-"
+
+
+def write_rows(path, count, prefix, password_hash=None):
+    with open(path, "w") as f:
+        for number in range(count):
+            row = {"username": f"{prefix}{number}", "email": f"{prefix}{number}@example.com", "first_name": "Bench"}
+            if password_hash:
+                row["password_hash"] = password_hash
+            else:
+                row["password"] = f"bench-password-{number}"
+            f.write(json.dumps(row) + "\n")
+
+
+def run_import(path, batch_size):
+    from backend.parsers import iter_ndjson
+    from backend.provisioning import provision_users
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    read = created = rejected = 0
+    with open(path, "rb") as f:
+        for batch_read, batch_created, errors in provision_users(iter_ndjson(f), batch_size):
+            read += batch_read
+            created += batch_created
+            rejected += len(errors)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "rows": read,
+        "created": created,
+        "rejected": rejected,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(read / elapsed),
+        "peak_traced_mib": round(peak / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--plain", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    os.environ.setdefault("SENTRY_SAMPLE_RATE", "0")
+
+    from benchmarks import setup_django
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            hashed = os.path.join(directory, "hashed.ndjson")
+            write_rows(hashed, args.users, BENCH_PREFIX + "h", password_hash=make_password("bench"))
+            results["password_hash"] = run_import(hashed, args.batch_size)
+
+            if args.plain:
+                plain = os.path.join(directory, "plain.ndjson")
+                write_rows(plain, args.plain, BENCH_PREFIX + "p")
+                result = run_import(plain, args.batch_size)
+                result["hashing_workers"] = settings.HASHING_WORKERS
+                result["minutes_for_100k"] = round(100000 / result["rows_per_second"] / 60, 1)
+                results["password"] = result
+    finally:
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark: POST /api/logs/ and GET /api/profile/ throughput with the stdlib
+json codec vs orjson.
+
+Drives the ASGI application in-process (DRF views) once with
+JSON_CODEC=json and once with JSON_CODEC=orjson, each in a fresh process.
+Both runs first replay the same probe requests and the raw response bodies
+are compared byte for byte. Then each workload is run for --requests
+requests: a single log entry, a batch of --batch entries, a cached profile
+and a profile rendered afresh for every request. Both runs are repeated for
+--rounds rounds, taking turns to go first, and the best rate of each is
+kept. Sentry tracing and log admission control are turned off and file
+logging goes through LOG_ASYNC queues, so the numbers measure the request
+path itself; the time spent in the codec alone (parsing the batch,
+rendering it back and rendering the profile) is reported too.
+
+    python -m benchmarks.json_codec [--requests 2000] [--batch 100] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+
+from benchmarks.async_views import probes
+
+BENCH_USERNAME = "bench-json"
+
+
+def batch_body(size):
+    entries = [
+        {"level": "INFO", "message": f"entry {i} – ünïcode", "meta": {"i": i, "ratio": i / 7, "tags": ["a", "b"]}}
+        for i in range(size)
+    ]
+    return json.dumps(entries).encode()
+
+
+async def run_child(args):
+    from benchmarks import asgi_request, setup_django
+
+    setup_django()
+
+    from asgiref.sync import sync_to_async
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from backend.asgi import application
+    from backend.parsers import ORJSONParser
+    from backend.profiles import bump_profile_version
+    from backend.renderers import ORJSONRenderer
+    from backend.serializers import UserProfileSerializer
+
+    def prepare():
+        call_command("migrate", verbosity=0)
+        user, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME, defaults={"email": "bench@example.com", "first_name": "Zoë"}
+        )
+        return user, str(AccessToken.for_user(user))
+
+    user, token = await sync_to_async(prepare)()
+    user_id = user.pk
+    auth = [("authorization", f"Bearer {token}")]
+    json_type = [("content-type", "application/json")]
+
+    probe_results = []
+    extra = [
+        ("POST", "/api/logs/", batch_body(3), json_type),
+        ("POST", "/api/logs/", b'{"message": "big", "meta": {"n": 123456789012345678901234}}', json_type),
+        ("POST", "/api/logs/", b'{"message": "\\ud800"}', json_type),
+        ("POST", "/api/logs/", b'{"message": NaN}', json_type),
+    ]
+    for method, path, body, headers in probes(token) + extra:
+        status, _, content = await asgi_request(application, method, path, body, headers)
+        probe_results.append([status, content.decode("utf-8", "backslashreplace")])
+
+    def uncached_profile():
+        bump_profile_version(user_id)
+
+    workloads = {
+        "log entry": ("POST", "/api/logs/", b'{"level": "DEBUG", "message": "load"}', json_type, None),
+        f"log batch x{args.batch}": ("POST", "/api/logs/", batch_body(args.batch), json_type, None),
+        "profile": ("GET", "/api/profile/", b"", auth, None),
+        "profile uncached": ("GET", "/api/profile/", b"", auth, uncached_profile),
+    }
+    results = {}
+    for name, (method, path, body, headers, before) in workloads.items():
+        elapsed = 0.0
+        for i in range(args.requests + 20):
+            if before:
+                before()
+            start = time.perf_counter()
+            status, _, content = await asgi_request(application, method, path, body, headers)
+            if i >= 20:
+                elapsed += time.perf_counter() - start
+            assert status == 200, (status, content)
+        results[name] = round(args.requests / elapsed, 1)
+
+    body = batch_body(args.batch)
+    parser, renderer = ORJSONParser(), ORJSONRenderer()
+    entries = parser.parse(io.BytesIO(body))
+    profile = UserProfileSerializer(user).data
+    codec = {
+        f"parse log batch x{args.batch}": lambda: parser.parse(io.BytesIO(body)),
+        f"render log batch x{args.batch}": lambda: renderer.render(entries),
+        "render profile": lambda: renderer.render(profile),
+    }
+    codec_us = {name: round(min(timeit.repeat(call, number=1000, repeat=3)) * 1000, 1) for name, call in codec.items()}
+
+    print(json.dumps({"probes": probe_results, "rps": results, "codec_us": codec_us}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args))
+        return
+
+    results = {}
+    for number in range(args.rounds):
+        # Alternate which codec goes first, so neither gains from running later
+        for codec in ("json", "orjson")[::1 if number % 2 == 0 else -1]:
+            env = dict(
+                os.environ, JSON_CODEC=codec, ASYNC_VIEWS="False", DEBUG="False", ALLOWED_HOSTS="localhost",
+                LOG_ASYNC="True", LOG_ADMISSION_ENABLED="False", SENTRY_SAMPLE_RATE="0", SENTRY_PROFILING="False",
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.json_codec", "--child",
+                 "--requests", str(args.requests), "--batch", str(args.batch)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            best = results.setdefault(codec, result)
+            for key in ("rps", "codec_us"):
+                pick = max if key == "rps" else min
+                best[key] = {name: pick(value, result[key][name]) for name, value in best[key].items()}
+
+    before, after = results["json"]["probes"], results["orjson"]["probes"]
+    mismatches = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+    for i in mismatches:
+        print(f"probe {i} differs: json={before[i]} orjson={after[i]}")
+    print(f"parity: {len(before) - len(mismatches)}/{len(before)} response bodies identical")
+
+    print(f"{'workload':<20}{'json req/s':>12}{'orjson req/s':>14}{'change':>9}")
+    for name, rps in results["json"]["rps"].items():
+        fast = results["orjson"]["rps"][name]
+        print(f"{name:<20}{rps:>12}{fast:>14}{(fast / rps - 1) * 100:>+8.0f}%")
+    print(f"{'codec':<26}{'json us':>9}{'orjson us':>11}")
+    for name, micros in results["json"]["codec_us"].items():
+        print(f"{name:<26}{micros:>9}{results['orjson']['codec_us'][name]:>11}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: several worker processes logging to the same files, directly and
+through the log collector.
+
+Each of --workers processes logs --records records to "backend_logger"
+(backend.log and backend_json.log) as fast as it can, with files rotating
+every --max-bytes. With "direct", every process writes and rotates the
+files itself; with "collector", they ship records to one
+``manage.py log_collector`` process, which is stopped --restart seconds
+after the workers start and started again half a second later, if given.
+Afterwards every segment of backend_json.log is read back, and the report
+lists records per second, the time a worker spends per record, how many
+records were lost, duplicated or corrupted, and the records the collector
+writes per second of its own CPU time.
+
+    python -m benchmarks.log_collector [--workers 4] [--records 50000] [--max-bytes 1048576] [--restart 3]
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_worker(args):
+    from benchmarks import setup_django
+
+    setup_django()
+    import logging
+
+    from backend.log_collector import close_client, collector_stats
+
+    logger = logging.getLogger("backend_logger")
+    started = time.perf_counter()
+    for number in range(args.records):
+        logger.info("record %s-%d", args.child, number)
+    emitted = time.perf_counter() - started
+    close_client(timeout=60)
+    logging.shutdown()
+    print(json.dumps({"emit_us": emitted / args.records * 1e6, "collector": collector_stats()}))
+
+
+def start_collector(env):
+    process = subprocess.Popen(
+        [sys.executable, "manage.py", "log_collector"], cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True
+    )
+    # The first line is printed once the socket is listening
+    process.stdout.readline()
+    return process
+
+
+def stop_collector(process):
+    process.send_signal(signal.SIGTERM)
+    output = process.communicate(timeout=60)[0]
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def read_segments(directory):
+    lines = []
+    for path in glob.glob(os.path.join(directory, "backend_json.log*")):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            lines += f.read().splitlines()
+    return lines
+
+
+def run_mode(args, mode):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ, DEBUG="False", SENTRY_SAMPLE_RATE="0", SENTRY_PROFILING="False", LOG_ASYNC="False",
+            LOG_DIR=directory, LOG_FILE_MAX_BYTES=str(args.max_bytes), LOG_FILE_BACKUP_COUNT="1000",
+            LOG_FILE_COMPRESS="False", LOG_COLLECTOR_SOCKET="",
+        )
+        collector = None
+        if mode == "collector":
+            env["LOG_COLLECTOR_SOCKET"] = os.path.join(directory, "collector.sock")
+            collector = start_collector(env)
+
+        started = time.perf_counter()
+        workers = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.log_collector", "--child", f"w{number}",
+                 "--records", str(args.records)],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for number in range(args.workers)
+        ]
+        if collector is not None and args.restart:
+            time.sleep(args.restart)
+            stop_collector(collector)
+            time.sleep(0.5)
+            collector = start_collector(env)
+        results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+        collector_stats = stop_collector(collector) if collector is not None else None
+        elapsed = time.perf_counter() - started
+
+        lines = read_segments(directory)
+        seen = Counter()
+        corrupt = 0
+        for line in lines:
+            try:
+                seen[json.loads(line)["message"]] += 1
+            except (ValueError, KeyError):
+                corrupt += 1
+        expected = args.workers * args.records
+        return {
+            "mode": mode + (" (restarted)" if collector is not None and args.restart else ""),
+            "records_per_second": round(expected / elapsed),
+            "emit_us": round(sum(r["emit_us"] for r in results) / len(results), 2),
+            "segments": len(glob.glob(os.path.join(directory, "backend_json.log*"))),
+            "lost": expected - len(seen),
+            "duplicated": sum(count - 1 for count in seen.values()),
+            "corrupt_lines": corrupt,
+            "dropped_by_workers": sum((r["collector"] or {}).get("dropped", 0) for r in results),
+            "collector": collector_stats,
+            # What one collector process could sustain if it had a core to itself
+            "collector_records_per_cpu_second": (
+                round(collector_stats["records"] / collector_stats["cpu_seconds"]) if collector_stats else None
+            ),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024)
+    parser.add_argument("--restart", type=float, help="restart the collector this many seconds in")
+    parser.add_argument("--mode", choices=("direct", "collector"), action="append")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_worker(args)
+        return
+    for mode in args.mode or ("direct", "collector"):
+        print(json.dumps(run_mode(args, mode), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: LogEntrySerializer vs the compiled LogEntryValidator.
+
+Checks that both agree on a corpus of valid and invalid entries, then times
+them on a typical frontend log entry.
+
+    python -m benchmarks.log_validator [--number 20000]
+"""
+
+import argparse
+import timeit
+
+from benchmarks import setup_django
+
+setup_django()
+
+from backend.serializers import LogEntrySerializer  # noqa: E402
+from backend.validators import validate_log_entry  # noqa: E402
+
+TYPICAL_ENTRY = {
+    "level": "INFO",
+    "message": "WeatherWidget: refreshed forecast",
+    "meta": {"args": [{"city": "Prague", "units": "metric"}, 3, True], "component": "WeatherWidget"},
+    "timestamp": "2025-02-20T10:11:12.345Z",
+}
+
+CORPUS = [
+    TYPICAL_ENTRY,
+    {"message": "defaults to INFO"},
+    {"level": "DEBUG", "message": 42},
+    {"level": "TRACE", "message": "bad level"},
+    {"level": None, "message": "null level"},
+    {"level": ["INFO"], "message": "list level"},
+    {"message": "   "},
+    {"message": None},
+    {"message": True},
+    {"message": {"nested": 1}},
+    {"message": "nul\x00char"},
+    {"message": "x" * 20000},
+    {"level": "ERROR"},
+    {"message": "meta list", "meta": [1, 2]},
+    {"message": "meta null", "meta": None},
+    {"message": "meta child null", "meta": {"a": None, "b": 1}},
+    {"message": "meta deep", "meta": {"a": {"b": {"c": {"d": {"e": {"f": {"g": {"h": {"i": {"j": {}}}}}}}}}}}},
+    {"message": "meta wide", "meta": {f"k{i}": i for i in range(300)}},
+    {"message": "naive ts", "timestamp": "2025-02-20T10:11:12"},
+    {"message": "bad ts", "timestamp": "yesterday"},
+    {"message": "int ts", "timestamp": 1700000000},
+    {"message": "bad month", "timestamp": "2025-13-20T10:11:12Z"},
+    {"message": "null ts", "timestamp": None},
+    ["not", "a", "dict"],
+    "plain string",
+]
+
+
+def serializer_validate(data):
+    serializer = LogEntrySerializer(data=data)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+def check_parity():
+    for entry in CORPUS:
+        expected = serializer_validate(entry)
+        actual = validate_log_entry(entry)
+        assert dict(expected[0] or {}) == dict(actual[0] or {}), (entry, expected, actual)
+        # ErrorDetail equality also compares the error codes
+        assert expected[1] == actual[1], (entry, expected, actual)
+    print(f"parity: {len(CORPUS)} entries validated identically")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    check_parity()
+
+    slow = min(timeit.repeat(lambda: serializer_validate(TYPICAL_ENTRY), number=args.number, repeat=3))
+    fast = min(timeit.repeat(lambda: validate_log_entry(TYPICAL_ENTRY), number=args.number, repeat=3))
+
+    print(f"LogEntrySerializer: {slow / args.number * 1e6:8.2f} us/entry")
+    print(f"LogEntryValidator:  {fast / args.number * 1e6:8.2f} us/entry")
+    print(f"speedup:            {slow / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
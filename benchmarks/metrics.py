@@ -0,0 +1,142 @@
+"""
+Benchmark: per-request cost of the Prometheus instrumentation.
+
+Times the hot-path calls directly (observe_request for one request with
+its counters and histogram, count_query per database query, and
+count_log_entries per batch), with the metrics in shared memory-mapped files
+as in production, then serves GET /api/profile/ through the WSGI handler
+with METRICS_ENABLED on and off, each in a fresh process, and compares.
+Two further processes record into the same directory to check that
+/metrics adds them up.
+
+    python -m benchmarks.metrics [--calls 100000] [--requests 3000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def per_call_us(function, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def run_micro(args):
+    from backend import metrics
+
+    entries = [{"level": "INFO"}] * 9 + [{"level": "ERROR"}]
+
+    def execute(sql, params, many, context):
+        return None
+
+    token = metrics.request_queries.set([0])
+    results = {
+        "observe_request_us": per_call_us(
+            lambda: metrics.observe_request("api/profile/", "GET", 200, 0.004, 2), args.calls
+        ),
+        "count_query_us": per_call_us(lambda: metrics.count_query(execute, "SELECT 1", (), False, {}), args.calls),
+        "count_log_entries_10_us": per_call_us(lambda: metrics.count_log_entries(entries, "logged"), args.calls // 10),
+    }
+    metrics.request_queries.reset(token)
+    print(json.dumps(results))
+
+
+def run_requests(args):
+    from django.contrib.auth.models import User
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from django.test import RequestFactory
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    call_command("migrate", verbosity=0)
+    user, _ = User.objects.get_or_create(username="bench-metrics", defaults={"email": "bench@example.com"})
+    token = str(AccessToken.for_user(user))
+    handler = WSGIHandler()
+    environ = RequestFactory().get("/api/profile/", HTTP_AUTHORIZATION=f"Bearer {token}").environ
+
+    def one():
+        response = handler(dict(environ), lambda status, headers: None)
+        b"".join(response)
+        response.close()
+
+    for _ in range(200):
+        one()
+    best = min(per_call_us(one, args.requests) for _ in range(3))
+    print(json.dumps({"request_us": best}))
+
+
+def run_child(args):
+    from benchmarks import setup_django
+
+    setup_django()
+    if args.child == "micro":
+        run_micro(args)
+    elif args.child == "requests":
+        run_requests(args)
+    else:
+        from backend import metrics
+
+        metrics.observe_request("api/bench/", "GET", 200, 0.01, 1)
+        print(json.dumps({"pid": os.getpid()}))
+
+
+def child(args, mode, **env):
+    env = dict(
+        os.environ, DEBUG="False", ALLOWED_HOSTS="testserver", SENTRY_SAMPLE_RATE="0", SENTRY_PROFILING="False",
+        LOG_ASYNC="True", **env,
+    )
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.metrics", "--child", mode,
+         "--calls", str(args.calls), "--requests", str(args.requests)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        micro = child(args, "micro", PROMETHEUS_MULTIPROC_DIR=directory)
+        for name, us in micro.items():
+            print(f"{name:<28}{us:>8.2f} us")
+
+        on = child(args, "requests", PROMETHEUS_MULTIPROC_DIR=directory, METRICS_ENABLED="True")["request_us"]
+        off = child(args, "requests", PROMETHEUS_MULTIPROC_DIR=directory, METRICS_ENABLED="False")["request_us"]
+        print(f"{'GET /api/profile/ metrics on':<28}{on:>8.1f} us")
+        print(f"{'GET /api/profile/ metrics off':<28}{off:>8.1f} us")
+        print(f"{'difference':<28}{on - off:>8.1f} us")
+
+        for _ in range(2):
+            child(args, "record", PROMETHEUS_MULTIPROC_DIR=directory)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+        from benchmarks import setup_django
+
+        setup_django()
+        from backend.metrics import render_metrics
+
+        body = render_metrics()[0].decode()
+        series = 'http_requests_total{method="GET",route="api/bench/"'
+        line = next(line for line in body.splitlines() if line.startswith(series))
+        print(f"aggregated over processes: {line}")
+        if not line.endswith(" 2.0"):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Load test: idle server-sent event streams per worker.
+
+Opens --connections event streams on the ASGI application in-process, each
+subscribed to "alerts" and "notifications", and reports the memory held per
+idle connection (Python allocations and process RSS; socket buffers of a
+real server come on top). It then publishes alerts and times the fan-out to
+every connection. A few connections never finish a write, so they fall
+behind and are evicted once their buffers fill. At the end every client
+disconnects and no subscription may be left.
+
+    python -m benchmarks.push [--connections 5000] [--messages 10] [--slow 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+
+BENCH_USERNAME = "bench-push"
+
+
+def rss_kib():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class Client:
+    """
+    An EventSource stand-in: counts received events until told to disconnect.
+    """
+
+    # Alerts received by all clients together
+    total = 0
+    target = None
+
+    def __init__(self, slow=False):
+        self.slow = slow
+        self.status = None
+        self.events = 0
+        self.disconnect = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            return
+        body = message.get("body", b"")
+        if self.slow and body.startswith(b"event:"):
+            # A stalled client: the write never completes
+            await asyncio.Event().wait()
+        received = body.count(b"event: alerts\n")
+        self.events += received
+        Client.total += received
+        if Client.target is not None and Client.total >= Client.target[0]:
+            Client.target[1].set()
+
+
+async def run(args):
+    from benchmarks import setup_django
+
+    setup_django()
+
+    from asgiref.sync import sync_to_async
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from backend.asgi import application
+    from backend.push import broadcast_alert, broadcaster
+
+    def prepare():
+        call_command("migrate", verbosity=0)
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={"email": "bench@example.com"})
+        return str(AccessToken.for_user(user))
+
+    token = await sync_to_async(prepare)()
+    path = settings.PUSH_PATH
+
+    def scope():
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"topics=alerts,notifications",
+            "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {token}".encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+
+    async def connect(client):
+        await application(scope(), client.receive, client.send)
+
+    # Warm up the auth cache and the heartbeat task
+    warm = Client()
+    warm_task = asyncio.create_task(connect(warm))
+    while broadcaster.stats()["connections"] < 1:
+        await asyncio.sleep(0.01)
+    warm.disconnect.set()
+    await warm_task
+
+    clients = [Client(slow=i < args.slow) for i in range(args.connections)]
+    tracemalloc.start()
+    rss_before = rss_kib()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(connect(client)) for client in clients]
+    while broadcaster.stats()["connections"] < args.connections:
+        await asyncio.sleep(0.01)
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(0.1)
+    traced = tracemalloc.get_traced_memory()[0] - traced_before
+    rss = rss_kib() - rss_before
+    tracemalloc.stop()
+
+    fast = [client for client in clients if not client.slow]
+    fanout = []
+    for number in range(args.messages):
+        all_received = asyncio.Event()
+        Client.target = (Client.total + len(fast), all_received)
+        started = time.perf_counter()
+        broadcast_alert({"message": f"alert {number}"})
+        await all_received.wait()
+        fanout.append(time.perf_counter() - started)
+    Client.target = None
+
+    # Push the stalled clients past their buffers; the others keep up
+    for number in range(settings.PUSH_BUFFER_SIZE + 1):
+        broadcast_alert({"message": f"flood {number}"})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.1)
+    evicted = broadcaster.stats()["evicted"]
+
+    for client in clients:
+        client.disconnect.set()
+    done, pending = await asyncio.wait(tasks, timeout=10)
+    for task in pending:
+        task.cancel()
+
+    print(json.dumps({
+        "connections": args.connections,
+        "connect_seconds": round(connect_seconds, 2),
+        "traced_bytes_per_connection": traced // args.connections,
+        "rss_kib_per_connection": round(rss / args.connections, 2),
+        "fanout_ms_mean": round(sum(fanout) / len(fanout) * 1000, 2),
+        "fanout_ms_max": round(max(fanout) * 1000, 2),
+        "all_delivered": all(client.events >= args.messages for client in fast),
+        "slow_evicted": evicted,
+        "left_open": broadcaster.stats()["connections"] + len(pending),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--slow", type=int, default=10)
+    args = parser.parse_args()
+    # Measure the streams, not request tracing
+    os.environ.setdefault("SENTRY_SAMPLE_RATE", "0")
+    os.environ.setdefault("SENTRY_PROFILING", "False")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Check: every API view against its declared query budget.
+
+Drives each budgeted route once through the test client with cold caches
+(the worst case: authentication and renderings come from the database) and
+QUERY_BUDGET_MODE=raise, and prints the queries each request ran next to
+its budget. A request over budget, or repeating a statement, stops the run
+with the view's report. The bulk registration rows sent as JSON and as CSV
+are checked to have become users. Finally an N+1 loop is run under
+assert_queries to make sure it is caught.
+
+    python -m benchmarks.query_budgets
+"""
+
+import os
+import sys
+
+BENCH_PREFIX = "bench-budget-"
+BENCH_PASSWORD = "bench-budget-password"
+
+
+def main():
+    os.environ.setdefault("ALLOWED_HOSTS", "testserver")
+    os.environ.setdefault("SENTRY_SAMPLE_RATE", "0")
+    os.environ.setdefault("HASHING_WORKERS", "0")
+    os.environ.setdefault("METRICS_TOKEN", "bench-budget-metrics")
+    from benchmarks import setup_django
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.core.cache import caches
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import resolve
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from backend.query_budget import QueryBudgetExceeded, QueryRecorder, assert_queries, view_budget
+
+    call_command("migrate", verbosity=0)
+    User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    user = User.objects.create_user(f"{BENCH_PREFIX}admin", "budget@example.com", BENCH_PASSWORD, is_staff=True)
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(user)}"}
+    client = Client()
+
+    requests = [
+        ("post", "/api/register/", {"username": f"{BENCH_PREFIX}new", "password": BENCH_PASSWORD}, {}),
+        ("post", "/api/register/bulk/", [
+            {"username": f"{BENCH_PREFIX}bulk{number}", "password": BENCH_PASSWORD} for number in range(3)
+        ], auth),
+        ("post", "/api/register/bulk/", ("text/csv", (
+            "username,email,password\n"
+            f"{BENCH_PREFIX}csv0,csv0@example.com,{BENCH_PASSWORD}\n"
+            f"{BENCH_PREFIX}csv1,,{BENCH_PASSWORD}\n"
+        )), auth),
+        ("get", "/api/profile/", None, auth),
+        ("patch", "/api/profile/update/", {"first_name": "Budget"}, auth),
+        ("post", "/api/logs/", {"level": "INFO", "message": "budget check"}, auth),
+        ("post", "/api/password/change/", {
+            "old_password": BENCH_PASSWORD, "new_password": BENCH_PASSWORD + "!",
+            "confirm_password": BENCH_PASSWORD + "!",
+        }, auth),
+        ("get", "/api/dashboard/layout/", None, auth),
+        ("put", "/api/dashboard/layout/", {"widgets": []}, auth),
+        ("put", "/api/dashboard/layout/", {"widgets": []}, auth),
+        ("get", "/api/dashboard/data/", None, auth),
+        ("post", "/api/events/ticket/", {}, auth),
+        ("get", "/api/logs/query/?limit=1", None, auth),
+        ("get", "/api/stats/", None, auth),
+        ("get", "/metrics", None, {"HTTP_AUTHORIZATION": f"Bearer {os.environ['METRICS_TOKEN']}"}),
+    ]
+
+    failed = False
+    print(f"{'request':<34}{'status':>7}{'queries':>9}{'budget':>8}")
+    for method, path, body, headers in requests:
+        for alias in caches:
+            caches[alias].clear()
+        budget = view_budget(resolve(path.partition("?")[0]).func)
+        if isinstance(body, tuple):
+            content_type, body = body
+        else:
+            content_type = "application/json"
+        kwargs = {"data": body, "content_type": content_type} if body is not None else {}
+        try:
+            with QueryRecorder() as recorder:
+                response = getattr(client, method)(path, **kwargs, **headers)
+                if hasattr(response, "streaming_content"):
+                    b"".join(response.streaming_content)
+        except QueryBudgetExceeded as exc:
+            print(f"{method.upper()} {path}: over budget\n{exc.report}", file=sys.stderr)
+            failed = True
+            continue
+        limit = budget.max_queries if budget is not None else "-"
+        print(f"{method.upper() + ' ' + path:<34}{response.status_code:>7}{recorder.count:>9}{limit:>8}")
+        if budget is None or response.status_code >= 400:
+            failed = True
+
+    # Bulk registration round trip: the CSV rows above are users now
+    csv_users = User.objects.filter(username__in=[f"{BENCH_PREFIX}csv0", f"{BENCH_PREFIX}csv1"])
+    if sorted(csv_users.values_list("email", flat=True)) != ["", "csv0@example.com"] or not all(
+        user.check_password(BENCH_PASSWORD) for user in csv_users
+    ):
+        print("CSV bulk registration did not create the expected users", file=sys.stderr)
+        failed = True
+
+    # The detector itself: one query per user is an N+1 loop
+    users = list(User.objects.filter(username__startswith=BENCH_PREFIX).values_list("pk", flat=True))
+    try:
+        with assert_queries(len(users), label="N+1 loop"):
+            for pk in users:
+                User.objects.get(pk=pk)
+        print("N+1 loop was not reported", file=sys.stderr)
+        failed = True
+    except QueryBudgetExceeded as exc:
+        print(f"N+1 loop reported:\n{exc.report}")
+
+    User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
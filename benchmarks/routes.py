@@ -0,0 +1,297 @@
+"""
+Benchmark: throughput, latency, queries and allocations for every API route.
+
+Each route is driven through the WSGI handler at a fixed concurrency against
+the database configured in the environment (POSTGRES_DB, DB_HOST, ...), with
+Sentry tracing and log admission control turned off unless overridden. For
+every route the suite records requests per second, p50/p95/p99 latency,
+database queries per request and the peak memory allocated by one request
+(measured afterwards with tracemalloc, so tracing does not skew latency).
+
+Results can be stored as a baseline and later runs compared against it; the
+run fails when a route's throughput, p50/p95 latency or allocations are worse
+than the baseline by more than --threshold, or when it needs more queries.
+Baselines are only comparable on the same machine and with the same
+--requests/--concurrency.
+
+    python -m benchmarks.routes [--requests 200] [--concurrency 8] [--routes logs,profile]
+    python -m benchmarks.routes --save-baseline
+    python -m benchmarks.routes --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_PREFIX = "bench-routes-"
+BENCH_PASSWORD = "bench-routes-password"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metric name -> True when a larger value is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "alloc_peak_kib": False}
+
+
+class Scenario:
+    """
+    One route under test: builds a request per call and names the expected
+    status code. ``build`` receives the request sequence number and returns
+    ``(request, release)``, where ``release`` (or None) runs after the response.
+    """
+
+    def __init__(self, name, expected_status, build):
+        self.name = name
+        self.expected_status = expected_status
+        self.build = build
+
+
+def make_scenarios(factory, fixtures):
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    user = fixtures["user"]
+    access = str(RefreshToken.for_user(user).access_token)
+    refresh = str(RefreshToken.for_user(user))
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+    run_id = fixtures["run_id"]
+
+    def post(path, body, **extra):
+        return factory.post(path, json.dumps(body), content_type="application/json", HTTP_HOST="localhost", **extra)
+
+    def token(_):
+        return post("/api/token/", {"username": user.username, "password": BENCH_PASSWORD}), None
+
+    def token_refresh(_):
+        return post("/api/token/refresh/", {"refresh": refresh}), None
+
+    def register(i):
+        return post("/api/register/", {
+            "username": f"{BENCH_PREFIX}{run_id}-{i}",
+            "email": f"bench{i}@example.com",
+            "password": BENCH_PASSWORD,
+        }), None
+
+    def profile(_):
+        return factory.get("/api/profile/", HTTP_HOST="localhost", **auth), None
+
+    def profile_update(i):
+        request = factory.patch(
+            "/api/profile/update/", json.dumps({"first_name": f"Bench {i % 10}"}),
+            content_type="application/json", HTTP_HOST="localhost", **auth,
+        )
+        return request, None
+
+    def logs(i):
+        level = ("DEBUG", "INFO", "WARNING", "ERROR")[i % 4]
+        return post("/api/logs/", {"level": level, "message": f"benchmark entry {i}", "meta": {"i": i}}), None
+
+    # Password changes need exclusive use of a user whose current password is known
+    password_users = fixtures["password_users"]
+
+    def password_change(i):
+        changer, changer_token, current = password_users.get()
+        new = f"{BENCH_PASSWORD}-{i}"
+        request = post(
+            "/api/password/change/", {"old_password": current, "new_password": new},
+            HTTP_AUTHORIZATION=f"Bearer {changer_token}",
+        )
+        return request, lambda: password_users.put((changer, changer_token, new))
+
+    return [
+        Scenario("token", 200, token),
+        Scenario("token_refresh", 200, token_refresh),
+        Scenario("register", 201, register),
+        Scenario("profile", 200, profile),
+        Scenario("profile_update", 200, profile_update),
+        Scenario("logs", 200, logs),
+        Scenario("password_change", 200, password_change),
+    ]
+
+
+def prepare_fixtures(concurrency):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    call_command("migrate", verbosity=0)
+    User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    user = User.objects.create_user(f"{BENCH_PREFIX}user", "bench@example.com", BENCH_PASSWORD)
+    password_users = queue.Queue()
+    for n in range(concurrency):
+        changer = User.objects.create_user(f"{BENCH_PREFIX}changer-{n}", password=BENCH_PASSWORD)
+        password_users.put((changer, str(AccessToken.for_user(changer)), BENCH_PASSWORD))
+    return {"user": user, "password_users": password_users, "run_id": int(time.time())}
+
+
+def run_scenario(handler, scenario, requests, concurrency, warmup, alloc_samples):
+    from django.db import connection
+
+    sequence = itertools.count()
+    sequence_lock = threading.Lock()
+
+    def request_once(_):
+        with sequence_lock:
+            i = next(sequence)
+        request, release = scenario.build(i)
+        statuses = []
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = handler(request.environ, lambda status, headers: statuses.append(status))
+            b"".join(response)
+            # Closing the response fires request_finished, which releases the connection
+            response.close()
+        elapsed = time.perf_counter() - start
+        if release is not None:
+            release()
+        status_code = int(statuses[0].split(" ", 1)[0])
+        if status_code != scenario.expected_status:
+            raise AssertionError(f"{scenario.name}: expected {scenario.expected_status}, got {statuses[0]}")
+        return elapsed, queries[0]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(request_once, range(warmup)))
+
+        started = time.perf_counter()
+        samples = list(executor.map(request_once, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in samples)
+
+    def pct(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+    # Allocations are sampled sequentially, after the timed run
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            request_once(None)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+
+    return {
+        "requests": requests,
+        "rps": round(requests / wall, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "queries": round(sum(count for _, count in samples) / len(samples), 2),
+        "alloc_peak_kib": round(peaks[len(peaks) // 2] / 1024, 1) if peaks else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of regression messages for routes present in both runs.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.0%})")
+        if result["queries"] > previous.get("queries", result["queries"]):
+            regressions.append(f"{name}: queries per request {previous['queries']} -> {result['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-samples", type=int, default=20)
+    parser.add_argument("--routes", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    for name, value in {
+        "DEBUG": "False", "ALLOWED_HOSTS": "localhost", "LOG_ADMISSION_ENABLED": "False",
+        "SENTRY_SAMPLE_RATE": "0", "SENTRY_PROFILING": "False",
+    }.items():
+        os.environ.setdefault(name, value)
+
+    from benchmarks import setup_django
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection
+    from django.test import RequestFactory
+
+    fixtures = prepare_fixtures(args.concurrency)
+    connection.close()
+    scenarios = make_scenarios(RequestFactory(), fixtures)
+    if args.routes:
+        selected = set(args.routes.split(","))
+        unknown = selected - {scenario.name for scenario in scenarios}
+        if unknown:
+            parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+        scenarios = [scenario for scenario in scenarios if scenario.name in selected]
+
+    handler = WSGIHandler()
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(
+                handler, scenario, args.requests, args.concurrency, args.warmup, args.alloc_samples
+            )
+    finally:
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    columns = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries", "alloc_peak_kib")
+    print(f"{'route':<17}" + "".join(f"{column:>16}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:<17}" + "".join(f"{result[column]!s:>16}" for column in columns))
+
+    config = {"requests": args.requests, "concurrency": args.concurrency}
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "routes": results}, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"warning: baseline was recorded with {baseline.get('config')}, this run used {config}")
+
+    regressions = compare(results, baseline["routes"], args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
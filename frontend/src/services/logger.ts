@@ -10,6 +10,43 @@ interface LogMeta {
   [key: string]: unknown
 }
 
+interface LogEntry {
+  level: string
+  message: string
+  meta: LogMeta
+  timestamp: string
+}
+
+// Entries are queued and posted to the backend in batches
+const BATCH_SIZE = 50
+const FLUSH_INTERVAL_MS = 2000
+
+// Ordered by severity; the backend sheds lower levels first when a client floods it
+const LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+let queue: LogEntry[] = []
+let flushTimer: ReturnType<typeof setTimeout> | null = null
+
+// Send all queued log entries to the backend logging endpoint in one request
+function flushLogs(): void {
+  if (flushTimer !== null) {
+    clearTimeout(flushTimer)
+    flushTimer = null
+  }
+  if (queue.length === 0) {
+    return
+  }
+  const batch = queue
+  queue = []
+  // Announce the most severe level so that an over-budget batch can be rejected early
+  const maxLevel = Math.max(...batch.map((entry) => LEVELS.indexOf(entry.level)))
+  const headers = { 'X-Log-Level': LEVELS[maxLevel] ?? 'CRITICAL' }
+  api.post('/api/logs/', batch, { headers }).catch((error) => {
+    // In case of error sending log, print to console to avoid infinite loop
+    console.error('Failed to send logs:', error)
+  })
+}
+
 // Function to send log messages to the backend logging endpoint
 function sendLog(level: string, message: string, meta: LogMeta = {}): void {
   // console.log('Sending log:', level, message, meta)
@@ -18,18 +55,28 @@ function sendLog(level: string, message: string, meta: LogMeta = {}): void {
     level: level.toLowerCase() as Sentry.SeverityLevel,
     extra: meta,
   })
-  // Send log to django API
-  api
-    .post('/api/logs/', {
-      level,
-      message,
-      meta,
-      timestamp: new Date().toISOString(),
-    })
-    .catch((error) => {
-      // In case of error sending log, print to console to avoid infinite loop
-      console.error('Failed to send log:', error)
-    })
+  // Queue log for the django API
+  queue.push({
+    level,
+    message,
+    meta,
+    timestamp: new Date().toISOString(),
+  })
+  if (queue.length >= BATCH_SIZE) {
+    flushLogs()
+  } else if (flushTimer === null) {
+    flushTimer = setTimeout(flushLogs, FLUSH_INTERVAL_MS)
+  }
+}
+
+// Do not lose queued entries when the page is hidden or closed
+if (typeof window !== 'undefined') {
+  window.addEventListener('pagehide', flushLogs)
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+      flushLogs()
+    }
+  })
 }
 
 // Preserve original log methods and override them with additional behavior
@@ -57,4 +104,6 @@ log.error = (message: string, ...args: unknown[]): void => {
   sendLog('ERROR', message, { args })
 }
 
+export { flushLogs }
+
 export default log